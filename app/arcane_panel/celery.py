@@ -8,8 +8,26 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
-    "run-checks-every-minute": {
+    # tick court : le scheduler ne lit que les checks échus (next_run_at)
+    "run-due-checks": {
         "task": "core.tasks.run_all_checks",
-        "schedule": 60.0,
-    }
+        "schedule": float(os.getenv("SCHEDULER_TICK_SECONDS", "5")),
+    },
+    "retention-hourly": {
+        "task": "core.tasks.run_retention",
+        "schedule": 3600.0,
+    },
+    "dashboard-summary": {
+        "task": "core.tasks.refresh_dashboard_summary",
+        "schedule": float(os.getenv("DASHBOARD_REFRESH_SECONDS", "15")),
+    },
+    # digests des transitions d'alertes (core/notify.py)
+    "notify-dispatch": {
+        "task": "core.tasks.dispatch_notifications",
+        "schedule": float(os.getenv("NOTIFY_WINDOW_SECONDS", "60")),
+    },
+    "partitions-hourly": {
+        "task": "core.tasks.maintain_partitions",
+        "schedule": 3600.0,
+    },
 }
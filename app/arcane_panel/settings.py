@@ -122,7 +122,117 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "arcane-panel@localhost")
 if not EMAIL_HOST:
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Notifications d'alertes (file Redis -> digests, cf core/notify.py)
+# NOTIFY_WINDOW_SECONDS (beat) est lu dans arcane_panel/celery.py
+ALERT_EMAIL_RECIPIENTS = [e.strip() for e in os.getenv("ALERT_EMAIL_RECIPIENTS", "").split(",") if e.strip()]
+NOTIFY_MAX_EVENTS = int(os.getenv("NOTIFY_MAX_EVENTS", "5000"))  # événements lus par passage
+NOTIFY_MAX_DIGESTS = int(os.getenv("NOTIFY_MAX_DIGESTS", "20"))  # au-delà : un message récapitulatif
+NOTIFY_RATE_PER_MINUTE = int(os.getenv("NOTIFY_RATE_PER_MINUTE", "30"))
+NOTIFY_BACKOFF_BASE_SECONDS = int(os.getenv("NOTIFY_BACKOFF_BASE_SECONDS", "30"))
+NOTIFY_BACKOFF_MAX_SECONDS = int(os.getenv("NOTIFY_BACKOFF_MAX_SECONDS", "1800"))
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+LIVE_UPDATES_ENABLED = os.getenv("LIVE_UPDATES_ENABLED", "1") == "1"  # pub/sub -> SSE (core/live.py)
+
+# Cache (Redis) : résumé dashboard, etc.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", "redis://redis:6379/1"),
+    }
+}
+DASHBOARD_CACHE_MAX_AGE = int(os.getenv("DASHBOARD_CACHE_MAX_AGE", "30"))  # secondes de staleness max
+# DASHBOARD_REFRESH_SECONDS (beat) est lu dans arcane_panel/celery.py
+
 # Celery
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", os.getenv("REDIS_URL", "redis://redis:6379/0"))
 CELERY_TIMEZONE = "Europe/Paris"
+
+# Probes (moteur asyncio, cf core/probes.py)
+PROBE_BATCH_SIZE = int(os.getenv("PROBE_BATCH_SIZE", "500"))  # checks par task run_check_batch
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "200"))  # sondes simultanées par worker
+PROBE_PER_HOST_CONCURRENCY = int(os.getenv("PROBE_PER_HOST_CONCURRENCY", "4"))
+PROBE_HTTP_THREADS = int(os.getenv("PROBE_HTTP_THREADS", "32"))
+
+# Cache DNS des sondes (par worker, cf core/dnscache.py)
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "4096"))  # entrées (LRU)
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "60"))  # secondes
+DNS_NEGATIVE_TTL = float(os.getenv("DNS_NEGATIVE_TTL", "15"))  # échecs de résolution
+DNS_PREFETCH = os.getenv("DNS_PREFETCH", "1") == "1"  # résout les hôtes du lot avant les sondes
+
+# Inventaire TLS : fréquence des handshakes ssl_expiry (cf core/certificates.py)
+CERT_REFRESH_HOURS = int(os.getenv("CERT_REFRESH_HOURS", "24"))
+CERT_RENEWAL_POLL_MINUTES = int(os.getenv("CERT_RENEWAL_POLL_MINUTES", "60"))  # près du seuil d'expiration
+
+# Result sink (écritures par lots, cf core/sink.py)
+RESULT_SINK_MAX_SIZE = int(os.getenv("RESULT_SINK_MAX_SIZE", "500"))
+RESULT_SINK_MAX_AGE = float(os.getenv("RESULT_SINK_MAX_AGE", "2.0"))  # secondes
+
+# Sondes déportées (app/probe_agent.py, cf core/agents.py)
+AGENT_LEASE_SECONDS = int(os.getenv("AGENT_LEASE_SECONDS", "120"))  # au-delà, le check repart vers un autre agent
+AGENT_LEASE_MAX = int(os.getenv("AGENT_LEASE_MAX", "500"))  # checks par lease
+AGENT_POLL_SECONDS = int(os.getenv("AGENT_POLL_SECONDS", "5"))  # attente conseillée quand il n'y a rien à faire
+AGENT_RESULTS_BATCH = int(os.getenv("AGENT_RESULTS_BATCH", "1000"))  # lignes par flush du ResultSink
+# résultat plus vieux que AGENT_LEASE_SECONDS + ceci refusé (envois en échec gardés par l'agent)
+AGENT_RESULTS_MAX_AGE_SECONDS = int(os.getenv("AGENT_RESULTS_MAX_AGE_SECONDS", "3600"))
+
+# Jobs (exécution + JobLog par paquets, cf core/jobs.py)
+JOB_LOG_FLUSH_LINES = int(os.getenv("JOB_LOG_FLUSH_LINES", "200"))
+JOB_LOG_FLUSH_SECONDS = float(os.getenv("JOB_LOG_FLUSH_SECONDS", "1.0"))  # sortie visible au plus tard après ce délai
+JOB_LOG_MAX_LINE = int(os.getenv("JOB_LOG_MAX_LINE", "4000"))  # caractères, au-delà la ligne est coupée
+JOB_LOG_TAIL_MAX = int(os.getenv("JOB_LOG_TAIL_MAX", "1000"))  # lignes par appel du tail
+JOB_TIMEOUT_SECONDS = int(os.getenv("JOB_TIMEOUT_SECONDS", "3600"))
+
+# Instrumentation du pipeline des checks (registre en mémoire -> /metrics, cf core/instrumentation.py)
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") == "1"
+INSTRUMENTATION_PUSH_SECONDS = float(os.getenv("INSTRUMENTATION_PUSH_SECONDS", "10"))  # instantané Redis par process
+INSTRUMENTATION_STALE_SECONDS = float(os.getenv("INSTRUMENTATION_STALE_SECONDS", "300"))  # process considéré arrêté
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN", "")  # Bearer pour Prometheus (sinon session requise)
+
+# Snapshot d'état par check (core/checkstatus.py)
+STATUS_RECENT_SIZE = int(os.getenv("STATUS_RECENT_SIZE", "20"))  # derniers résultats gardés par check
+
+# Machine d'état des alertes (cache, cf core/alertstate.py)
+# seuil d'ouverture par check : Check.failure_threshold
+ALERT_RECOVERY_THRESHOLD = int(os.getenv("ALERT_RECOVERY_THRESHOLD", "1"))  # succès consécutifs pour fermer
+ALERT_FLAP_WINDOW = int(os.getenv("ALERT_FLAP_WINDOW", "900"))  # secondes
+ALERT_FLAP_THRESHOLD = int(os.getenv("ALERT_FLAP_THRESHOLD", "6"))  # bascules ok<->ko dans la fenêtre (0 = off)
+ALERT_STATE_TTL = int(os.getenv("ALERT_STATE_TTL", "3600"))  # resynchro périodique avec la base
+
+# Listes (recherche classée cf core/search.py, pagination par curseur cf core/pagination.py)
+ASSETS_PAGE_SIZE = int(os.getenv("ASSETS_PAGE_SIZE", "50"))
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "100"))  # pages checks / alerts, défaut des API
+LIST_PAGE_MAX = int(os.getenv("LIST_PAGE_MAX", "1000"))  # plafond de ?limit= sur les API
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))  # lignes par lot du curseur serveur (exports)
+
+# Ingestion de métriques des agents (cf core/ingest.py)
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(16 * 1024 * 1024)))  # corps décompressé
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))  # échantillons par écriture
+INGEST_USE_COPY = os.getenv("INGEST_USE_COPY", "1") == "1"  # COPY FROM STDIN sous PostgreSQL
+INGEST_ASSET_CACHE_TTL = int(os.getenv("INGEST_ASSET_CACHE_TTL", "60"))  # cache nom d'asset -> id
+
+# Lecture des métriques agents (cf core/metrics.py)
+METRICS_MAX_POINTS = int(os.getenv("METRICS_MAX_POINTS", "1000"))  # points par série (le pas est élargi)
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "100"))
+
+# Scheduler (checks échus uniquement, cf core/scheduler.py)
+# SCHEDULER_TICK_SECONDS (beat) est lu directement dans arcane_panel/celery.py
+SCHEDULER_MIN_INTERVAL_SECONDS = int(os.getenv("SCHEDULER_MIN_INTERVAL_SECONDS", "5"))
+SCHEDULER_MAX_PER_TICK = int(os.getenv("SCHEDULER_MAX_PER_TICK", "10000"))
+
+# Rétention (cf core/retention.py)
+RETENTION_RESULTS_DAYS = int(os.getenv("RETENTION_RESULTS_DAYS", "14"))  # CheckResult brut
+RETENTION_METRICS_DAYS = int(os.getenv("RETENTION_METRICS_DAYS", "14"))  # MetricSample brut
+RETENTION_ROLLUP_DAYS = {  # CheckRollup par résolution (secondes -> jours)
+    60: int(os.getenv("RETENTION_ROLLUP_1M_DAYS", "7")),
+    600: int(os.getenv("RETENTION_ROLLUP_10M_DAYS", "90")),
+    3600: int(os.getenv("RETENTION_ROLLUP_1H_DAYS", "730")),
+}
+RETENTION_METRIC_ROLLUP_DAYS = int(os.getenv("RETENTION_METRIC_ROLLUP_DAYS", "730"))
+RETENTION_DELETE_CHUNK = int(os.getenv("RETENTION_DELETE_CHUNK", "5000"))
+
+# Partitionnement PostgreSQL de CheckResult/MetricSample (opt-in, cf core/partitions.py)
+PARTITIONING_ENABLED = os.getenv("PARTITIONING_ENABLED", "0") == "1"
+PARTITION_INTERVAL = os.getenv("PARTITION_INTERVAL", "day")  # day / week
+PARTITION_PREMAKE = int(os.getenv("PARTITION_PREMAKE", "7"))  # périodes créées à l'avance
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Asset, Check, CheckResult, Alert, Job, JobLog
+from .models import AgentToken, Asset, Check, CheckResult, CheckStatus, Alert, CertificateRecord, Job, JobLog, Tag
+from .tasks import run_job
 
 
 @admin.register(Asset)
@@ -9,11 +10,31 @@ class AssetAdmin(admin.ModelAdmin):
     list_filter = ("asset_type", "is_enabled")
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    # maintenu depuis Asset.tags (core/tags.py) : lecture seule
+    list_display = ("name", "asset_count")
+    search_fields = ("name",)
+    readonly_fields = ("name", "asset_count")
+
+
 @admin.register(Check)
 class CheckAdmin(admin.ModelAdmin):
-    list_display = ("name", "asset", "kind", "interval_seconds", "is_enabled", "last_run_at")
-    search_fields = ("name", "asset__name", "kind")
-    list_filter = ("kind", "is_enabled")
+    list_display = ("name", "asset", "kind", "interval_seconds", "agent", "region", "is_enabled", "last_run_at", "next_run_at")
+    search_fields = ("name", "asset__name", "kind", "region")
+    list_filter = ("kind", "is_enabled", "region")
+
+
+@admin.register(CheckStatus)
+class CheckStatusAdmin(admin.ModelAdmin):
+    # maintenu par le ResultSink (core/checkstatus.py) : lecture seule
+    list_display = ("monitor_check", "ok", "latency_ms", "consecutive_failures", "last_change_at", "last_result_at")
+    list_filter = ("ok",)
+    search_fields = ("monitor_check__name", "monitor_check__asset__name")
+    readonly_fields = [f.name for f in CheckStatus._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(CheckResult)
@@ -30,11 +51,38 @@ class AlertAdmin(admin.ModelAdmin):
     search_fields = ("title", "monitor_check__name", "monitor_check__asset__name")
 
 
+@admin.register(CertificateRecord)
+class CertificateRecordAdmin(admin.ModelAdmin):
+    list_display = ("host", "port", "subject", "issuer", "not_after", "fetched_at", "next_fetch_at")
+    search_fields = ("host", "subject", "issuer", "fingerprint_sha256")
+    readonly_fields = ("fingerprint_sha256", "sans", "chain", "fetched_at", "changed_at", "last_error")
+
+
+@admin.register(AgentToken)
+class AgentTokenAdmin(admin.ModelAdmin):
+    # création via `manage.py create_agent_token <nom>` (jeton affiché une seule fois) ; ici : révocation
+    list_display = ("name", "prefix", "region", "is_active", "created_at", "last_used_at")
+    list_filter = ("is_active", "region")
+    search_fields = ("name", "prefix")
+    readonly_fields = ("token_hash", "prefix", "created_at", "last_used_at")
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Job)
 class JobAdmin(admin.ModelAdmin):
     list_display = ("name", "action", "asset", "status", "created_at", "started_at", "finished_at")
     list_filter = ("status",)
     search_fields = ("name", "action", "asset__name")
+    actions = ["run_jobs"]
+
+    @admin.action(description="Exécuter les jobs en file (queued)")
+    def run_jobs(self, request, queryset):
+        ids = list(queryset.filter(status="queued").values_list("id", flat=True))
+        for job_id in ids:
+            run_job.delay(job_id)
+        self.message_user(request, f"{len(ids)} job(s) envoyé(s) ; sortie en direct via « Voir sur le site ».")
 
 
 @admin.register(JobLog)
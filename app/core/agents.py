@@ -0,0 +1,201 @@
+"""
+Sondes déportées : des agents (app/probe_agent.py) prennent en bail des lots
+de checks, les exécutent sur leur site et renvoient les résultats par lots.
+
+- un check est déporté quand Check.agent (un agent précis) ou Check.region
+  (tous les agents de la région, AgentToken.region) est renseigné ; le
+  scheduler central l'ignore alors (core/scheduler.py) ;
+- lease : les checks échus et non loués sont réservés (SKIP LOCKED) pour
+  AGENT_LEASE_SECONDS sans avancer next_run_at ; un agent qui meurt laisse
+  son bail expirer et le check redevient disponible pour un autre agent ;
+- résultats : écrits par le ResultSink comme ceux des workers centraux
+  (rollups, alertes, live), puis le bail est levé et next_run_at avancé ;
+  un résultat daté d'avant AGENT_LEASE_SECONDS + AGENT_RESULTS_MAX_AGE_SECONDS
+  est refusé (errors du rapport).
+
+Les ssl_expiry dont le certificat est encore frais dans l'inventaire sont
+répondus ici au moment du lease, sans aller-retour vers l'agent.
+"""
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import certificates
+from .ingest import BodyError, IngestReport
+from .models import Check
+from .scheduler import _next_run
+from .tasks import _check_host, _probe_spec, _result_sink
+
+CERT_DATES = ("not_before", "not_after")
+
+
+def eligible_q(identity) -> Q:
+    """Checks qu'un agent peut exécuter : les siens, et ceux de sa région non assignés à un agent."""
+    q = Q(agent_id=identity.id)
+    if identity.region:
+        q |= Q(agent__isnull=True, region=identity.region)
+    return q
+
+
+def _release(checks, now):
+    for c in checks:
+        c.next_run_at = _next_run(c, now, settings.SCHEDULER_MIN_INTERVAL_SECONDS)
+        c.leased_by = None
+        c.lease_expires_at = None
+    Check.objects.bulk_update(checks, ["next_run_at", "leased_by", "lease_expires_at"], batch_size=1000)
+
+
+def lease_checks(identity, limit: int, now=None):
+    """Réserve au plus `limit` checks échus pour l'agent -> [ProbeSpec sérialisables (dict)]."""
+    now = now or timezone.now()
+    expires = now + timedelta(seconds=settings.AGENT_LEASE_SECONDS)
+    with transaction.atomic():
+        due = list(
+            Check.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("asset")
+            .filter(eligible_q(identity), is_enabled=True, asset__is_enabled=True)
+            .filter(Q(next_run_at__lte=now) | Q(next_run_at__isnull=True))
+            .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now))
+            .order_by(F("next_run_at").asc(nulls_first=True))[:limit]
+        )
+
+        ssl_keys = {
+            c.id: certificates.cert_key(_check_host(c), c.port)
+            for c in due
+            if c.kind == "ssl_expiry"
+        }
+        cached = certificates.cached_records(ssl_keys.values(), now)
+        answered, leased = [], []
+        with _result_sink() as sink:
+            for c in due:
+                record = cached.get(ssl_keys.get(c.id))
+                if record:
+                    ok, message, timings = certificates.cached_result(record, c.ssl_days_threshold, now)
+                    sink.add(c, _check_host(c), ok, message, timings=timings)
+                    answered.append(c)
+                else:
+                    leased.append(c)
+
+        for c in leased:
+            c.leased_by_id = identity.id
+            c.lease_expires_at = expires
+        Check.objects.bulk_update(leased, ["leased_by", "lease_expires_at"], batch_size=1000)
+        _release(answered, now)
+
+    return [vars(_probe_spec(c)) for c in leased]
+
+
+# ------------------ résultats ------------------
+
+def _parse_cert(raw):
+    if not isinstance(raw, dict) or any(f not in raw for f in certificates.CERT_FIELDS):
+        raise ValueError("incomplete cert")
+    cert = dict(raw)
+    for field in CERT_DATES:
+        if cert[field]:
+            cert[field] = datetime.fromisoformat(cert[field])
+    if not cert["not_after"] or timezone.is_naive(cert["not_after"]):
+        raise ValueError("cert not_after must be an aware ISO datetime")
+    return cert
+
+
+def _parse_result(line: bytes, now, oldest):
+    """Ligne NDJSON -> dict normalisé ; ValueError si invalide ou antérieur à `oldest`."""
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        raise ValueError("invalid JSON") from None
+    if not isinstance(obj, dict):
+        raise ValueError("expected an object")
+    check_id, ok = obj.get("check_id"), obj.get("ok")
+    if not isinstance(check_id, int) or isinstance(check_id, bool) or not isinstance(ok, bool):
+        raise ValueError("check_id (int) and ok (bool) are required")
+    latency = obj.get("latency_ms")
+    if latency is not None and (isinstance(latency, bool) or not isinstance(latency, (int, float))):
+        raise ValueError("latency_ms must be a number")
+    timings = obj.get("timings")
+    if timings is not None and not isinstance(timings, dict):
+        raise ValueError("timings must be an object")
+    ts = obj.get("recorded_at")
+    if ts is None:
+        recorded_at = now
+    elif isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        recorded_at = min(now, datetime.fromtimestamp(ts, tz=dt_timezone.utc))  # horloge agent en avance : bornée
+    else:
+        raise ValueError("recorded_at must be an epoch timestamp")
+    if recorded_at < oldest:
+        # 1970, horloge agent en retard, file d'envoi trop ancienne : hors rollups/statut (et hors partitions)
+        raise ValueError(f"recorded_at too old ({recorded_at.isoformat()})")
+    cert = _parse_cert(obj["cert"]) if obj.get("cert") else None
+    return {
+        "check_id": check_id,
+        "ok": ok,
+        "message": str(obj.get("message") or "")[:2000],
+        "latency_ms": latency,
+        "timings": timings,
+        "recorded_at": recorded_at,
+        "cert": cert,
+    }
+
+
+def _flush(identity, pending, report: IngestReport, now):
+    checks = {
+        c.id: c
+        for c in Check.objects.select_related("asset").filter(
+            eligible_q(identity), id__in={r["check_id"] for _, r in pending}, is_enabled=True,
+        )
+    }
+    fetched, done = [], {}
+    with _result_sink() as sink:
+        for lineno, r in pending:
+            c = checks.get(r["check_id"])
+            if c is None:
+                report.reject(lineno, f"check {r['check_id']} not assigned to this agent")
+                continue
+            host = _check_host(c)
+            sink.add(c, host, r["ok"], r["message"], r["latency_ms"], r["recorded_at"], r["timings"])
+            report.accepted += 1
+            if c.kind == "ssl_expiry":
+                fetched.append((host, c.port, r["cert"], "" if r["cert"] else r["message"], c.ssl_days_threshold))
+            if c.leased_by_id == identity.id:
+                done[c.id] = c
+    certificates.record_fetches(fetched, now)
+    # bail levé seulement s'il est toujours à cet agent (expiré puis repris : l'autre agent le lèvera)
+    if done:
+        with transaction.atomic():
+            mine = set(
+                Check.objects.select_for_update(of=("self",))
+                .filter(id__in=done, leased_by_id=identity.id)
+                .values_list("id", flat=True)
+            )
+            _release([done[cid] for cid in mine], now)
+
+
+def apply_results(identity, lines) -> IngestReport:
+    """Lignes NDJSON d'un lot de résultats -> ResultSink, par paquets de AGENT_RESULTS_BATCH."""
+    report = IngestReport()
+    now = timezone.now()
+    oldest = now - timedelta(seconds=settings.AGENT_LEASE_SECONDS + settings.AGENT_RESULTS_MAX_AGE_SECONDS)
+    pending = []
+    try:
+        for lineno, line in enumerate(lines, 1):
+            report.lines = lineno
+            if not line.strip():
+                continue
+            try:
+                pending.append((lineno, _parse_result(line, now, oldest)))
+            except (ValueError, TypeError, OverflowError, OSError) as e:
+                report.reject(lineno, str(e))
+                continue
+            if len(pending) >= settings.AGENT_RESULTS_BATCH:
+                _flush(identity, pending, report, now)
+                pending = []
+    except BodyError as e:
+        report.error = e
+    if pending:
+        _flush(identity, pending, report, now)
+    return report
@@ -0,0 +1,196 @@
+"""
+Machine d'état des alertes, gardée en cache (Django cache -> Redis).
+
+Par check on garde un tuple compact :
+    (échecs consécutifs, succès consécutifs, id de l'alerte ouverte ou 0,
+     dernier résultat ok, horodatages des bascules ok<->ko récentes)
+
+Le ResultSink passe chaque lot de résultats ici ; la base n'est touchée que
+sur transition (ouverture = bulk_create, fermeture = 1 UPDATE par lot). Un
+résultat ok sans alerte ouverte, le cas courant, ne coûte plus de requête.
+
+- seuil : une alerte s'ouvre après Check.failure_threshold échecs consécutifs,
+  se ferme après ALERT_RECOVERY_THRESHOLD succès consécutifs ;
+- anti-flapping : au-delà de ALERT_FLAP_THRESHOLD bascules dans la fenêtre
+  ALERT_FLAP_WINDOW, une alerte ouverte reste ouverte jusqu'à stabilisation ;
+- état absent (TTL ALERT_STATE_TTL, cache vidé, Redis indisponible) :
+  reconstruit depuis les alertes ouvertes en base (1 requête pour les checks
+  concernés) ;
+- une alerte modifiée ou supprimée hors du sink (admin) efface l'état du
+  check (forget_states, core/signals.py) : il est relu depuis la base au lot
+  suivant. Le TTL ne suffit pas, chaque flush le rafraîchit ;
+- ouverture : revérifiée en base sous verrou des lignes Check, deux flush
+  concurrents d'un même check n'ouvrent pas deux alertes.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Alert, Check
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "alertstate:v1:"
+PENDING = -1  # alerte à créer dans ce lot (pas encore d'id)
+
+
+def _key(check_id) -> str:
+    return f"{KEY_PREFIX}{check_id}"
+
+
+class CheckState:
+    __slots__ = ("failures", "successes", "alert_id", "last_ok", "flips")
+
+    def __init__(self, failures=0, successes=0, alert_id=0, last_ok=None, flips=()):
+        self.failures = failures
+        self.successes = successes
+        self.alert_id = alert_id
+        self.last_ok = last_ok
+        self.flips = list(flips)
+
+    @classmethod
+    def from_tuple(cls, value):
+        return cls(*value)
+
+    def to_tuple(self):
+        return self.failures, self.successes, self.alert_id, self.last_ok, tuple(self.flips)
+
+    def record(self, ok: bool, now_ts: float):
+        if self.last_ok is not None and self.last_ok != ok:
+            self.flips.append(now_ts)
+        self.last_ok = ok
+        horizon = now_ts - settings.ALERT_FLAP_WINDOW
+        self.flips = [t for t in self.flips if t >= horizon]
+
+    def is_flapping(self) -> bool:
+        return 0 < settings.ALERT_FLAP_THRESHOLD <= len(self.flips)
+
+
+def load_states(check_ids) -> dict:
+    """{check_id: CheckState}. Cache d'abord, base pour les manquants."""
+    check_ids = list(check_ids)
+    try:
+        raw = cache.get_many([_key(cid) for cid in check_ids])
+    except Exception as e:  # cache indisponible : on repart de la base
+        logger.warning("alert state cache read failed: %s", e)
+        raw = {}
+
+    states = {}
+    missing = []
+    for cid in check_ids:
+        value = raw.get(_key(cid))
+        if value is None:
+            missing.append(cid)
+        else:
+            states[cid] = CheckState.from_tuple(value)
+
+    if missing:
+        open_alerts = dict(
+            Alert.objects.filter(monitor_check_id__in=missing, is_open=True)
+            .order_by("opened_at")
+            .values_list("monitor_check_id", "id")
+        )
+        for cid in missing:
+            alert_id = open_alerts.get(cid, 0)
+            # alerte ouverte en base = check considéré en échec
+            states[cid] = CheckState(failures=1 if alert_id else 0, alert_id=alert_id, last_ok=not alert_id)
+    return states
+
+
+def save_states(states: dict):
+    try:
+        cache.set_many(
+            {_key(cid): st.to_tuple() for cid, st in states.items()},
+            timeout=settings.ALERT_STATE_TTL,
+        )
+    except Exception as e:
+        logger.warning("alert state cache write failed: %s", e)
+
+
+def forget_states(check_ids):
+    try:
+        cache.delete_many([_key(cid) for cid in check_ids])
+    except Exception as e:
+        logger.warning("alert state cache delete failed: %s", e)
+
+
+def _open_in_db(check_ids) -> dict:
+    """{check_id: alert_id} des alertes déjà ouvertes, lignes Check verrouillées jusqu'au commit."""
+    # un flush concurrent sur ces checks attend ici, puis voit l'alerte que l'autre a committée
+    list(Check.objects.select_for_update().filter(id__in=check_ids).order_by("id").values_list("id", flat=True))
+    return dict(
+        Alert.objects.filter(monitor_check_id__in=check_ids, is_open=True)
+        .order_by("opened_at")
+        .values_list("monitor_check_id", "id")
+    )
+
+
+def apply_transitions(items, now, describe):
+    """
+    items    : résultats du lot dans l'ordre (attributs check, ok) ;
+    describe : item -> (title, details) pour une alerte à ouvrir.
+    Renvoie (opened [(check_id, title, details)], closed [check_id]).
+    À appeler dans la transaction du flush ; l'état est écrit en cache après commit.
+    """
+    if not items:
+        return [], []
+
+    now_ts = time.time()
+    recovery = max(1, settings.ALERT_RECOVERY_THRESHOLD)
+    states = load_states({it.check.id for it in items})
+
+    to_open = {}  # check_id -> item qui franchit le seuil
+    to_close = {}  # alert_id -> check_id
+
+    for it in items:
+        cid = it.check.id
+        st = states[cid]
+        st.record(it.ok, now_ts)
+
+        if it.ok:
+            st.successes += 1
+            st.failures = 0
+            if st.alert_id and st.successes >= recovery and not st.is_flapping():
+                if st.alert_id == PENDING:
+                    to_open.pop(cid, None)
+                else:
+                    to_close[st.alert_id] = cid
+                st.alert_id = 0
+        else:
+            st.failures += 1
+            st.successes = 0
+            if not st.alert_id and st.failures >= max(1, it.check.failure_threshold):
+                st.alert_id = PENDING
+                to_open[cid] = it
+
+    if to_close:
+        Alert.objects.filter(id__in=list(to_close), is_open=True).update(is_open=False, closed_at=now)
+    closed = list(to_close.values())
+
+    opened = []
+    if to_open:
+        # état en cache périmé (flush concurrent pas encore publié) : l'alerte existe déjà
+        for cid, alert_id in _open_in_db(list(to_open)).items():
+            del to_open[cid]
+            states[cid].alert_id = alert_id
+    if to_open:
+        alerts = []
+        for cid, it in to_open.items():
+            title, details = describe(it)
+            alerts.append(Alert(monitor_check=it.check, is_open=True, severity="critical", title=title,
+                                details=details, opened_at=now))
+            opened.append((cid, title, details))
+        Alert.objects.bulk_create(alerts, batch_size=500)
+        for alert in alerts:
+            if alert.pk is None:
+                # backend sans RETURNING : l'état sera relu depuis la base au prochain lot
+                states.pop(alert.monitor_check_id)
+            else:
+                states[alert.monitor_check_id].alert_id = alert.pk
+
+    transaction.on_commit(lambda: save_states(states))
+    return opened, closed
+
@@ -0,0 +1,170 @@
+"""
+API des agents (Django REST framework).
+
+Authentification par jeton : `Authorization: Bearer <jeton>` (AgentToken),
+commune au push de métriques et aux sondes déportées (core/agents.py).
+Le jeton est résolu via le cache Django (empreinte -> id) pour ne pas
+interroger la base à chaque push ; last_used_at est mis à jour au plus une
+fois par minute.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .agents import apply_results, lease_checks
+from .ingest import PRECISIONS, ingest, iter_lines
+from .models import AgentToken
+
+TOKEN_CACHE_KEY = "agenttoken:v2:{}"
+TOKEN_USED_KEY = "agenttoken:used:{}"
+TOKEN_CACHE_TTL = 60
+
+
+def hash_token(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def forget_token(token_hash: str):
+    cache.delete(TOKEN_CACHE_KEY.format(token_hash))
+
+
+class AgentIdentity:
+    def __init__(self, token_id: int, name: str, region: str = ""):
+        self.id = token_id
+        self.name = name
+        self.region = region
+
+
+class AgentTokenAuthentication(BaseAuthentication):
+    keyword = b"bearer"
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        if not parts or parts[0].lower() != self.keyword:
+            return None
+        if len(parts) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+
+        token_hash = hash_token(parts[1].decode("latin-1"))
+        key = TOKEN_CACHE_KEY.format(token_hash)
+        cached = cache.get(key)
+        if cached is None:
+            row = (
+                AgentToken.objects.filter(token_hash=token_hash, is_active=True)
+                .values_list("id", "name", "region")
+                .first()
+            )
+            cached = row or (0, "", "")  # cache négatif : pas de requête par tentative invalide
+            cache.set(key, cached, TOKEN_CACHE_TTL)
+        token_id, name, region = cached
+        if not token_id:
+            raise AuthenticationFailed("Invalid token.")
+
+        if cache.add(TOKEN_USED_KEY.format(token_id), 1, 60):
+            AgentToken.objects.filter(id=token_id).update(last_used_at=timezone.now())
+        return AnonymousUser(), AgentIdentity(token_id, name, region)
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+class IsAgent(BasePermission):
+    def has_permission(self, request, view):
+        return isinstance(request.auth, AgentIdentity)
+
+
+def _body_lines(request):
+    """Corps en flux, gzip accepté -> (lignes, None) ou (None, réponse 415)."""
+    encoding = request.headers.get("Content-Encoding", "").strip().lower()
+    if encoding not in ("", "identity", "gzip"):
+        return None, Response(
+            {"error": f"unsupported encoding {encoding!r}"}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+    # flux brut de la requête Django (request.stream de DRF vaut None sans Content-Length, ex: chunked)
+    return iter_lines(request._request, encoding == "gzip", settings.INGEST_MAX_BYTES), None
+
+
+class MetricIngestView(APIView):
+    """
+    POST /api/ingest/metrics/ : lot de métriques en line protocol (text/plain)
+    ou NDJSON (application/x-ndjson), `Content-Encoding: gzip` accepté.
+    Réponse : {"accepted", "rejected", "lines", "errors": [{"line", "error"}]} ;
+    accepted = échantillons écrits, rejected = lignes invalides + échantillons
+    refusés (asset inconnu). ?input / ?precision inconnus : 400. Corps illisible
+    / trop gros : 400 / 413 avec les compteurs de ce qui a déjà été écrit.
+    """
+
+    authentication_classes = [AgentTokenAuthentication]
+    permission_classes = [IsAgent]
+    parser_classes = []  # corps lu en flux par core/ingest.py, jamais chargé par DRF
+
+    def post(self, request):
+        content_type = (request.content_type or "").split(";")[0].strip()
+        # ?input= plutôt que ?format= (réservé par DRF au choix du renderer)
+        fmt = request.query_params.get("input") or (
+            "ndjson" if content_type in ("application/x-ndjson", "application/json") else "line"
+        )
+        if fmt not in ("line", "ndjson"):
+            return Response({"error": "input must be 'line' or 'ndjson'"}, status=status.HTTP_400_BAD_REQUEST)
+        precision = request.query_params.get("precision", "ns")
+        if precision not in PRECISIONS:
+            # un repli silencieux sur ns décalerait tous les horodatages d'un facteur 10^3..10^9
+            return Response({"error": "precision must be one of s, ms, us, ns"}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines, error = _body_lines(request)
+        if error is not None:
+            return error
+        report = ingest(lines, fmt, precision)
+        return Response(report.as_dict(), status=report.error.status if report.error else status.HTTP_200_OK)
+
+
+class ProbeLeaseView(APIView):
+    """
+    POST /api/agents/lease/ {"max": 200} : réserve des checks échus pour
+    l'agent (cf core/agents.py). Réponse : {"lease_seconds", "poll_seconds",
+    "checks": [ProbeSpec]} ; liste vide = rien à faire avant poll_seconds.
+    """
+
+    authentication_classes = [AgentTokenAuthentication]
+    permission_classes = [IsAgent]
+
+    def post(self, request):
+        try:
+            limit = int(request.data.get("max", settings.AGENT_LEASE_MAX))
+        except (TypeError, ValueError, AttributeError):
+            return Response({"error": "max must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.AGENT_LEASE_MAX))
+        return Response({
+            "lease_seconds": settings.AGENT_LEASE_SECONDS,
+            "poll_seconds": settings.AGENT_POLL_SECONDS,
+            "checks": lease_checks(request.auth, limit),
+        })
+
+
+class ProbeResultsView(APIView):
+    """
+    POST /api/agents/results/ : résultats en NDJSON (application/x-ndjson,
+    `Content-Encoding: gzip` accepté), une ligne par sonde :
+    {"check_id", "ok", "message", "latency_ms", "timings", "recorded_at" (epoch), "cert"}.
+    Réponse au format de l'ingestion : {"accepted", "rejected", "lines", "errors"}.
+    """
+
+    authentication_classes = [AgentTokenAuthentication]
+    permission_classes = [IsAgent]
+    parser_classes = []
+
+    def post(self, request):
+        lines, error = _body_lines(request)
+        if error is not None:
+            return error
+        report = apply_results(request.auth, lines)
+        return Response(report.as_dict(), status=report.error.status if report.error else status.HTTP_200_OK)
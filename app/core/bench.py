@@ -0,0 +1,409 @@
+"""
+Banc de mesure (commande `manage.py bench`) : sondes, écritures, vues.
+
+- cibles locales : listener TCP, serveur HTTP (délai / statut configurables),
+  serveur TLS avec certificat auto-signé (openssl) ;
+- données : N assets / checks pointant sur ces cibles + historique
+  CheckResult (et rollups) / MetricSample ;
+- mesures : débit des sweeps run_all_checks (Celery en mode eager) et
+  run_check, écritures/s, p50/p99 et nb de requêtes SQL des vues.
+
+Tout ce qui est créé porte le préfixe des noms d'assets et est supprimé à la
+fin (sauf --keep). À lancer sur une base de test : run_all_checks sonde aussi
+les checks existants.
+"""
+import math
+import os
+import shutil
+import socketserver
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import partitions, tasks
+from .ingest import write_samples
+from .checkstatus import apply_status
+from .models import Asset, CertificateRecord, Check, CheckResult, MetricSample
+from .rollups import apply_results
+from .tags import rebuild_tags
+
+LOCALHOST = "127.0.0.1"
+TAG_POOL = ("prod", "staging", "web", "db", "cache", "edge", "batch", "infra")
+METRIC_KEYS = ("cpu_percent", "ram_percent", "disk_percent", "load1", "net_rx_kbps", "net_tx_kbps")
+
+
+def percentile(values, q: float):
+    """Rang le plus proche (q entre 0 et 1) ; None si vide."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def _ms_stats(samples_ms):
+    return {
+        "n": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.50), 3),
+        "p99_ms": round(percentile(samples_ms, 0.99), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+# ------------------ cibles locales ------------------
+
+class _TcpHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        pass  # connexion acceptée puis fermée : c'est tout ce que mesure un check tcp_port
+
+
+def _http_handler(delay_ms: int, status: int):
+    body = b"ok\n"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, comme en mode pooled
+
+        def do_GET(self):
+            if delay_ms:
+                time.sleep(delay_ms / 1000.0)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _tls_handler(context: ssl.SSLContext):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            try:
+                with context.wrap_socket(self.request, server_side=True) as tls:
+                    tls.recv(1)  # le client ferme après lecture du certificat
+            except (OSError, ssl.SSLError):
+                pass
+
+    return Handler
+
+
+def _self_signed_cert(directory: str):
+    """(cert, key) auto-signés pour 127.0.0.1 via le binaire openssl, None s'il est absent."""
+    openssl = shutil.which("openssl")
+    if not openssl:
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "30",
+         "-subj", "/CN=arcane-bench", "-addext", f"subjectAltName=IP:{LOCALHOST},DNS:localhost",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _HttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class StandIns:
+    """Cibles locales sur des ports éphémères, servies par des threads du process."""
+
+    def __init__(self, http_delay_ms: int = 0, http_status: int = 200, tls: bool = True):
+        self.http_delay_ms = http_delay_ms
+        self.http_status = http_status
+        self.want_tls = tls
+        self.tcp_port = self.http_port = self.tls_port = None
+        self.cert_file = None
+        self.tls_note = ""
+        self._servers = []
+        self._tmp = None
+
+    def _serve(self, server):
+        self._servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.server_address[1]
+
+    def __enter__(self):
+        self.tcp_port = self._serve(_Server((LOCALHOST, 0), _TcpHandler))
+        self.http_port = self._serve(_HttpServer((LOCALHOST, 0), _http_handler(self.http_delay_ms, self.http_status)))
+        if self.want_tls:
+            self._tmp = tempfile.mkdtemp(prefix="arcane-bench-")
+            pair = _self_signed_cert(self._tmp)
+            if pair:
+                self.cert_file = pair[0]
+                ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                ctx.load_cert_chain(*pair)
+                self.tls_port = self._serve(_Server((LOCALHOST, 0), _tls_handler(ctx)))
+            else:
+                self.tls_note = "skipped: openssl binary not found"
+        return self
+
+    def __exit__(self, *exc):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        if self._tmp:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+        return False
+
+    @contextmanager
+    def trusted(self):
+        """Le certificat auto-signé devient l'unique CA de confiance (ssl.create_default_context lit SSL_CERT_FILE)."""
+        if not self.cert_file:
+            yield
+            return
+        previous = os.environ.get("SSL_CERT_FILE")
+        os.environ["SSL_CERT_FILE"] = self.cert_file
+        try:
+            yield
+        finally:
+            if previous is None:
+                os.environ.pop("SSL_CERT_FILE", None)
+            else:
+                os.environ["SSL_CERT_FILE"] = previous
+
+    def describe(self) -> dict:
+        return {
+            "tcp_port": self.tcp_port,
+            "http_port": self.http_port,
+            "http_delay_ms": self.http_delay_ms,
+            "http_status": self.http_status,
+            "tls_port": self.tls_port,
+            "tls": self.tls_note or ("enabled" if self.tls_port else "disabled"),
+        }
+
+
+# ------------------ données ------------------
+
+def _check_fields(kind: str, targets: StandIns) -> dict:
+    if kind == "tcp_port":
+        return {"target": LOCALHOST, "port": targets.tcp_port}
+    if kind == "http":
+        return {"target": f"http://{LOCALHOST}:{targets.http_port}/"}
+    if kind == "ssl_expiry":
+        return {"target": LOCALHOST, "port": targets.tls_port}
+    return {"target": LOCALHOST}  # ping
+
+
+def generate_inventory(prefix: str, n_assets: int, checks_per_asset: int, kinds, targets: StandIns, rng) -> dict:
+    if "ssl_expiry" in kinds and not targets.tls_port:
+        kinds = [k for k in kinds if k != "ssl_expiry"]
+    t0 = time.perf_counter()
+    assets = Asset.objects.bulk_create(
+        [
+            Asset(
+                name=f"{prefix}{i:05d}",
+                ip_or_host=LOCALHOST,
+                tags=", ".join(rng.sample(TAG_POOL, 2)),
+                description=f"bench asset {i}",
+            )
+            for i in range(n_assets)
+        ],
+        batch_size=1000,
+    )
+    if any(a.pk is None for a in assets):  # backend sans RETURNING
+        assets = list(Asset.objects.filter(name__startswith=prefix).order_by("name"))
+
+    checks = []
+    for asset in assets:
+        for j in range(checks_per_asset):
+            kind = kinds[(asset.pk + j) % len(kinds)]
+            checks.append(Check(asset=asset, name=f"{kind}-{j}", kind=kind, interval_seconds=60,
+                                timeout_seconds=2, **_check_fields(kind, targets)))
+    Check.objects.bulk_create(checks, batch_size=1000)
+    checks = list(Check.objects.filter(asset__name__startswith=prefix).select_related("asset"))
+    rebuild_tags()  # bulk_create ne passe pas par les signaux
+    return {
+        "assets": len(assets),
+        "checks": len(checks),
+        "kinds": sorted({c.kind for c in checks}),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "_assets": assets,
+        "_checks": checks,
+    }
+
+
+def _ensure_partitions(model, since):
+    if settings.PARTITIONING_ENABLED and partitions.supported() and partitions.is_partitioned(model):
+        partitions.ensure_partitions(model, timezone.now(), settings.PARTITION_INTERVAL,
+                                     settings.PARTITION_PREMAKE, since=since)
+
+
+def generate_history(checks, assets, hours: float, result_interval: int, metric_interval: int,
+                     metric_keys: int, rng, batch_size: int = 5000) -> dict:
+    """Historique CheckResult (+ rollups) et MetricSample sur `hours` heures ; mesure les insertions/s."""
+    now = timezone.now()
+    start = now - timedelta(hours=hours)
+    _ensure_partitions(CheckResult, start)
+    _ensure_partitions(MetricSample, start)
+    report = {}
+
+    # CheckResult : bulk_create par lots + fusion des rollups (le chemin du ResultSink)
+    steps = max(1, int(hours * 3600 // max(1, result_interval)))
+    t0 = time.perf_counter()
+    rows, total = [], 0
+    for i in range(steps):
+        at = start + timedelta(seconds=i * result_interval)
+        for c in checks:
+            ok = rng.random() > 0.02
+            rows.append(CheckResult(monitor_check_id=c.id, ok=ok, latency_ms=round(rng.lognormvariate(3, 0.5), 3) if ok else None,
+                                    message="OK" if ok else "bench failure", recorded_at=at))
+            if len(rows) >= batch_size:
+                total += _write_results(rows)
+                rows = []
+    if rows:
+        total += _write_results(rows)
+    elapsed = time.perf_counter() - t0
+    report["check_results"] = {"rows": total, "seconds": round(elapsed, 3), "rows_per_second": round(total / elapsed, 1) if elapsed else None}
+
+    # MetricSample : même chemin d'écriture que l'API d'ingestion (COPY sous PostgreSQL)
+    keys = METRIC_KEYS[: max(0, metric_keys)]
+    steps = max(1, int(hours * 3600 // max(1, metric_interval))) if keys else 0
+    t0 = time.perf_counter()
+    batch, total = [], 0
+    for i in range(steps):
+        at = start + timedelta(seconds=i * metric_interval)
+        for a in assets:
+            for key in keys:
+                batch.append((a.pk, key, round(rng.uniform(0, 100), 3), "%" if key.endswith("percent") else "", "", at))
+                if len(batch) >= batch_size:
+                    write_samples(batch)
+                    total += len(batch)
+                    batch = []
+    if batch:
+        write_samples(batch)
+        total += len(batch)
+    elapsed = time.perf_counter() - t0
+    report["metric_samples"] = {"rows": total, "seconds": round(elapsed, 3), "rows_per_second": round(total / elapsed, 1) if elapsed else None}
+    return report
+
+
+def _write_results(rows):
+    CheckResult.objects.bulk_create(rows, batch_size=1000)
+    apply_results((r.monitor_check_id, r.ok, r.latency_ms, r.recorded_at) for r in rows)
+    with transaction.atomic():
+        apply_status([(r.monitor_check_id, r.ok, r.latency_ms, r.message, r.recorded_at) for r in rows])
+    return len(rows)
+
+
+# ------------------ sondes ------------------
+
+@contextmanager
+def _eager_celery():
+    # run_all_checks -> run_check_batch.delay exécuté dans ce process, sans broker
+    from arcane_panel.celery import app
+
+    previous = app.conf.task_always_eager
+    app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        app.conf.task_always_eager = previous
+
+
+def _no_notifications():
+    # aucune notification ne part d'un banc (HTTP 5xx simulé, ping sans privilèges...)
+    return mock.patch.object(tasks.notify, "enqueue", lambda events: None)
+
+
+def bench_sweeps(check_ids, sweeps: int) -> dict:
+    out = []
+    with _eager_celery(), _no_notifications():
+        for _ in range(max(0, sweeps)):
+            Check.objects.filter(id__in=check_ids).update(next_run_at=None)
+            before = CheckResult.objects.filter(monitor_check_id__in=check_ids).count()
+            started = timezone.now()
+            t0 = time.perf_counter()
+            claimed = tasks.run_all_checks()
+            elapsed = time.perf_counter() - t0
+            written = CheckResult.objects.filter(monitor_check_id__in=check_ids).count() - before
+            failed = CheckResult.objects.filter(monitor_check_id__in=check_ids, ok=False, recorded_at__gte=started).count()
+            out.append({
+                "claimed": claimed,
+                "results_written": written,
+                "seconds": round(elapsed, 3),
+                "checks_per_second": round(claimed / elapsed, 1) if elapsed else None,
+                "writes_per_second": round(written / elapsed, 1) if elapsed else None,
+                "failed": failed,
+            })
+    return {"sweeps": out, "median_checks_per_second": statistics.median([s["checks_per_second"] for s in out]) if out else None}
+
+
+def bench_run_check(check_ids, n: int) -> dict:
+    sample = list(check_ids)[: max(0, n)]
+    if not sample:
+        return {}
+    samples = []
+    with _no_notifications():
+        t0 = time.perf_counter()
+        for cid in sample:
+            t1 = time.perf_counter()
+            tasks.run_check(cid)
+            samples.append((time.perf_counter() - t1) * 1000.0)
+        elapsed = time.perf_counter() - t0
+    return {**_ms_stats(samples), "checks_per_second": round(len(sample) / elapsed, 1)}
+
+
+# ------------------ vues ------------------
+
+def bench_callable(fn, n: int) -> dict:
+    samples, queries = [], 0
+    for _ in range(max(1, n)):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        queries = max(queries, len(ctx.captured_queries))
+    reset_queries()
+    return {**_ms_stats(samples), "queries": queries}
+
+
+def bench_views(client, urls, n: int) -> dict:
+    out = {}
+    for name, url in urls:
+        response = client.get(url)  # chauffe (caches, connexion)
+        status = response.status_code
+
+        def get(url=url):
+            nonlocal status
+            r = client.get(url)
+            if r.streaming:
+                b"".join(r.streaming_content)
+            status = r.status_code
+
+        out[name] = {"url": url, **bench_callable(get, n), "status": status}
+    return out
+
+
+# ------------------ nettoyage ------------------
+
+def cleanup(prefix: str, targets: StandIns = None) -> dict:
+    t0 = time.perf_counter()
+    n = Asset.objects.filter(name__startswith=prefix).count()
+    Asset.objects.filter(name__startswith=prefix).delete()  # cascade : checks, résultats, alertes, métriques
+    if targets and targets.tls_port:
+        CertificateRecord.objects.filter(host=LOCALHOST, port=targets.tls_port).delete()
+    rebuild_tags()
+    return {"assets_deleted": n, "seconds": round(time.perf_counter() - t0, 3)}
+
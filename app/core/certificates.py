@@ -0,0 +1,111 @@
+"""
+Inventaire / cache des certificats TLS (modèle CertificateRecord).
+
+Un check ssl_expiry ne refait le handshake que quand l'entrée host:port est
+échue : toutes les CERT_REFRESH_HOURS en temps normal, toutes les
+CERT_RENEWAL_POLL_MINUTES quand l'expiration approche du seuil (pour voir
+passer le renouvellement), et à chaque check tant que la dernière lecture a
+échoué. Entre deux lectures, les jours restants sont calculés depuis not_after.
+
+À chaque lecture, un changement d'empreinte met à jour l'inventaire (émetteur,
+SANs, chaîne) et date changed_at.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CertificateRecord
+from .tlscert import expiry_verdict
+
+CERT_FIELDS = ("fingerprint_sha256", "subject", "issuer", "sans", "serial", "not_before", "not_after", "chain")
+UPDATE_FIELDS = CERT_FIELDS + ("fetched_at", "next_fetch_at", "changed_at", "last_error")
+
+
+def cert_key(host: str, port) -> tuple:
+    return host.strip().lower(), int(port or 443)
+
+
+def cached_records(keys, now=None) -> dict:
+    """{(host, port): CertificateRecord} des entrées encore fraîches (pas de handshake à faire)."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    now = now or timezone.now()
+    qs = CertificateRecord.objects.filter(
+        host__in={host for host, _ in keys},
+        next_fetch_at__gt=now,
+        not_after__isnull=False,
+    )
+    return {(r.host, r.port): r for r in qs if (r.host, r.port) in keys}
+
+
+def cached_result(record: CertificateRecord, days_threshold: int, now=None):
+    """-> (ok, message, timings) d'un check ssl_expiry servi depuis l'inventaire."""
+    ok, message, _ = expiry_verdict(record.not_after, days_threshold, now or timezone.now())
+    return ok, message, {"cached": True, "fetched_at": record.fetched_at.isoformat() if record.fetched_at else None}
+
+
+def _next_fetch(now, not_after, days_threshold: int):
+    refresh = timedelta(hours=settings.CERT_REFRESH_HOURS)
+    if not_after - now <= timedelta(days=days_threshold + 1):
+        refresh = timedelta(minutes=settings.CERT_RENEWAL_POLL_MINUTES)
+    return min(now + refresh, not_after)
+
+
+def record_fetches(fetches, now=None) -> int:
+    """
+    fetches : itérable de (host, port, cert, error, days_threshold) ;
+    cert = CertInfo (core/tlscert.py) ou None si la lecture a échoué (error).
+    Quelques requêtes par lot : 1 SELECT + bulk_update / upsert.
+    """
+    items = {}
+    for host, port, cert, error, days_threshold in fetches:
+        key = cert_key(host, port)
+        if key in items:
+            # plusieurs checks sur le même host:port : le seuil le plus haut pilote le rythme de relecture,
+            # une lecture réussie l'emporte sur un échec du même lot
+            prev_cert, _, prev_threshold = items[key]
+            days_threshold = max(days_threshold, prev_threshold)
+            if prev_cert and not cert:
+                cert, error = prev_cert, ""
+        items[key] = (cert, error, days_threshold)
+    if not items:
+        return 0
+
+    now = now or timezone.now()
+    existing = {
+        (r.host, r.port): r
+        for r in CertificateRecord.objects.filter(host__in={host for host, _ in items})
+        if (r.host, r.port) in items
+    }
+
+    to_update, to_create = [], []
+    for (host, port), (cert, error, days_threshold) in items.items():
+        rec = existing.get((host, port)) or CertificateRecord(host=host, port=port)
+        if cert:
+            if rec.fingerprint_sha256 != cert["fingerprint_sha256"]:
+                rec.changed_at = now
+            for field in CERT_FIELDS:
+                setattr(rec, field, cert[field])
+            rec.fetched_at = now
+            rec.next_fetch_at = _next_fetch(now, cert["not_after"], days_threshold)
+            rec.last_error = ""
+        else:
+            # on garde le dernier certificat connu, le prochain check refera la lecture
+            rec.next_fetch_at = None
+            rec.last_error = (error or "")[:2000]
+        (to_update if rec.pk else to_create).append(rec)
+
+    if to_update:
+        CertificateRecord.objects.bulk_update(to_update, list(UPDATE_FIELDS), batch_size=500)
+    if to_create:
+        # upsert : deux lots concurrents peuvent découvrir le même host:port
+        CertificateRecord.objects.bulk_create(
+            to_create,
+            update_conflicts=True,
+            unique_fields=["host", "port"],
+            update_fields=list(UPDATE_FIELDS),
+            batch_size=500,
+        )
+    return len(to_update) + len(to_create)
@@ -0,0 +1,78 @@
+"""
+Snapshot de l'état courant des checks (modèle CheckStatus).
+
+Le ResultSink passe chaque lot ici (dans sa transaction) : 1 SELECT ... FOR
+UPDATE des statuts concernés + 1 upsert, quel que soit le nombre de
+résultats. Les pages lisent ensuite l'état par jointure (select_related
+"status") au lieu de chercher le dernier CheckResult de chaque check.
+
+Un résultat plus ancien que le dernier connu (agent en retard, cf
+core/agents.py) entre dans l'historique court mais ne remplace pas l'état.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CheckStatus
+
+UPDATE_FIELDS = (
+    "ok", "latency_ms", "message", "last_result_at", "last_change_at", "consecutive_failures", "recent", "updated_at",
+)
+
+
+def _entry(recorded_at, ok, latency_ms):
+    return [round(recorded_at.timestamp(), 3), ok, None if latency_ms is None else round(latency_ms, 3)]
+
+
+def fold(status: CheckStatus, rows, size: int):
+    """Applique des résultats (check_id, ok, latency_ms, message, recorded_at), triés par date, à un statut."""
+    recent = list(status.recent or [])
+    late = False
+    for _, ok, latency_ms, message, recorded_at in rows:
+        recent.append(_entry(recorded_at, ok, latency_ms))
+        if status.last_result_at and recorded_at < status.last_result_at:
+            late = True
+            continue
+        if status.ok is None or status.ok != ok:
+            status.last_change_at = recorded_at
+        status.consecutive_failures = 0 if ok else status.consecutive_failures + 1
+        status.ok = ok
+        status.latency_ms = latency_ms
+        status.message = (message or "")[:500]
+        status.last_result_at = recorded_at
+    if late:
+        recent.sort(key=lambda e: e[0])
+    status.recent = recent[-size:]
+    return status
+
+
+def apply_status(results, now=None) -> int:
+    """results : itérable (check_id, ok, latency_ms, message, recorded_at). À appeler dans une transaction."""
+    by_check = {}
+    for row in results:
+        by_check.setdefault(row[0], []).append(row)
+    if not by_check:
+        return 0
+
+    now = now or timezone.now()
+    # verrou dans l'ordre des ids : deux flush concurrents sur les mêmes checks ne s'interbloquent pas
+    existing = {
+        s.monitor_check_id: s
+        for s in CheckStatus.objects.select_for_update().filter(monitor_check_id__in=by_check).order_by("monitor_check_id")
+    }
+    size = settings.STATUS_RECENT_SIZE
+    statuses = []
+    for check_id, rows in by_check.items():
+        rows.sort(key=lambda r: r[4])
+        status = existing.get(check_id) or CheckStatus(monitor_check_id=check_id)
+        fold(status, rows, size)
+        status.updated_at = now
+        statuses.append(status)
+
+    CheckStatus.objects.bulk_create(
+        statuses,
+        update_conflicts=True,
+        unique_fields=["monitor_check"],
+        update_fields=list(UPDATE_FIELDS),
+        batch_size=500,
+    )
+    return len(statuses)
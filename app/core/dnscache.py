@@ -0,0 +1,200 @@
+"""
+Cache DNS partagé par les sondes (tcp_port / http cold / ssl_expiry / ping).
+
+- LRU borné (max_size entrées) avec expiration par entrée ;
+- cache négatif : un NXDOMAIN / échec de résolution est mémorisé negative_ttl
+  secondes pour ne pas relancer la même requête à chaque check ;
+- côté asyncio, les résolutions concurrentes d'un même hôte sont fusionnées
+  (une seule requête en vol), et prefetch() résout tous les hôtes d'un lot
+  au début du sweep.
+
+Toutes les adresses renvoyées par getaddrinfo sont gardées (dans son ordre) :
+connect() / aconnect() les essaient l'une après l'autre, comme
+create_connection / open_connection le font avec un nom d'hôte. Un hôte
+IPv6 d'abord ou à plusieurs A reste joignable si une adresse ne répond pas.
+
+getaddrinfo ne donne pas le TTL des enregistrements : la durée de vie est
+donc fixée par configuration (DNS_CACHE_TTL), à garder sous les TTL réels.
+
+Pas de dépendance Django.
+"""
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("addrs", "error", "expires_at")
+
+    def __init__(self, addrs, error, expires_at):
+        self.addrs = addrs
+        self.error = error
+        self.expires_at = expires_at
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _lookup(host: str):
+    info = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return tuple(dict.fromkeys(i[4][0] for i in info))  # ordre getaddrinfo, sans doublons
+
+
+def _addresses(addrs):
+    return (addrs,) if isinstance(addrs, str) else tuple(addrs)
+
+
+def connect(addrs, port: int, timeout: float) -> socket.socket:
+    """socket.create_connection sur chaque adresse tour à tour ; lève la dernière erreur."""
+    error = None
+    for addr in _addresses(addrs):
+        try:
+            return socket.create_connection((addr, port), timeout=timeout)
+        except OSError as e:
+            error = e
+    raise error or OSError("no address to connect to")
+
+
+async def aconnect(addrs, port: int, timeout: float, **kwargs):
+    """
+    asyncio.open_connection sur chaque adresse tour à tour -> (reader, writer).
+    Le temps restant est partagé entre les adresses restantes : une adresse
+    muette ne consomme pas tout le timeout.
+    """
+    addrs = _addresses(addrs)
+    deadline = time.monotonic() + timeout
+    error = None
+    for i, addr in enumerate(addrs):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(addr, port, **kwargs), remaining / (len(addrs) - i)
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            error = e
+    if isinstance(error, OSError):
+        raise error
+    raise asyncio.TimeoutError()
+
+
+class DnsCache:
+    """
+    resolve(host)        -> (adresses, dns_ms)   (synchrone, thread-safe)
+    await aresolve(host) -> (adresses, dns_ms)
+    adresses : tuple dans l'ordre de getaddrinfo ; dns_ms vaut 0 quand la
+    réponse vient du cache.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0, negative_ttl: float = 10.0):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, host: str) -> str:
+        return host.strip().lower().rstrip(".")
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _store(self, key, addrs, error):
+        ttl = self.ttl if error is None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = _Entry(addrs, error, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _answer(entry, dns_ms):
+        if entry.error is not None:
+            raise socket.gaierror(*entry.error)
+        return entry.addrs, dns_ms
+
+    def resolve(self, host: str, port=None):
+        # `port` ignoré : signature compatible avec le hook resolve de httpclient.cold_get
+        if _is_ip(host):
+            return (host,), 0.0
+        key = self._key(host)
+        entry = self._get(key)
+        if entry is not None:
+            return self._answer(entry, 0.0)
+
+        self.misses += 1
+        t0 = time.perf_counter()
+        try:
+            addrs = _lookup(key)
+        except socket.gaierror as e:
+            self._store(key, None, e.args)
+            raise
+        dns_ms = (time.perf_counter() - t0) * 1000.0
+        self._store(key, addrs, None)
+        return addrs, dns_ms
+
+    async def aresolve(self, host: str):
+        if _is_ip(host):
+            return (host,), 0.0
+        key = self._key(host)
+        entry = self._get(key)
+        if entry is not None:
+            return self._answer(entry, 0.0)
+
+        loop = asyncio.get_running_loop()
+        flight = (id(loop), key)  # une boucle par lot : pas de future partagée entre boucles
+        fut = self._inflight.get(flight)
+        if fut is None:
+            # getaddrinfo part dans le thread pool par défaut de la boucle
+            fut = self._inflight[flight] = asyncio.ensure_future(loop.run_in_executor(None, self.resolve, key))
+            fut.add_done_callback(lambda _f, k=flight: self._inflight.pop(k, None))
+        return await asyncio.shield(fut)
+
+    async def prefetch(self, hosts):
+        """Résout en parallèle les hôtes distincts d'un lot. Les échecs restent en cache négatif."""
+        names = {self._key(h) for h in hosts if h and not _is_ip(h)}
+        if names:
+            await asyncio.gather(*(self.aresolve(h) for h in names), return_exceptions=True)
+        return len(names)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_cache(max_size: int = 1024, ttl: float = 60.0, negative_ttl: float = 10.0) -> DnsCache:
+    """Instance partagée par process (worker Celery), créée au premier appel."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = DnsCache(max_size=max_size, ttl=ttl, negative_ttl=negative_ttl)
+    return _shared
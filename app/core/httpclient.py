@@ -0,0 +1,143 @@
+"""
+Client HTTP des checks http.
+
+- mode "pooled" (défaut) : une requests.Session par scheme/hôte et par worker,
+  connexions keep-alive réutilisées -> pas de DNS/TCP/TLS à chaque check.
+- mode "cold" : nouvelle connexion à chaque fois, latence découpée en
+  dns / connect / tls / ttfb (ce que verrait un nouveau visiteur).
+
+Pas de dépendance Django (réutilisable par core/probes.py et un agent).
+"""
+import http.client
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .dnscache import connect
+
+USER_AGENT = "ArcanePanel-Check/1.0"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_sessions = {}
+_lock = threading.Lock()
+POOL_MAXSIZE = 8
+
+
+def _pool_key(url: str):
+    u = urlsplit(url)
+    return u.scheme, (u.netloc or "").lower()
+
+
+def get_session(url: str) -> requests.Session:
+    key = _pool_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                # pas de retry : un check doit refléter le premier essai
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+
+
+def _expect(status: int, expected_status: int):
+    if status != expected_status:
+        raise RuntimeError(f"HTTP {status} (expected {expected_status})")
+
+
+def pooled_get(url: str, timeout: int, expected_status: int):
+    t0 = time.perf_counter()
+    r = get_session(url).get(url, timeout=timeout, allow_redirects=True)
+    total = (time.perf_counter() - t0) * 1000.0
+    # contenu non lu (stream implicite lu par requests) : on libère la connexion vers le pool
+    r.close()
+    _expect(r.status_code, expected_status)
+    return total, {
+        "mode": "pooled",
+        "ttfb_ms": round(r.elapsed.total_seconds() * 1000.0, 3),
+        "total_ms": round(total, 3),
+    }
+
+
+def cold_get(url: str, timeout: int, expected_status: int, resolve=None):
+    """
+    GET sur une connexion neuve avec découpage dns/connect/tls/ttfb du premier saut.
+    `resolve(host, port) -> (adresses, dns_ms)` permet de brancher un cache DNS.
+    Les redirections éventuelles sont suivies ensuite via la session poolée.
+    """
+    u = urlsplit(url)
+    host = u.hostname or ""
+    https = u.scheme == "https"
+    port = u.port or (443 if https else 80)
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    timings = {"mode": "cold"}
+
+    t0 = time.perf_counter()
+    if resolve:
+        addrs, dns_ms = resolve(host, port)
+    else:
+        info = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addrs = [i[4][0] for i in info]
+        dns_ms = (time.perf_counter() - t0) * 1000.0
+    timings["dns_ms"] = round(dns_ms, 3)
+
+    t1 = time.perf_counter()
+    sock = connect(addrs, port, timeout)
+    timings["connect_ms"] = round((time.perf_counter() - t1) * 1000.0, 3)
+
+    try:
+        if https:
+            t2 = time.perf_counter()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            timings["tls_ms"] = round((time.perf_counter() - t2) * 1000.0, 3)
+
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        t3 = time.perf_counter()
+        conn.putrequest("GET", path, skip_host=True, skip_accept_encoding=True)
+        conn.putheader("Host", u.netloc)
+        conn.putheader("User-Agent", USER_AGENT)
+        conn.putheader("Connection", "close")
+        conn.endheaders()
+        resp = conn.getresponse()
+        timings["ttfb_ms"] = round((time.perf_counter() - t3) * 1000.0, 3)
+        status = resp.status
+        location = resp.getheader("Location")
+        resp.close()
+    finally:
+        sock.close()
+
+    if status in REDIRECT_STATUSES and location and expected_status not in REDIRECT_STATUSES:
+        r = get_session(url).get(requests.compat.urljoin(url, location), timeout=timeout, allow_redirects=True)
+        r.close()
+        status = r.status_code
+        timings["redirect_ms"] = round(r.elapsed.total_seconds() * 1000.0, 3)
+
+    total = (time.perf_counter() - t0) * 1000.0
+    timings["total_ms"] = round(total, 3)
+    _expect(status, expected_status)
+    return total, timings
+
+
+def timed_get(url: str, timeout: int, expected_status: int, mode: str = "pooled", resolve=None):
+    """-> (latency_ms, timings). Lève RuntimeError si le status n'est pas celui attendu."""
+    if mode == "cold":
+        return cold_get(url, timeout, expected_status, resolve=resolve)
+    return pooled_get(url, timeout, expected_status)
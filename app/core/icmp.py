@@ -0,0 +1,248 @@
+"""
+Pinger ICMP natif (asyncio), sans fork de `ping`.
+
+- socket ICMP "datagram" non privilégiée si le noyau l'autorise
+  (net.ipv4.ping_group_range), sinon socket RAW (root / CAP_NET_RAW) ;
+- une socket par famille d'adresses pour tout le lot : les echo requests de
+  tous les hôtes partent de la même socket, les réponses sont associées par
+  (ip source, séquence) ;
+- sondes multi-paquets : min / avg / max / jitter / perte.
+
+Pas de dépendance Django.
+"""
+import asyncio
+import itertools
+import os
+import socket
+import struct
+import time
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+PAYLOAD = b"arcane-panel-icmp".ljust(48, b".")
+
+
+class IcmpUnavailable(RuntimeError):
+    """Ni socket ICMP datagram ni socket raw : il faut retomber sur le binaire ping."""
+
+
+def checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    s = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    s = (s >> 16) + (s & 0xFFFF)
+    s += s >> 16
+    return ~s & 0xFFFF
+
+
+def build_echo(ident: int, seq: int, v6: bool = False) -> bytes:
+    icmp_type = ICMP6_ECHO_REQUEST if v6 else ICMP_ECHO_REQUEST
+    header = struct.pack("!BBHHH", icmp_type, 0, 0, ident & 0xFFFF, seq & 0xFFFF)
+    if v6:
+        # ICMPv6 : checksum calculé par le noyau (pseudo-header IPv6)
+        return header + PAYLOAD
+    csum = checksum(header + PAYLOAD)
+    return struct.pack("!BBHHH", icmp_type, 0, csum, ident & 0xFFFF, seq & 0xFFFF) + PAYLOAD
+
+
+def parse_reply(packet: bytes, raw: bool, v6: bool = False):
+    """-> (ident, seq) si c'est un echo reply, sinon None."""
+    if raw and not v6:
+        # socket raw IPv4 : l'en-tête IP est inclus
+        ihl = (packet[0] & 0x0F) * 4
+        packet = packet[ihl:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", packet[:8])
+    if icmp_type != (ICMP6_ECHO_REPLY if v6 else ICMP_ECHO_REPLY):
+        return None
+    return ident, seq
+
+
+def _open_socket(family: int):
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        return socket.socket(family, socket.SOCK_DGRAM, proto), False
+    except PermissionError:
+        pass
+    try:
+        return socket.socket(family, socket.SOCK_RAW, proto), True
+    except PermissionError as e:
+        raise IcmpUnavailable(str(e)) from e
+
+
+class PingStats:
+    def __init__(self, host: str, sent: int, rtts):
+        self.host = host
+        self.sent = sent
+        self.rtts = list(rtts)
+
+    @property
+    def received(self):
+        return len(self.rtts)
+
+    @property
+    def loss_pct(self):
+        return 100.0 * (self.sent - self.received) / self.sent if self.sent else 100.0
+
+    @property
+    def min_ms(self):
+        return min(self.rtts) if self.rtts else None
+
+    @property
+    def max_ms(self):
+        return max(self.rtts) if self.rtts else None
+
+    @property
+    def avg_ms(self):
+        return sum(self.rtts) / len(self.rtts) if self.rtts else None
+
+    @property
+    def jitter_ms(self):
+        # moyenne des écarts entre RTT consécutifs (RFC 3550, sans lissage)
+        if len(self.rtts) < 2:
+            return 0.0 if self.rtts else None
+        return sum(abs(b - a) for a, b in zip(self.rtts, self.rtts[1:])) / (len(self.rtts) - 1)
+
+    def as_dict(self):
+        def r(v):
+            return round(v, 3) if v is not None else None
+
+        return {
+            "sent": self.sent,
+            "received": self.received,
+            "loss_pct": round(self.loss_pct, 1),
+            "min_ms": r(self.min_ms),
+            "avg_ms": r(self.avg_ms),
+            "max_ms": r(self.max_ms),
+            "jitter_ms": r(self.jitter_ms),
+        }
+
+
+class _FamilySocket:
+    def __init__(self, pinger, family):
+        self.pinger = pinger
+        self.family = family
+        self.v6 = family == socket.AF_INET6
+        self.sock, self.raw = _open_socket(family)
+        self.sock.setblocking(False)
+        # socket datagram : le noyau impose l'identifiant (port local), on matche sur la séquence
+        self.ident = os.getpid() & 0xFFFF
+        pinger.loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def send(self, ip: str, seq: int):
+        self.sock.sendto(build_echo(self.ident, seq, self.v6), (ip, 0))
+
+    def _on_readable(self):
+        while True:
+            try:
+                packet, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            parsed = parse_reply(packet, self.raw, self.v6)
+            if parsed is None:
+                continue
+            ident, seq = parsed
+            if self.raw and ident != self.ident:
+                continue  # socket raw : on voit les réponses des autres process
+            self.pinger._resolve(addr[0], seq)
+
+    def close(self):
+        self.pinger.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+
+class AsyncPinger:
+    """
+    Usage (dans une boucle asyncio) :
+        pinger = AsyncPinger()
+        stats = await pinger.ping("192.0.2.1", count=3, timeout=1.0)
+        pinger.close()
+
+    Plusieurs ping() concurrents partagent les mêmes sockets.
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self._sockets = {}
+        self._pending = {}
+        self._seq = itertools.count(int.from_bytes(os.urandom(2), "big"))
+        # vérifie tout de suite qu'on a le droit d'ouvrir une socket ICMP IPv4
+        self._socket_for(socket.AF_INET)
+
+    def _socket_for(self, family):
+        fs = self._sockets.get(family)
+        if fs is None:
+            fs = self._sockets[family] = _FamilySocket(self, family)
+        return fs
+
+    def _resolve(self, ip, seq):
+        key = (ip, seq)
+        fut = self._pending.pop(key, None)
+        if fut and not fut.done():
+            fut.set_result(time.perf_counter())
+
+    async def _resolve_host(self, host: str):
+        infos = await self.loop.getaddrinfo(host, None, type=socket.SOCK_RAW)
+        family, _, _, _, sockaddr = infos[0]
+        return family, sockaddr[0]
+
+    async def _one(self, fs, ip, timeout):
+        seq = next(self._seq) & 0xFFFF
+        fut = self.loop.create_future()
+        self._pending[(ip, seq)] = fut
+        t0 = time.perf_counter()
+        try:
+            fs.send(ip, seq)
+            t1 = await asyncio.wait_for(fut, timeout)
+            return (t1 - t0) * 1000.0
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self._pending.pop((ip, seq), None)
+
+    async def ping(self, host: str, count: int = 1, timeout: float = 1.0, interval: float = 0.2, ip=None):
+        """
+        Envoie `count` echo requests à `host` (espacés de `interval` s).
+        `ip` permet de passer une adresse déjà résolue (cache DNS).
+        """
+        if ip is None:
+            family, ip = await self._resolve_host(host)
+        else:
+            family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        fs = self._socket_for(family)
+
+        tasks = []
+        for i in range(max(1, count)):
+            if i:
+                await asyncio.sleep(interval)
+            tasks.append(asyncio.ensure_future(self._one(fs, ip, timeout)))
+        rtts = await asyncio.gather(*tasks)
+        return PingStats(host, len(rtts), [r for r in rtts if r is not None])
+
+    def close(self):
+        for fs in self._sockets.values():
+            fs.close()
+        self._sockets.clear()
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.cancel()
+        self._pending.clear()
+
+
+def ping(host: str, count: int = 1, timeout: float = 1.0, interval: float = 0.2) -> PingStats:
+    """Version synchrone (un check isolé, shell). Lève IcmpUnavailable si aucune socket ICMP."""
+
+    async def _run():
+        pinger = AsyncPinger()
+        try:
+            return await pinger.ping(host, count=count, timeout=timeout, interval=interval)
+        finally:
+            pinger.close()
+
+    return asyncio.run(_run())
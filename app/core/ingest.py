@@ -0,0 +1,389 @@
+"""
+Ingestion en masse de MetricSample (agents, API /api/ingest/metrics/).
+
+Deux formats, une ligne = un ou plusieurs échantillons :
+- line protocol (type InfluxDB) :
+    cpu,asset=web1,core=0 percent=12.5,idle=80i 1700000000000000000
+  clé = <mesure>_<champ> (ou <mesure> si le champ s'appelle value), asset
+  pris dans le tag asset (ou host), tag unit -> unit, autres tags -> labels ;
+  horodatage en ns par défaut (?precision=s|ms|us|ns), absent -> maintenant.
+- NDJSON :
+    {"asset": "web1", "key": "cpu_percent", "value": 12.5, "unit": "%", "labels": {"core": "0"}, "ts": 1700000000}
+    {"asset": "web1", "ts": "2026-01-01T00:00:00Z", "metrics": {"cpu_percent": 12.5, "ram_percent": 40}}
+
+Le corps (gzip accepté) est lu et validé au fil de l'eau ; les échantillons
+valides sont écrits par lots de INGEST_BATCH_SIZE (COPY sous PostgreSQL,
+bulk_create ailleurs). Une ligne invalide est comptée et ignorée, le reste du
+lot passe. Les noms d'asset sont résolus via un cache nom -> id par process.
+"""
+import json
+import math
+import time
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Asset, MetricSample
+
+READ_BLOCK = 64 * 1024
+MAX_TS = 4102444800  # 2100-01-01
+MAX_ERRORS = 20  # erreurs détaillées renvoyées au client (les autres sont seulement comptées)
+
+PRECISIONS = {"s": 1, "ms": 1e3, "us": 1e6, "ns": 1e9}
+
+_KEY_MAX = MetricSample._meta.get_field("key").max_length
+_UNIT_MAX = MetricSample._meta.get_field("unit").max_length
+_LABELS_MAX = MetricSample._meta.get_field("labels").max_length
+
+
+class IngestError(ValueError):
+    """Ligne rejetée (le message part tel quel dans la réponse)."""
+
+
+class BodyError(Exception):
+    """Corps illisible : l'ingestion s'arrête, ce qui a déjà été écrit reste écrit."""
+
+    status = 400
+
+
+class PayloadTooLarge(BodyError):
+    status = 413
+
+
+# ------------------ lecture du corps ------------------
+
+def iter_lines(stream, gzipped: bool, max_bytes: int):
+    """Lignes (bytes) du corps, décompressées à la volée ; PayloadTooLarge au-delà de max_bytes décompressés."""
+    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    total = 0
+    pending = b""
+    while True:
+        block = stream.read(READ_BLOCK)
+        if not block:
+            break
+        if decomp is not None:
+            try:
+                # max_length borne aussi la décompression d'une bombe gzip
+                block = decomp.decompress(block, max_bytes - total + 1)
+            except zlib.error as e:
+                raise BodyError(f"invalid gzip stream: {e}") from None
+            if decomp.unconsumed_tail:
+                raise PayloadTooLarge(f"payload larger than {max_bytes} bytes")
+        total += len(block)
+        if total > max_bytes:
+            raise PayloadTooLarge(f"payload larger than {max_bytes} bytes")
+        pending += block
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+    if decomp is not None and not decomp.eof:
+        raise BodyError("truncated gzip stream")
+    if pending:
+        yield pending
+
+
+# ------------------ parsing ------------------
+
+def _canonical_labels(tags: dict) -> str:
+    labels = ",".join(f"{k}={v}" for k, v in sorted(tags.items()))
+    if len(labels) > _LABELS_MAX:
+        raise IngestError("labels too long")
+    return labels
+
+
+def _check_key(key: str) -> str:
+    if not key or len(key) > _KEY_MAX:
+        raise IngestError(f"invalid key {key[:_KEY_MAX]!r}")
+    return key
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise IngestError(f"non numeric value {value!r}")
+    value = float(value)
+    if not math.isfinite(value):
+        raise IngestError("non finite value")
+    return value
+
+
+def _split_unescaped(text: str, sep: str, quotes: bool = False):
+    """Découpe sur `sep` hors échappements (\\x) et, si quotes, hors chaînes "...". Les échappements sont conservés."""
+    parts, buf, escaped, quoted = [], [], False, False
+    for ch in text:
+        if escaped:
+            buf.append(ch)
+            escaped = False
+        elif ch == "\\":
+            buf.append(ch)
+            escaped = True
+        elif quotes and ch == '"':
+            quoted = not quoted
+            buf.append(ch)
+        elif ch == sep and not quoted:
+            parts.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+    parts.append("".join(buf))
+    return parts
+
+
+def _unescape(text: str) -> str:
+    for ch in (",", "=", " "):
+        text = text.replace("\\" + ch, ch)
+    return text
+
+
+def _pair(text: str, what: str):
+    parts = _split_unescaped(text, "=", quotes=True)
+    if len(parts) != 2 or not parts[0]:
+        raise IngestError(f"invalid {what} {text!r}")
+    return _unescape(parts[0]), parts[1]
+
+
+def _check_ts(ts: float) -> float:
+    if not 0 < ts < MAX_TS:
+        raise IngestError(f"timestamp out of range {ts!r}")
+    return ts
+
+
+def _lp_field_value(raw: str) -> float:
+    if raw.endswith(("i", "u")) and raw[:-1].lstrip("-").isdigit():
+        return float(int(raw[:-1]))
+    if raw in ("t", "T", "true", "True", "TRUE"):
+        return 1.0
+    if raw in ("f", "F", "false", "False", "FALSE"):
+        return 0.0
+    if raw.startswith('"'):
+        raise IngestError("string fields are not supported")
+    try:
+        return _number(float(raw))
+    except ValueError:
+        raise IngestError(f"invalid field value {raw!r}") from None
+
+
+def parse_line_protocol(line: str, precision: float, now: float):
+    """-> [(asset, key, value, unit, labels, ts)]"""
+    sections = _split_unescaped(line, " ", quotes=True)
+    sections = [s for s in sections if s]
+    if len(sections) not in (2, 3):
+        raise IngestError("expected '<measurement>[,tags] <fields> [timestamp]'")
+
+    head = _split_unescaped(sections[0], ",")
+    measurement, tags = _unescape(head[0]), {}
+    for pair in head[1:]:
+        k, v = _pair(pair, "tag")
+        tags[k] = _unescape(v)
+
+    ts = now
+    if len(sections) == 3:
+        try:
+            ts = _check_ts(int(sections[2]) / precision)
+        except ValueError:
+            raise IngestError(f"invalid timestamp {sections[2]!r}") from None
+
+    asset = tags.pop("asset", None) or tags.pop("host", None)
+    unit = tags.pop("unit", "")[:_UNIT_MAX]
+    labels = _canonical_labels(tags)
+
+    samples = []
+    for pair in _split_unescaped(sections[1], ",", quotes=True):
+        field, raw = _pair(pair, "field")
+        key = measurement if field == "value" else f"{measurement}_{field}"
+        samples.append((asset, _check_key(key), _lp_field_value(raw), unit, labels, ts))
+    return samples
+
+
+def _json_ts(value, now: float) -> float:
+    if value is None:
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # secondes epoch ; au-delà on suppose des ms / us / ns (3 paliers au plus)
+        if not math.isfinite(value) or not 0 < value < MAX_TS * 1e9:
+            raise IngestError(f"timestamp out of range {value!r}")
+        for _ in range(3):
+            if value <= 1e11:
+                break
+            value /= 1000
+        return _check_ts(float(value))
+    if isinstance(value, str):
+        dt = parse_datetime(value)
+        if dt is not None:
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=dt_timezone.utc)
+            return _check_ts(dt.timestamp())
+    raise IngestError(f"invalid ts {value!r}")
+
+
+def parse_json_line(line: str, now: float):
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        raise IngestError("invalid JSON") from None
+    if not isinstance(obj, dict):
+        raise IngestError("expected a JSON object")
+
+    asset = obj.get("asset")
+    if asset is not None and not isinstance(asset, str):
+        raise IngestError("asset must be a string")
+    labels = obj.get("labels") or ""
+    if isinstance(labels, dict):
+        labels = _canonical_labels({str(k): str(v) for k, v in labels.items()})
+    elif not isinstance(labels, str) or len(labels) > _LABELS_MAX:
+        raise IngestError("invalid labels")
+    unit = str(obj.get("unit") or "")[:_UNIT_MAX]
+    ts = _json_ts(obj.get("ts"), now)
+
+    if "metrics" in obj:
+        metrics = obj["metrics"]
+        if not isinstance(metrics, dict) or not metrics:
+            raise IngestError("metrics must be a non empty object")
+        return [(asset, _check_key(str(k)), _number(v), unit, labels, ts) for k, v in metrics.items()]
+    return [(asset, _check_key(str(obj.get("key") or "")), _number(obj.get("value")), unit, labels, ts)]
+
+
+# ------------------ assets : cache nom -> id ------------------
+
+class AssetNameCache:
+    """
+    Nom -> id, par process ; les noms absents sont résolus en 1 requête par lot.
+    Pas de cache négatif : un asset créé entre-temps (dans un autre process) est
+    accepté dès le lot suivant, un nom inconnu coûte juste sa part de la requête.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._ids = {}
+        self._loaded_at = 0.0
+
+    def resolve(self, names) -> dict:
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self._ids = {}
+            self._loaded_at = time.monotonic()
+        missing = {n for n in names if n not in self._ids}
+        if missing:
+            self._ids.update(Asset.objects.filter(name__in=missing).values_list("name", "id"))
+        return {n: self._ids.get(n) for n in names}
+
+
+_asset_cache = None
+
+
+def asset_cache() -> AssetNameCache:
+    global _asset_cache
+    if _asset_cache is None:
+        _asset_cache = AssetNameCache(settings.INGEST_ASSET_CACHE_TTL)
+    return _asset_cache
+
+
+# ------------------ écriture ------------------
+
+_COLUMNS = ("asset", "key", "value", "unit", "labels", "recorded_at")
+
+
+def _copy_rows(rows):
+    table = connection.ops.quote_name(MetricSample._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(MetricSample._meta.get_field(c).column) for c in _COLUMNS)
+    with connection.cursor() as cur:
+        with cur.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def write_samples(rows):
+    """rows : [(asset_id, key, value, unit, labels, recorded_at)]."""
+    if not rows:
+        return
+    if connection.vendor == "postgresql" and settings.INGEST_USE_COPY:
+        _copy_rows(rows)
+    else:
+        MetricSample.objects.bulk_create(
+            [MetricSample(**dict(zip(_COLUMNS[1:], row[1:])), asset_id=row[0]) for row in rows],
+            batch_size=1000,
+        )
+
+
+class IngestReport:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.lines = 0
+        self.errors = []
+        self.error = None  # BodyError : lecture interrompue
+
+    def reject(self, lineno: int, error: str, count: int = 1):
+        self.rejected += count
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": lineno, "error": error})
+
+    def as_dict(self) -> dict:
+        data = {"accepted": self.accepted, "rejected": self.rejected, "lines": self.lines, "errors": self.errors}
+        if self.error:
+            data["error"] = str(self.error)
+        return data
+
+
+def _flush(pending, report: IngestReport):
+    names = {s[0] for _, s in pending if s[0]}
+    ids = asset_cache().resolve(names) if names else {}
+    rows = []
+    for lineno, (asset, key, value, unit, labels, ts) in pending:
+        asset_id = None
+        if asset:
+            asset_id = ids.get(asset)
+            if asset_id is None:
+                report.reject(lineno, f"unknown asset {asset!r}")
+                continue
+        rows.append((asset_id, key, value, unit, labels, datetime.fromtimestamp(ts, dt_timezone.utc)))
+    with transaction.atomic():
+        write_samples(rows)
+    report.accepted += len(rows)
+
+
+def ingest(lines, fmt: str, precision: str = "ns") -> IngestReport:
+    """lines : itérable de bytes (iter_lines) ; fmt : 'line' ou 'ndjson' ; precision : clé de PRECISIONS."""
+    report = IngestReport()
+    scale = PRECISIONS[precision]
+    now = time.time()
+    batch_size = max(1, settings.INGEST_BATCH_SIZE)
+    pending = []
+
+    try:
+        for lineno, raw in enumerate(lines, 1):
+            _ingest_line(lineno, raw, fmt, scale, now, pending, report)
+            if len(pending) >= batch_size:
+                _flush(pending, report)
+                pending = []
+    except BodyError as e:
+        # les lignes déjà lues mais pas encore écrites sont perdues : l'agent renverra le lot
+        report.error = e
+        report.rejected += len(pending)
+        return report
+
+    if pending:
+        _flush(pending, report)
+    return report
+
+
+def _parse(raw: bytes, fmt: str, scale: float, now: float):
+    text = raw.decode("utf-8")
+    if fmt == "ndjson":
+        return parse_json_line(text, now)
+    return parse_line_protocol(text, scale, now)
+
+
+def _ingest_line(lineno, raw, fmt, scale, now, pending, report):
+    line = raw.strip()
+    if not line or line.startswith(b"#"):
+        return
+    report.lines += 1
+    try:
+        pending.extend((lineno, s) for s in _parse(line, fmt, scale, now))
+    except UnicodeDecodeError:
+        report.reject(lineno, "invalid UTF-8")
+    except IngestError as e:
+        report.reject(lineno, str(e))
+    except (ValueError, OverflowError) as e:  # date / nombre hors bornes
+        report.reject(lineno, f"invalid value: {e}")
@@ -0,0 +1,442 @@
+"""
+Instrumentation du pipeline d'exécution des checks.
+
+Registre de métriques en mémoire (compteurs, jauges, histogrammes) alimenté
+par le chemin chaud : run_all_checks (lag de planification, durée du sweep,
+backlog, profondeur de la file Celery), run_check_batch / run_check (lag de
+démarrage, durée des sondes par kind, checks ignorés) et ResultSink (temps
+d'écriture en base et de traitement des alertes).
+
+Chaque process (worker prefork, beat, web) a son registre ; les workers
+publient un instantané dans un hash Redis au plus toutes les
+INSTRUMENTATION_PUSH_SECONDS, et /metrics fusionne les instantanés frais
+(compteurs et histogrammes sommés, jauge la plus récente) au format
+OpenMetrics texte.
+
+Un instantané sans mise à jour depuis INSTRUMENTATION_STALE_SECONDS
+(process arrêté ou inactif) est retiré du hash mais ses compteurs et
+histogrammes sont cumulés dans un instantané « retraités » : les _total
+exportés ne baissent jamais (pas de faux reset pour rate()). Un process
+retiré qui publie de nouveau retranche d'abord ce qu'il avait publié
+(scripts Lua : retrait et publication sont atomiques l'un vis-à-vis de
+l'autre, rien n'est compté deux fois).
+
+INSTRUMENTATION_ENABLED=0 : chaque point de mesure se réduit à un test
+de booléen, rien n'est publié.
+"""
+import bisect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .live import get_redis
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_KEY = "arcane:metrics:snapshots"
+RETIRED_KEY = "arcane:metrics:retired"  # cumul des process retirés (JSON)
+RETIRED_FIELDS_KEY = "arcane:metrics:retired_fields"  # zset process -> date de retrait
+RETIRED_FIELDS_MEMORY = 86400  # un process muet plus longtemps est oublié
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# secondes : du ms (écriture d'un petit lot) aux minutes (backlog)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def enabled() -> bool:
+    return settings.INSTRUMENTATION_ENABLED
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels=(), unit: str = ""):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.unit = unit
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), self._export(v)] for k, v in self._values.items()]
+
+    def _export(self, value):
+        return value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not enabled() or not amount:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        if not enabled():
+            return
+        with self._lock:
+            self._values[self._key(labels)] = (value, time.time())
+
+    def _export(self, value):
+        return list(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), unit: str = "seconds", buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels, unit)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not enabled() or value is None:
+            return
+        self.observe_many((value,), **labels)
+
+    def observe_many(self, values, **labels):
+        """Plusieurs observations sous un seul verrou (lags d'un lot entier)."""
+        if not enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            for v in values:
+                counts[bisect.bisect_left(self.buckets, v)] += 1
+                total += v
+                n += 1
+            self._values[key] = (counts, total, n)
+
+    def _export(self, value):
+        counts, total, n = value
+        return {"counts": list(counts), "sum": total, "count": n}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), unit=""):
+        return self._add(Gauge(name, help, labels, unit))
+
+    def histogram(self, name, help, labels=(), unit="seconds", buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, unit, buckets))
+
+    def snapshot(self) -> dict:
+        metrics = {}
+        for m in self._metrics.values():
+            values = m.dump()
+            if values:
+                metrics[m.name] = values
+        return {"ts": time.time(), "metrics": metrics}
+
+    def reset(self):
+        for m in self._metrics.values():
+            with m._lock:
+                m._values.clear()
+
+    def subtract(self, snapshot):
+        """Retranche un instantané déjà publié (compteurs, histogrammes) : il est compté chez les retraités."""
+        for name, values in snapshot.get("metrics", {}).items():
+            m = self._metrics.get(name)
+            if m is None or m.type == "gauge":
+                continue
+            with m._lock:
+                for labels, value in values:
+                    key = tuple(labels)
+                    current = m._values.get(key)
+                    if current is None:
+                        continue
+                    if m.type == "counter":
+                        m._values[key] = current - value
+                    else:
+                        counts, total, n = current
+                        if len(counts) == len(value["counts"]):
+                            m._values[key] = (
+                                [a - b for a, b in zip(counts, value["counts"])],
+                                total - value["sum"],
+                                n - value["count"],
+                            )
+
+    def cumulative(self, snapshots) -> dict:
+        """Fusion de `snapshots` réduite aux compteurs et histogrammes, au format instantané."""
+        metrics = {}
+        for name, values in self.merge(snapshots).items():
+            if self._metrics[name].type != "gauge":
+                metrics[name] = [[list(k), v] for k, v in values.items()]
+        return {"ts": time.time(), "metrics": metrics}
+
+    def merge(self, snapshots):
+        """Instantanés -> {name: {label_key: valeur}} : sommes pour compteurs/histogrammes, jauge la plus récente."""
+        merged = {}
+        for snap in snapshots:
+            for name, values in snap.get("metrics", {}).items():
+                m = self._metrics.get(name)
+                if m is None:
+                    continue  # métrique retirée depuis la publication
+                out = merged.setdefault(name, {})
+                for labels, value in values:
+                    key = tuple(labels)
+                    prev = out.get(key)
+                    if m.type == "counter":
+                        out[key] = (prev or 0) + value
+                    elif m.type == "gauge":
+                        if prev is None or value[1] >= prev[1]:
+                            out[key] = value
+                    elif prev is None:
+                        out[key] = {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+                    elif len(prev["counts"]) == len(value["counts"]):
+                        prev["counts"] = [a + b for a, b in zip(prev["counts"], value["counts"])]
+                        prev["sum"] += value["sum"]
+                        prev["count"] += value["count"]
+        return merged
+
+    def render(self, snapshots) -> str:
+        merged = self.merge(snapshots)
+        lines = []
+        for m in self._metrics.values():
+            lines.append(f"# TYPE {m.name} {m.type}")
+            if m.unit:
+                lines.append(f"# UNIT {m.name} {m.unit}")
+            lines.append(f"# HELP {m.name} {_escape(m.help)}")
+            for key, value in sorted(merged.get(m.name, {}).items()):
+                labels = list(zip(m.labels, key))
+                if m.type == "counter":
+                    lines.append(f"{m.name}_total{_labels(labels)} {_num(value)}")
+                elif m.type == "gauge":
+                    lines.append(f"{m.name}{_labels(labels)} {_num(value[0])}")
+                else:
+                    cumulative = 0
+                    for bound, count in zip((*m.buckets, None), value["counts"]):
+                        cumulative += count
+                        le = "+Inf" if bound is None else _num(float(bound))
+                        lines.append(f"{m.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{m.name}_count{_labels(labels)} {value['count']}")
+                    lines.append(f"{m.name}_sum{_labels(labels)} {_num(value['sum'])}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(value) -> str:
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+registry = Registry()
+
+# ------------------ métriques du pipeline ------------------
+
+SWEEP_DURATION = registry.histogram(
+    "arcane_sweep_duration_seconds", "run_all_checks: réservation des checks échus + dispatch des lots")
+SWEEP_CLAIMED = registry.counter("arcane_sweep_claimed_checks", "Checks réservés par run_all_checks")
+SCHEDULE_LAG = registry.histogram(
+    "arcane_schedule_lag_seconds", "Réservation par le tick moins échéance (next_run_at) : retard beat/scheduler")
+START_LAG = registry.histogram(
+    "arcane_start_lag_seconds", "Début d'exécution du lot moins échéance : retard total (beat + broker + workers)")
+BACKLOG = registry.gauge(
+    "arcane_due_backlog_checks", "Checks échus laissés au tick suivant (SCHEDULER_MAX_PER_TICK atteint)")
+QUEUE_DEPTH = registry.gauge(
+    "arcane_celery_queue_depth_messages", "Messages en attente dans la file Celery", ("queue",))
+BATCH_DURATION = registry.histogram("arcane_batch_duration_seconds", "Durée d'un run_check_batch")
+PROBE_DURATION = registry.histogram(
+    "arcane_probe_duration_seconds", "Durée d'une sonde (hors attente des sémaphores)", ("kind",))
+PROBE_RESULTS = registry.counter("arcane_probe_results", "Résultats produits", ("kind", "ok"))
+CHECKS_SKIPPED = registry.counter(
+    "arcane_checks_skipped", "Checks non sondés : disabled (désactivé depuis la réservation), "
+    "cert_cached (ssl_expiry servi par l'inventaire)", ("reason",))
+PERSIST_DURATION = registry.histogram(
+    "arcane_sink_persist_duration_seconds", "ResultSink.flush : CheckResult + last_run_at + rollups + CheckStatus")
+ALERTS_DURATION = registry.histogram(
+    "arcane_sink_alerts_duration_seconds", "ResultSink.flush : transitions d'alertes")
+SINK_WRITTEN = registry.counter("arcane_sink_written_results", "Résultats écrits par le ResultSink")
+
+
+# ------------------ publication inter-process ------------------
+
+_process_id = f"{socket.gethostname()}:{os.getpid()}"
+_last_push = 0.0
+_pushed = None  # dernier instantané publié par ce process
+
+# publie, sauf si le process a été retiré entre-temps (0) : il doit d'abord retrancher son dernier instantané
+_PUSH_LUA = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+# retire un instantané périmé s'il n'a pas changé depuis sa lecture
+_RETIRE_LUA = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+return 1
+"""
+
+
+def _field() -> str:
+    # recalculé après fork (workers prefork)
+    global _process_id
+    pid = os.getpid()
+    if not _process_id.endswith(f":{pid}"):
+        _process_id = f"{socket.gethostname()}:{pid}"
+    return _process_id
+
+
+def _push(r, field, snap) -> bool:
+    return bool(r.eval(_PUSH_LUA, 2, SNAPSHOTS_KEY, RETIRED_FIELDS_KEY, field, json.dumps(snap)))
+
+
+def maybe_push(force: bool = False):
+    """Publie l'instantané de ce process au plus toutes les INSTRUMENTATION_PUSH_SECONDS. Best effort."""
+    global _last_push, _pushed
+    if not enabled():
+        return
+    now = time.monotonic()
+    if not force and now - _last_push < settings.INSTRUMENTATION_PUSH_SECONDS:
+        return
+    _last_push = now
+    try:
+        r = get_redis()
+        field = _field()
+        snap = registry.snapshot()
+        if not _push(r, field, snap):
+            # retiré pendant une période d'inactivité : le dernier instantané est déjà chez les retraités
+            if _pushed is not None:
+                registry.subtract(_pushed)
+            snap = registry.snapshot()
+            _push(r, field, snap)
+        _pushed = snap
+    except redis.RedisError as e:
+        logger.warning("metrics snapshot push failed: %s", e)
+
+
+def _retire(r, claimed):
+    """Cumule les instantanés retirés dans RETIRED_KEY (transaction WATCH) -> instantané des retraités."""
+    def fold(pipe):
+        raw = pipe.get(RETIRED_KEY)
+        retired = registry.cumulative([json.loads(raw) if raw else {}, *claimed])
+        pipe.multi()
+        pipe.set(RETIRED_KEY, json.dumps(retired))
+        return retired
+
+    return r.transaction(fold, RETIRED_KEY, value_from_callable=True)
+
+
+def collect_snapshots():
+    """
+    Instantanés frais des autres process + celui de ce process + cumul des
+    retraités ; les périmés passent dans le cumul.
+    """
+    own = _field()
+    maybe_push(force=True)  # ce process a pu être retiré : retranche avant de se compter
+    snapshots = [registry.snapshot()]
+    try:
+        r = get_redis()
+        raw = r.hgetall(SNAPSHOTS_KEY)
+        retired_raw = r.get(RETIRED_KEY)
+    except redis.RedisError as e:
+        logger.warning("metrics snapshot read failed: %s", e)
+        return snapshots
+
+    try:
+        retired = json.loads(retired_raw) if retired_raw else None
+    except ValueError:
+        retired = None
+    invalid, claimed = [], []
+    now = time.time()
+    cutoff = now - settings.INSTRUMENTATION_STALE_SECONDS
+    try:
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field == own:
+                continue
+            try:
+                snap = json.loads(value)
+            except ValueError:
+                invalid.append(field)
+                continue
+            if snap.get("ts", 0) >= cutoff:
+                snapshots.append(snap)
+            elif r.eval(_RETIRE_LUA, 2, SNAPSHOTS_KEY, RETIRED_FIELDS_KEY, field, value, now,
+                        now - RETIRED_FIELDS_MEMORY):
+                claimed.append(snap)  # process arrêté ou inactif : ses compteurs restent dans l'agrégat
+        if invalid:
+            r.hdel(SNAPSHOTS_KEY, *invalid)
+        if claimed:
+            retired = _retire(r, claimed)
+    except redis.RedisError as e:
+        logger.warning("metrics snapshot retire failed: %s", e)
+    if retired:
+        snapshots.append(retired)
+    return snapshots
+
+
+def render_openmetrics() -> str:
+    return registry.render(collect_snapshots())
+
+
+# ------------------ mesures ponctuelles ------------------
+
+_broker = None
+
+
+def celery_queue_depth(queue: str = "celery"):
+    """LLEN de la file Celery (broker Redis uniquement), None sinon ou en cas d'erreur."""
+    global _broker
+    url = settings.CELERY_BROKER_URL
+    if not url.startswith(("redis://", "rediss://")):
+        return None
+    try:
+        if _broker is None:
+            _broker = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        return _broker.llen(queue)
+    except redis.RedisError:
+        return None
+
+
+def summarize(values) -> dict:
+    """p50 / max (secondes) pour la ligne de log d'un sweep."""
+    if not values:
+        return {"p50": None, "max": None}
+    ordered = sorted(values)
+    return {"p50": round(ordered[len(ordered) // 2], 3), "max": round(ordered[-1], 3)}
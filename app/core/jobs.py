@@ -0,0 +1,211 @@
+"""
+Exécution des jobs (Job / JobLog) et suivi en direct.
+
+- actions : fonctions enregistrées par @action("nom"), appelées avec
+  (job, payload, log) ; une exception = job failed ;
+- JobLogSink : la sortie est bufferisée et écrite par bulk_create de
+  JOB_LOG_FLUSH_LINES lignes, ou au bout de JOB_LOG_FLUSH_SECONDS quand le
+  job est peu bavard ; un job verbeux fait une requête par paquet, pas par ligne ;
+- tail : les lignes d'un job après un curseur (id du dernier JobLog vu), via
+  l'index (job, id) : suivre un job coûte O(nouvelles lignes). Un seul sink
+  par job et un commit par flush : les ids d'un job sont visibles dans l'ordre,
+  un lecteur ne saute jamais de ligne.
+"""
+import codecs
+import json
+import os
+import selectors
+import subprocess
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job, JobLog
+
+ACTIONS = {}
+
+
+class JobError(Exception):
+    pass
+
+
+def action(name: str):
+    """Enregistre une action exécutable par run_job (Job.action)."""
+    def register(fn):
+        ACTIONS[name] = fn
+        return fn
+    return register
+
+
+class JobLogSink:
+    """
+    Usage:
+        with JobLogSink(job) as log:
+            log.write("sortie brute, éventuellement sans fin de ligne")
+            log.line("une ligne")
+
+    Flush quand le buffer atteint max_lines, quand la plus vieille ligne a plus
+    de max_age secondes (à l'écriture ou via maybe_flush()) et à la sortie du with.
+    """
+
+    def __init__(self, job: Job, max_lines: int = 200, max_age: float = 1.0, max_line: int = 4000):
+        self.job = job
+        self.max_lines = max(1, max_lines)
+        self.max_age = max_age
+        self.max_line = max_line
+        self._buffer = []
+        self._partial = ""
+        self._first_at = None
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._partial:
+            self._append(self._partial)
+            self._partial = ""
+        self.flush()
+        return False
+
+    def _append(self, line: str):
+        if not self._buffer:
+            self._first_at = time.monotonic()
+        self._buffer.append(line.rstrip("\r")[:self.max_line])
+
+    def write(self, text: str):
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            self._append(line)
+        if len(self._partial) > self.max_line:
+            # ligne sans fin (barre de progression...) : coupée plutôt que gardée en mémoire
+            self._append(self._partial)
+            self._partial = ""
+        self.maybe_flush()
+
+    def line(self, text: str):
+        # une ligne complète : une éventuelle sortie sans fin de ligne reste sur sa propre ligne
+        if self._partial:
+            self._append(self._partial)
+            self._partial = ""
+        self.write(f"{text}\n")
+
+    def maybe_flush(self):
+        if self._buffer and (
+            len(self._buffer) >= self.max_lines or (time.monotonic() - self._first_at) >= self.max_age
+        ):
+            self.flush()
+
+    def seconds_until_flush(self):
+        """Attente max avant le prochain flush dû (None si buffer vide), pour les boucles de lecture."""
+        if not self._buffer:
+            return None
+        return max(0.0, self.max_age - (time.monotonic() - self._first_at))
+
+    def flush(self):
+        items, self._buffer = self._buffer, []
+        self._first_at = None
+        if not items:
+            return 0
+        JobLog.objects.bulk_create([JobLog(job=self.job, line=line) for line in items], batch_size=1000)
+        self.written += len(items)
+        return len(items)
+
+
+def _log_sink(job: Job) -> JobLogSink:
+    return JobLogSink(
+        job,
+        max_lines=settings.JOB_LOG_FLUSH_LINES,
+        max_age=settings.JOB_LOG_FLUSH_SECONDS,
+        max_line=settings.JOB_LOG_MAX_LINE,
+    )
+
+
+def run_subprocess(argv, log: JobLogSink, timeout: float):
+    """Lance argv et envoie stdout+stderr au sink au fil de l'eau ; JobError si code retour != 0 ou timeout."""
+    log.line(f"$ {' '.join(argv)}")
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    deadline = time.monotonic() + timeout
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                proc.kill()
+                raise JobError(f"timeout after {timeout:.0f}s")
+            wait = log.seconds_until_flush()
+            # réveil au plus tard à l'échéance du flush : un job silencieux montre quand même ses dernières lignes
+            if not sel.select(min(remaining, wait if wait is not None else remaining, 5.0)):
+                log.maybe_flush()
+                continue
+            chunk = os.read(proc.stdout.fileno(), 65536)
+            if not chunk:
+                break
+            log.write(decoder.decode(chunk))
+        log.write(decoder.decode(b"", final=True))
+        code = proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        raise JobError(f"timeout after {timeout:.0f}s") from None
+    finally:
+        sel.close()
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    if code != 0:
+        raise JobError(f"exit code {code}")
+
+
+def execute(job_id: int):
+    """queued -> running -> success/failed. Renvoie le statut final, None si le job n'était pas en file."""
+    if not Job.objects.filter(id=job_id, status="queued").update(status="running", started_at=timezone.now()):
+        return None  # déjà pris par un autre worker (ou pas en file)
+    job = Job.objects.select_related("asset").get(id=job_id)
+
+    status = "failed"
+    with _log_sink(job) as log:
+        try:
+            fn = ACTIONS.get(job.action)
+            if fn is None:
+                raise JobError(f"unknown action {job.action!r} (available: {', '.join(sorted(ACTIONS))})")
+            try:
+                payload = json.loads(job.payload_json) if job.payload_json.strip() else {}
+            except ValueError as e:
+                raise JobError(f"invalid payload_json: {e}") from None
+            fn(job, payload, log)
+            status = "success"
+        except Exception as e:
+            log.line(f"ERROR: {e}")
+    # statut final après le dernier flush : un client qui voit finished a toutes les lignes
+    Job.objects.filter(id=job_id).update(status=status, finished_at=timezone.now())
+    return status
+
+
+def tail(job_id: int, after: int = 0, limit: int = 500):
+    """-> (lignes [(id, line, created_at)], has_more) après le curseur `after` (id JobLog)."""
+    rows = list(
+        JobLog.objects.filter(job_id=job_id, id__gt=after)
+        .order_by("id")
+        .values_list("id", "line", "created_at")[:limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+# ------------------ actions ------------------
+
+def _asset_host(job: Job, payload: dict) -> str:
+    host = (payload.get("host") or (job.asset.ip_or_host if job.asset else "") or "").strip()
+    if not host or host.startswith("-"):
+        raise JobError("no host (payload.host or job asset)")
+    return host
+
+
+@action("ping")
+def ping_action(job, payload, log):
+    """payload: {"host"?: str, "count"?: int} ; hôte de l'asset par défaut."""
+    count = max(1, min(int(payload.get("count", 4)), 100))
+    run_subprocess(["ping", "-c", str(count), _asset_host(job, payload)], log, settings.JOB_TIMEOUT_SECONDS)
@@ -0,0 +1,194 @@
+"""
+Listes assets / checks / alerts / results : filtres, clé de tri, colonnes.
+
+Partagé par les pages HTML, les API JSON paginées par curseur
+(core/pagination.py) et l'export CSV / NDJSON en flux.
+
+L'export lit par lots avec un curseur côté serveur (.iterator(), curseur
+nommé sous PostgreSQL) : la mémoire reste bornée quelle que soit la taille
+de la table.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Alert, Asset, Check, CheckResult
+from .search import search_assets
+from .series import parse_duration
+from .tags import filter_by_tags, normalize_tags
+
+
+class ListSpec:
+    def __init__(self, ordering, columns, queryset):
+        self.ordering = ordering  # clé keyset (non nulle, finit par id)
+        self.columns = columns  # colonnes .values() des API / exports
+        self.queryset = queryset  # params GET -> queryset filtré
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bool(value):
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    return None
+
+
+def _assets(params):
+    qs = Asset.objects.all()
+    tags = normalize_tags(",".join(params.getlist("tag")))
+    if tags:
+        qs = filter_by_tags(qs, tags)
+    return search_assets(qs, params.get("q"))
+
+
+def _checks(params):
+    # état courant par jointure sur CheckStatus (core/checkstatus.py)
+    qs = Check.objects.select_related("asset", "status")
+    asset_id = _int(params.get("asset"))
+    if asset_id is not None:
+        qs = qs.filter(asset_id=asset_id)
+    if params.get("kind"):
+        qs = qs.filter(kind=params["kind"])
+    enabled = _bool(params.get("enabled"))
+    if enabled is not None:
+        qs = qs.filter(is_enabled=enabled)
+    return qs
+
+
+def _alerts(params):
+    qs = Alert.objects.select_related("monitor_check", "monitor_check__asset")
+    is_open = _bool(params.get("open"))
+    if is_open is not None:
+        qs = qs.filter(is_open=is_open)
+    check_id = _int(params.get("check"))
+    if check_id is not None:
+        qs = qs.filter(monitor_check_id=check_id)
+    asset_id = _int(params.get("asset"))
+    if asset_id is not None:
+        qs = qs.filter(monitor_check__asset_id=asset_id)
+    return qs
+
+
+def _results(params):
+    qs = CheckResult.objects.all()
+    check_id = _int(params.get("check"))
+    if check_id is not None:
+        qs = qs.filter(monitor_check_id=check_id)
+    asset_id = _int(params.get("asset"))
+    if asset_id is not None:
+        qs = qs.filter(monitor_check__asset_id=asset_id)
+    ok = _bool(params.get("ok"))
+    if ok is not None:
+        qs = qs.filter(ok=ok)
+    # ?since=24h : fenêtre glissante (borne aussi les partitions lues)
+    since = parse_duration(params.get("since"), None)
+    if since is not None:
+        qs = qs.filter(recorded_at__gte=timezone.now() - since)
+    return qs
+
+
+LISTS = {
+    "assets": ListSpec(
+        ("name", "id"),
+        ("id", "name", "asset_type", "ip_or_host", "address", "tags", "description", "created_at"),
+        _assets,
+    ),
+    "checks": ListSpec(
+        ("asset__name", "name", "id"),
+        ("id", "asset_id", "asset__name", "name", "kind", "target", "port", "interval_seconds",
+         "is_enabled", "last_run_at", "next_run_at", "status__ok", "status__latency_ms", "status__last_result_at",
+         "status__last_change_at", "status__consecutive_failures"),
+        _checks,
+    ),
+    "alerts": ListSpec(
+        ("-opened_at", "-id"),
+        ("id", "monitor_check_id", "monitor_check__asset__name", "monitor_check__name", "severity",
+         "is_open", "title", "opened_at", "closed_at"),
+        _alerts,
+    ),
+    "results": ListSpec(
+        ("-recorded_at", "-id"),
+        ("id", "monitor_check_id", "ok", "status_code", "latency_ms", "message", "timings", "recorded_at"),
+        _results,
+    ),
+}
+
+
+def ordering_for(kind: str, params):
+    """Recherche sur les assets : classement d'abord (annotation rank de core/search.py)."""
+    spec = LISTS[kind]
+    if kind == "assets" and (params.get("q") or "").strip():
+        return ("-rank",) + spec.ordering
+    return spec.ordering
+
+
+def api_fields(kind: str, ordering):
+    """Colonnes de l'API + champs de la clé absents des colonnes (ex: rank)."""
+    columns = LISTS[kind].columns
+    return columns + tuple(o.lstrip("-") for o in ordering if o.lstrip("-") not in columns)
+
+
+def page_limit(params, default: int) -> int:
+    limit = _int(params.get("limit")) or default
+    return max(1, min(limit, settings.LIST_PAGE_MAX))
+
+
+# ------------------ export en flux ------------------
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(kind: str, params):
+    spec = LISTS[kind]
+    qs = spec.queryset(params).order_by(*ordering_for(kind, params)).values_list(*spec.columns)
+    return qs.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _chunked(lines, size: int):
+    # un yield par lot de lignes plutôt qu'une par ligne (moins d'allers-retours WSGI)
+    buf = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= size:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def stream_csv(kind: str, params):
+    writer = csv.writer(_Echo())
+    columns = LISTS[kind].columns
+
+    def lines():
+        yield writer.writerow(columns)
+        for row in _export_rows(kind, params):
+            yield writer.writerow(
+                [json.dumps(v, cls=DjangoJSONEncoder) if isinstance(v, (dict, list)) else v for v in row]
+            )
+
+    return _chunked(lines(), settings.EXPORT_CHUNK_SIZE)
+
+
+def stream_ndjson(kind: str, params):
+    columns = LISTS[kind].columns
+
+    def lines():
+        for row in _export_rows(kind, params):
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+    return _chunked(lines(), settings.EXPORT_CHUNK_SIZE)
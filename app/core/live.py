@@ -0,0 +1,64 @@
+"""
+Live updates : Redis pub/sub -> Server-Sent Events.
+
+Chaque flush du ResultSink publie UN message (les résultats du lot, les
+alertes ouvertes/fermées et un delta de résumé) sur le canal Redis ; chaque
+navigateur connecté à /live/events/ le reçoit via son abonnement. Un résultat
+= une diffusion, pas N recalculs de dashboard.
+"""
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "arcane:live"
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _client
+
+
+def publish(event: str, data: dict):
+    """Best effort : une panne Redis ne doit jamais casser l'écriture des résultats."""
+    if not settings.LIVE_UPDATES_ENABLED:
+        return
+    try:
+        get_redis().publish(CHANNEL, json.dumps({"event": event, "data": data}, cls=DjangoJSONEncoder))
+    except redis.RedisError as e:
+        logger.warning("live publish failed: %s", e)
+
+
+def format_sse(event: str, data) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_events(heartbeat: float = 15.0):
+    """Générateur async de trames SSE pour un client (un abonnement Redis par connexion)."""
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(CHANNEL)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if msg is None:
+                yield ": keepalive\n\n"
+                continue
+            body = json.loads(msg["data"])
+            yield format_sse(body["event"], body["data"])
+    finally:
+        await pubsub.unsubscribe(CHANNEL)
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,151 @@
+import json
+import platform
+import random
+import sys
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import bench
+from core.models import Check
+from core.summary import compute_dashboard_summary
+
+KINDS = ("ping", "tcp_port", "http", "ssl_expiry")
+
+
+class Command(BaseCommand):
+    help = (
+        "Banc de mesure reproductible (core/bench.py) : cibles locales, jeu de données généré, "
+        "débit des sweeps, écritures/s, latences et requêtes SQL des vues. Sortie JSON. "
+        "À lancer sur une base de test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assets", type=int, default=50)
+        parser.add_argument("--checks-per-asset", type=int, default=4)
+        parser.add_argument("--kinds", default="tcp_port,http,ssl_expiry", help=f"parmi {','.join(KINDS)}")
+        parser.add_argument("--history-hours", type=float, default=24.0)
+        parser.add_argument("--result-interval", type=int, default=300, help="secondes entre deux CheckResult générés")
+        parser.add_argument("--metric-interval", type=int, default=300, help="secondes entre deux MetricSample générés")
+        parser.add_argument("--metric-keys", type=int, default=3, help=f"clés par asset (max {len(bench.METRIC_KEYS)})")
+        parser.add_argument("--sweeps", type=int, default=3)
+        parser.add_argument("--run-check", type=int, default=50, help="nb d'appels run_check mesurés")
+        parser.add_argument("--requests", type=int, default=30, help="requêtes mesurées par vue")
+        parser.add_argument("--http-delay-ms", type=int, default=0)
+        parser.add_argument("--http-status", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="bench-")
+        parser.add_argument("--output", help="fichier JSON (défaut: stdout)")
+        parser.add_argument("--keep", action="store_true", help="ne pas supprimer les données générées")
+        parser.add_argument(
+            "--allow-existing-checks",
+            action="store_true",
+            help="lancer même si la base contient d'autres checks actifs (run_all_checks les sondera aussi)",
+        )
+
+    def handle(self, *args, **opts):
+        kinds = [k.strip() for k in opts["kinds"].split(",") if k.strip()]
+        if not kinds or any(k not in KINDS for k in kinds):
+            raise CommandError(f"--kinds : valeurs possibles {', '.join(KINDS)}")
+        prefix = opts["prefix"]
+        if not prefix:
+            raise CommandError("--prefix ne peut pas être vide (il sert au nettoyage)")
+        if Check.objects.filter(asset__name__startswith=prefix).exists():
+            raise CommandError(f"Des assets {prefix}* existent déjà (run précédent avec --keep ?)")
+        if not opts["allow_existing_checks"] and Check.objects.filter(is_enabled=True, asset__is_enabled=True).exists():
+            raise CommandError("La base contient des checks actifs : base de test attendue (--allow-existing-checks pour forcer)")
+
+        rng = random.Random(opts["seed"])
+        report = {
+            "started_at": timezone.now().isoformat(),
+            "environment": {
+                "python": sys.version.split()[0],
+                "django": django.get_version(),
+                "platform": platform.platform(),
+                "db_vendor": connection.vendor,
+                "probe_batch_size": settings.PROBE_BATCH_SIZE,
+                "probe_concurrency": settings.PROBE_CONCURRENCY,
+                "result_sink_max_size": settings.RESULT_SINK_MAX_SIZE,
+            },
+            "params": {k: opts[k] for k in (
+                "assets", "checks_per_asset", "kinds", "history_hours", "result_interval", "metric_interval",
+                "metric_keys", "sweeps", "run_check", "requests", "http_delay_ms", "http_status", "seed",
+            )},
+        }
+
+        targets = bench.StandIns(opts["http_delay_ms"], opts["http_status"], tls="ssl_expiry" in kinds)
+        with targets, targets.trusted():
+            report["targets"] = targets.describe()
+            try:
+                self._run(report, opts, kinds, targets, rng)
+            finally:
+                if not opts["keep"]:
+                    report["cleanup"] = bench.cleanup(prefix, targets)
+
+        report["finished_at"] = timezone.now().isoformat()
+        data = json.dumps(report, indent=2, default=str)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(data + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Rapport écrit dans {opts['output']}"))
+        else:
+            self.stdout.write(data)
+
+    def _run(self, report, opts, kinds, targets, rng):
+        self.stderr.write("inventaire...")
+        inventory = bench.generate_inventory(
+            opts["prefix"], opts["assets"], opts["checks_per_asset"], kinds, targets, rng
+        )
+        assets, checks = inventory.pop("_assets"), inventory.pop("_checks")
+        report["inventory"] = inventory
+
+        self.stderr.write("historique...")
+        report["history"] = bench.generate_history(
+            checks, assets, opts["history_hours"], opts["result_interval"], opts["metric_interval"],
+            opts["metric_keys"], rng,
+        )
+
+        check_ids = [c.id for c in checks]
+        self.stderr.write("sweeps run_all_checks...")
+        report["run_all_checks"] = bench.bench_sweeps(check_ids, opts["sweeps"])
+        self.stderr.write("run_check...")
+        report["run_check"] = bench.bench_run_check(rng.sample(check_ids, min(len(check_ids), opts["run_check"])),
+                                                    opts["run_check"])
+
+        self.stderr.write("vues...")
+        report["views"] = self._bench_views(opts, assets)
+
+    def _bench_views(self, opts, assets):
+        user, _ = get_user_model().objects.get_or_create(username=f"{opts['prefix']}user")
+        client = Client(raise_request_exception=False)  # une vue en erreur est mesurée (status 500), pas fatale
+        client.force_login(user)
+        asset = assets[0] if assets else None
+        key = bench.METRIC_KEYS[0]
+
+        urls = [("dashboard", "/"), ("assets", "/assets/"), ("assets_search", "/assets/?q=bench")]
+        if asset:
+            urls += [
+                ("asset_detail", f"/assets/{asset.pk}/"),
+                ("api_asset_latency_7d", f"/api/assets/{asset.pk}/latency-7d/"),
+                ("api_asset_uptime_7d", f"/api/assets/{asset.pk}/uptime-7d/"),
+                ("api_metrics_query_asset", f"/api/metrics/query/?key={key}&asset={asset.name}&range=24h"),
+            ]
+        urls += [
+            ("api_latency_24h", "/api/metrics/latency-24h/"),
+            ("api_uptime_24h", "/api/metrics/uptime-24h/"),
+            ("api_metrics_query_all", f"/api/metrics/query/?key={key}&range=7d&agg=p95"),
+        ]
+        try:
+            with override_settings(ALLOWED_HOSTS=["*"]):
+                out = bench.bench_views(client, urls, opts["requests"])
+            # résumé du dashboard recalculé à chaque fois (la vue sert le cache)
+            out["dashboard_summary_compute"] = bench.bench_callable(compute_dashboard_summary, max(1, opts["requests"] // 3))
+        finally:
+            user.delete()
+        return out
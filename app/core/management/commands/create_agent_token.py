@@ -0,0 +1,24 @@
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.api import hash_token
+from core.models import AgentToken
+
+
+class Command(BaseCommand):
+    help = "Crée un jeton d'agent (ingestion, sondes déportées) ; le jeton en clair n'est affiché qu'une fois."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name")
+        parser.add_argument("--region", default="", help="région des sondes déportées (Check.region)")
+
+    def handle(self, *args, **opts):
+        if AgentToken.objects.filter(name=opts["name"]).exists():
+            raise CommandError(f"Un jeton nommé {opts['name']!r} existe déjà")
+        raw = secrets.token_urlsafe(32)
+        AgentToken.objects.create(
+            name=opts["name"], token_hash=hash_token(raw), prefix=raw[:8], region=opts["region"].strip()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Jeton {opts['name']} créé :"))
+        self.stdout.write(raw)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Convertit CheckResult et MetricSample en tables partitionnées par recorded_at (PostgreSQL). "
+        "À lancer workers/beat arrêtés : la table est verrouillée pendant la copie."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", choices=["day", "week"], default=settings.PARTITION_INTERVAL)
+        parser.add_argument("--ahead", type=int, default=settings.PARTITION_PREMAKE)
+        parser.add_argument("--keep-legacy", action="store_true", help="garde <table>_legacy après copie")
+        parser.add_argument("--status", action="store_true", help="affiche l'état sans rien modifier")
+
+    def handle(self, *args, **opts):
+        if not partitions.supported():
+            raise CommandError("Le partitionnement nécessite PostgreSQL.")
+
+        for model in partitions.PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if opts["status"]:
+                parts = partitions.list_partitions(model) if partitions.is_partitioned(model) else []
+                self.stdout.write(f"{table}: {len(parts)} partition(s)" if parts else f"{table}: non partitionnée")
+                continue
+
+            if partitions.is_partitioned(model):
+                self.stdout.write(f"{table}: déjà partitionnée")
+                continue
+
+            copied = partitions.convert_to_partitioned(
+                model, opts["interval"], opts["ahead"], keep_legacy=opts["keep_legacy"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"{table}: partitionnée par {opts['interval']}, {copied} lignes copiées"))
+
+        if not opts["status"] and not settings.PARTITIONING_ENABLED:
+            self.stdout.write(self.style.WARNING(
+                "Pense à mettre PARTITIONING_ENABLED=1 pour que beat crée les partitions à venir."
+            ))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.rollups import rebuild_rollups, rebuildable_since
+
+
+class Command(BaseCommand):
+    help = "Recalcule les rollups CheckResult (1m/10m/1h) des N derniers jours depuis les résultats bruts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        now = timezone.now()
+        since = now - timedelta(days=opts["days"])
+        floor = rebuildable_since()
+        if floor is None:
+            self.stdout.write(self.style.WARNING("Aucun résultat brut : rollups laissés intacts."))
+            return
+        if since < floor:
+            # au-delà, la rétention a purgé le brut : ces rollups sont la seule trace, on n'y touche pas
+            self.stdout.write(self.style.WARNING(
+                f"Résultats bruts disponibles depuis {floor:%Y-%m-%d %H:%M} seulement "
+                f"(RETENTION_RESULTS_DAYS) : les rollups antérieurs sont conservés tels quels."
+            ))
+        n = rebuild_rollups(since, now)
+        self.stdout.write(self.style.SUCCESS(f"{n} résultats agrégés"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.tags import rebuild_tags
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index des tags (Tag/AssetTag + compteurs) depuis Asset.tags."
+
+    def handle(self, *args, **opts):
+        n = rebuild_tags()
+        self.stdout.write(self.style.SUCCESS(f"{n} liens asset/tag"))
@@ -0,0 +1,285 @@
+"""
+Lecture des métriques des agents (MetricSample / MetricRollup) pour les dashboards.
+
+Une requête = des assets, des clés, une fenêtre, un pas et une agrégation
+(avg/min/max/p95/last), avec filtre sur les labels. Le bucketing est fait en
+base (DateBin, cf core/series.py) : une ligne par (série, bucket), jamais les
+échantillons bruts. Le pas est élargi pour tenir dans METRICS_MAX_POINTS
+points par série et au plus METRICS_MAX_SERIES séries sont renvoyées.
+
+Au-delà de RETENTION_METRICS_DAYS, le brut a été remplacé par MetricRollup
+(1h) : la partie ancienne de la fenêtre est servie depuis les rollups (p95 et
+last y sont approchés par max et avg de l'heure, réponse marquée approximate).
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Aggregate, Avg, CharField, Count, FloatField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Concat, StrIndex, Substr
+from django.utils import timezone
+
+from .models import Asset, MetricRollup, MetricSample
+from .rollups import bucket_floor
+from .series import DateBin, clamp_step
+
+AGGREGATIONS = ("avg", "min", "max", "p95", "last")
+ROLLUP_RESOLUTION = 3600
+
+_LABEL_NAME_RE = re.compile(r"^[A-Za-z0-9_.:/-]+$")
+_MATCHER_RE = re.compile(r"^([^=!~]+)(=~|!~|!=|=)(.*)$")
+
+
+class MetricQueryError(ValueError):
+    pass
+
+
+class Percentile95(Aggregate):
+    """percentile_cont(0.95) (PostgreSQL)."""
+
+    function = "percentile_cont"
+    template = "%(function)s(0.95) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+
+class LastValue(Aggregate):
+    """Valeur la plus récente du groupe (PostgreSQL) : (array_agg(value ORDER BY recorded_at DESC))[1]."""
+
+    function = "array_agg"
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value_sql, value_params = compiler.compile(self.source_expressions[0])
+        order_sql, order_params = compiler.compile(self.source_expressions[1])
+        return f"(array_agg({value_sql} ORDER BY {order_sql} DESC))[1]", (*value_params, *order_params)
+
+
+# ------------------ filtres de labels ------------------
+
+def parse_matchers(values):
+    """['core=0', 'mount=~/var.*', 'env!=dev'] -> [(name, op, value)] ; regex compilées pour validation."""
+    matchers = []
+    for raw in values:
+        m = _MATCHER_RE.match(raw or "")
+        if not m or not _LABEL_NAME_RE.match(m.group(1)):
+            raise MetricQueryError(f"invalid label matcher {raw!r}")
+        name, op, value = m.groups()
+        if op in ("=~", "!~"):
+            value = value.removeprefix("^").removesuffix("$")
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise MetricQueryError(f"invalid regex in {raw!r}: {e}") from None
+            _check_db_regex(raw, value)
+        matchers.append((name, op, value))
+    return matchers
+
+
+def _check_db_regex(raw: str, pattern: str):
+    # les regex POSIX de PostgreSQL ne sont pas celles de Python ((?<=...), \d dans [], ...)
+    if connection.vendor != "postgresql":
+        return
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT '' ~ %s", [pattern])
+    except DatabaseError as e:
+        raise MetricQueryError(f"invalid regex in {raw!r}: {str(e).strip()}") from None
+
+
+def _label_value(name: str):
+    """
+    (position, valeur) du label `name` dans les labels canoniques 'k=v,k=v'
+    (core/ingest.py) ; valeur bornée à la virgule suivante, position 0 si absent.
+    """
+    padded = Concat(Value(","), "labels", output_field=CharField())
+    needle = f",{name}="
+    pos = StrIndex(padded, Value(needle))
+    rest = Substr(padded, pos + len(needle))
+    return pos, Substr(rest, 1, StrIndex(Concat(rest, Value(","), output_field=CharField()), Value(",")) - 1)
+
+
+def _apply_matchers(qs, matchers):
+    # la valeur est extraite avant comparaison : une regex (.*) ne déborde pas sur les labels suivants
+    for i, (name, op, value) in enumerate(matchers):
+        pos, label = _label_value(name)
+        qs = qs.alias(**{f"_label_pos{i}": pos, f"_label{i}": label})
+        if op in ("=~", "!~"):
+            cond = Q(**{f"_label{i}__regex": f"^({value})$"})
+        else:
+            cond = Q(**{f"_label{i}": value})
+        cond &= Q(**{f"_label_pos{i}__gt": 0})
+        qs = qs.exclude(cond) if op in ("!=", "!~") else qs.filter(cond)
+    return qs
+
+
+# ------------------ agrégations ------------------
+
+def _raw_aggregate(agg: str):
+    return {
+        "avg": Avg("value"),
+        "min": Min("value"),
+        "max": Max("value"),
+        "p95": Percentile95("value"),
+        "last": LastValue("value", "recorded_at"),
+    }[agg]
+
+
+def _percentile(values, q: float):
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    lo, hi = int(pos), min(int(pos) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _raw_rows_python(qs, agg: str, step_seconds: int):
+    """p95 / last hors PostgreSQL (SQLite de dev) : agrégation côté Python, flux trié par série."""
+    rows = (
+        qs.annotate(bucket=DateBin("recorded_at", step_seconds))
+        .order_by("asset_id", "key", "labels", "bucket", "recorded_at")
+        .values_list("asset_id", "key", "labels", "unit", "bucket", "value")
+    )
+    current, values, unit = None, [], ""
+    for asset_id, key, labels, row_unit, bucket, value in rows.iterator():
+        group = (asset_id, key, labels, bucket)
+        if group != current:
+            if current:
+                yield (*current, unit, values[-1] if agg == "last" else _percentile(values, 0.95), len(values))
+            current, values = group, []
+        values.append(value)
+        unit = row_unit or unit
+    if current:
+        yield (*current, unit, values[-1] if agg == "last" else _percentile(values, 0.95), len(values))
+
+
+def _raw_rows(qs, agg: str, step_seconds: int):
+    """-> (asset_id, key, labels, bucket, unit, valeur, nb d'échantillons) triés par série puis bucket."""
+    if agg in ("p95", "last") and connection.vendor != "postgresql":
+        yield from _raw_rows_python(qs, agg, step_seconds)
+        return
+    rows = (
+        qs.annotate(bucket=DateBin("recorded_at", step_seconds))
+        .values("asset_id", "key", "labels", "bucket")
+        .annotate(v=_raw_aggregate(agg), n=Count("id"), unit=Max("unit"))
+        .order_by("asset_id", "key", "labels", "bucket")
+    )
+    for row in rows.iterator():
+        yield row["asset_id"], row["key"], row["labels"], row["bucket"], row["unit"], row["v"], row["n"]
+
+
+def _rollup_rows(qs, agg: str, step_seconds: int):
+    rows = (
+        qs.annotate(bucket=DateBin("bucket_start", max(step_seconds, ROLLUP_RESOLUTION)))
+        .values("asset_id", "key", "labels", "bucket")
+        .annotate(n=Sum("count"), s=Sum("value_sum"), lo=Min("value_min"), hi=Max("value_max"), unit=Max("unit"))
+        .order_by("asset_id", "key", "labels", "bucket")
+    )
+    for row in rows.iterator():
+        if agg == "min":
+            value = row["lo"]
+        elif agg in ("max", "p95"):
+            value = row["hi"]
+        else:  # avg, last
+            value = row["s"] / row["n"] if row["n"] else None
+        yield row["asset_id"], row["key"], row["labels"], row["bucket"], row["unit"], value, row["n"] or 0
+
+
+def _merge_point(agg: str, prev, prev_n: int, value, n: int):
+    """Bucket à cheval sur la limite rollups / brut : combine les deux agrégats."""
+    if agg == "avg":
+        total = prev_n + n
+        return (prev * prev_n + value * n) / total if total else value
+    if agg == "min":
+        return min(prev, value)
+    if agg in ("max", "p95"):
+        return max(prev, value)
+    return value  # last : le brut est le plus récent
+
+
+# ------------------ requête ------------------
+
+def query_metrics(keys, asset_names=(), range_=timedelta(hours=24), step=None, agg="avg", matchers=(), now=None):
+    keys = [k for k in keys if k]
+    if not keys:
+        raise MetricQueryError("at least one key is required")
+    if agg not in AGGREGATIONS:
+        raise MetricQueryError(f"agg must be one of {', '.join(AGGREGATIONS)}")
+
+    now = now or timezone.now()
+    since = now - range_
+    step = clamp_step(range_, step or range_ / settings.METRICS_MAX_POINTS, settings.METRICS_MAX_POINTS)
+    step_seconds = max(1, int(step.total_seconds()))
+
+    asset_ids = None
+    names = {}
+    if asset_names:
+        names = dict(Asset.objects.filter(name__in=asset_names).values_list("id", "name"))
+        asset_ids = list(names)
+
+    # brut depuis la limite de rétention (alignée sur l'heure), rollups 1h avant
+    boundary = max(since, bucket_floor(now - timedelta(days=settings.RETENTION_METRICS_DAYS), ROLLUP_RESOLUTION))
+
+    def scoped(qs):
+        qs = qs.filter(key__in=keys)
+        if asset_ids is not None:
+            qs = qs.filter(asset_id__in=asset_ids)
+        return _apply_matchers(qs, matchers)
+
+    series = {}
+    last_n = {}  # série -> nb d'échantillons du dernier point (fusion du bucket à cheval)
+    truncated = False
+    approximate = False
+
+    def collect(rows):
+        nonlocal truncated
+        for asset_id, key, labels, bucket, unit, value, n in rows:
+            sid = (asset_id, key, labels)
+            s = series.get(sid)
+            if s is None:
+                if len(series) >= settings.METRICS_MAX_SERIES:
+                    truncated = True
+                    continue
+                s = series[sid] = {"asset_id": asset_id, "key": key, "labels": labels, "unit": unit or "", "points": []}
+            if value is not None:
+                ts = int(bucket.timestamp())
+                points = s["points"]
+                if points and points[-1][0] == ts:
+                    # pas > 1h : le bucket qui contient `boundary` reçoit rollups et brut
+                    value = _merge_point(agg, points[-1][1], last_n[sid], value, n)
+                    n += last_n[sid]
+                    points[-1][1] = round(value, 6)
+                else:
+                    points.append([ts, round(value, 6)])
+                last_n[sid] = n
+            s["unit"] = s["unit"] or unit or ""
+
+    if boundary > since and (asset_ids is None or asset_ids):
+        rollups = scoped(MetricRollup.objects.filter(
+            resolution=ROLLUP_RESOLUTION, bucket_start__gte=bucket_floor(since, ROLLUP_RESOLUTION), bucket_start__lt=boundary,
+        ))
+        before = sum(len(s["points"]) for s in series.values())
+        collect(_rollup_rows(rollups, agg, step_seconds))
+        approximate = agg in ("p95", "last") and sum(len(s["points"]) for s in series.values()) > before
+
+    if asset_ids is None or asset_ids:
+        raw = scoped(MetricSample.objects.filter(recorded_at__gte=boundary, recorded_at__lt=now))
+        collect(_raw_rows(raw, agg, step_seconds))
+
+    missing = {s["asset_id"] for s in series.values() if s["asset_id"] and s["asset_id"] not in names}
+    if missing:
+        names.update(Asset.objects.filter(id__in=missing).values_list("id", "name"))
+    out = []
+    for s in series.values():
+        s["asset"] = names.get(s["asset_id"])
+        out.append(s)
+    out.sort(key=lambda s: (s["asset"] or "", s["key"], s["labels"]))
+
+    return {
+        "step": step_seconds,
+        "agg": agg,
+        "from": int(since.timestamp()),
+        "to": int(now.timestamp()),
+        "series": out,
+        "truncated": truncated,
+        "approximate": approximate,
+    }
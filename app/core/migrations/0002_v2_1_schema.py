@@ -0,0 +1,85 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('value', models.FloatField()),
+                ('unit', models.CharField(blank=True, max_length=24)),
+                ('labels', models.CharField(blank=True, max_length=255)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='address',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='check',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='status_code',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='tags',
+            field=models.CharField(blank=True, help_text='Tags séparés par des virgules (ex: prod, web, paris)', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='check',
+            name='kind',
+            field=models.CharField(choices=[('ping', 'Ping (ICMP)'), ('tcp_port', 'TCP Port'), ('http', 'HTTP/HTTPS'), ('ssl_expiry', 'SSL Expiry')], default='ping', max_length=20),
+        ),
+        migrations.AlterUniqueTogether(
+            name='check',
+            unique_together={('asset', 'name')},
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['is_open', 'opened_at'], name='core_alert_is_open_82687d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['monitor_check', 'is_open'], name='core_alert_monitor_467b26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkresult',
+            index=models.Index(fields=['monitor_check', 'ok', 'recorded_at'], name='core_checkr_monitor_f01f79_idx'),
+        ),
+        migrations.AddField(
+            model_name='metricsample',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='core.asset'),
+        ),
+        migrations.AddIndex(
+            model_name='metricsample',
+            index=models.Index(fields=['key', 'recorded_at'], name='core_metric_key_df0609_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metricsample',
+            index=models.Index(fields=['asset', 'key', 'recorded_at'], name='core_metric_asset_i_e6e8e8_idx'),
+        ),
+    ]
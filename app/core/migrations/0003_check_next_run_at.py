@@ -0,0 +1,22 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_v2_1_schema'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='check',
+            index=models.Index(fields=['is_enabled', 'next_run_at'], name='core_check_is_enab_539ae4_idx'),
+        ),
+    ]
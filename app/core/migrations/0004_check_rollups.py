@@ -0,0 +1,37 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_check_next_run_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1 min'), (600, '10 min'), (3600, '1 h')])),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('ok_count', models.PositiveIntegerField(default=0)),
+                ('latency_count', models.PositiveIntegerField(default=0)),
+                ('latency_sum', models.FloatField(default=0.0)),
+                ('latency_min', models.FloatField(blank=True, null=True)),
+                ('latency_max', models.FloatField(blank=True, null=True)),
+                ('latency_sketch', models.JSONField(blank=True, default=dict)),
+                ('monitor_check', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.check')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='core_checkr_resolut_63cc9c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='checkrollup',
+            constraint=models.UniqueConstraint(fields=('monitor_check', 'resolution', 'bucket_start'), name='uniq_check_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_check_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('labels', models.CharField(blank=True, max_length=255)),
+                ('unit', models.CharField(blank=True, max_length=24)),
+                ('resolution', models.PositiveIntegerField(default=3600)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('value_sum', models.FloatField(default=0.0)),
+                ('value_min', models.FloatField(blank=True, null=True)),
+                ('value_max', models.FloatField(blank=True, null=True)),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='core.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'resolution', 'bucket_start'], name='core_metric_key_6e8fd0_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollup',
+            constraint=models.UniqueConstraint(fields=('asset', 'key', 'labels', 'resolution', 'bucket_start'), name='uniq_metric_rollup_bucket'),
+        ),
+    ]
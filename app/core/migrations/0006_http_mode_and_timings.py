@@ -0,0 +1,23 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='http_mode',
+            field=models.CharField(choices=[('pooled', 'Pooled (warm)'), ('cold', 'Cold (breakdown)')], default='pooled', help_text='pooled: keep-alive réutilisé ; cold: nouvelle connexion avec détail dns/connect/tls/ttfb', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_http_mode_and_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='ping_count',
+            field=models.PositiveSmallIntegerField(default=1, help_text="Nb d'echo requests par sonde ping (>1 : min/avg/max/jitter/perte dans timings)"),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_check_ping_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.PositiveIntegerField(default=443)),
+                ('fingerprint_sha256', models.CharField(blank=True, max_length=64)),
+                ('subject', models.CharField(blank=True, max_length=500)),
+                ('issuer', models.CharField(blank=True, max_length=500)),
+                ('sans', models.JSONField(blank=True, default=list)),
+                ('serial', models.CharField(blank=True, max_length=128)),
+                ('not_before', models.DateTimeField(blank=True, null=True)),
+                ('not_after', models.DateTimeField(blank=True, null=True)),
+                ('chain', models.JSONField(blank=True, default=list)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('next_fetch_at', models.DateTimeField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['not_after'], name='core_certif_not_aft_427611_idx'), models.Index(fields=['fingerprint_sha256'], name='core_certif_fingerp_d3d2cf_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='certificaterecord',
+            constraint=models.UniqueConstraint(fields=('host', 'port'), name='uniq_certificate_host_port'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_certificate_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='check',
+            name='failure_threshold',
+            field=models.PositiveSmallIntegerField(default=1, help_text="Nb d'échecs consécutifs avant d'ouvrir une alerte"),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tags(apps, schema_editor):
+    # copie figée de core.tags.rebuild_tags (modèles historiques)
+    Asset = apps.get_model("core", "Asset")
+    Tag = apps.get_model("core", "Tag")
+    AssetTag = apps.get_model("core", "AssetTag")
+
+    links = {}
+    for asset_id, raw in Asset.objects.values_list("id", "tags").iterator():
+        for name in {t.strip().lower()[:64] for t in (raw or "").split(",") if t.strip()}:
+            links.setdefault(name, []).append(asset_id)
+    if not links:
+        return
+
+    Tag.objects.bulk_create([Tag(name=n, asset_count=len(ids)) for n, ids in links.items()], batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list("name", "id"))
+    AssetTag.objects.bulk_create(
+        [AssetTag(asset_id=a, tag_id=tag_ids[n]) for n, ids in links.items() for a in ids],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_check_failure_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('asset_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-asset_count', 'name'], name='core_tag_asset_c_3a4453_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AssetTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asset_tags', to='core.asset')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asset_tags', to='core.tag')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='assettag',
+            constraint=models.UniqueConstraint(fields=('tag', 'asset'), name='uniq_asset_tag'),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
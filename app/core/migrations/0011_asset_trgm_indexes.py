@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# colonnes couvertes par core/search.py (index sur UPPER(col::text), forme générée par icontains)
+FIELDS = ("name", "address", "description", "tags", "ip_or_host")
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "core_asset_{field}_trgm" '
+            f'ON "core_asset" USING gin ((UPPER("{field}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for field in FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "core_asset_{field}_trgm"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_asset_tag_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
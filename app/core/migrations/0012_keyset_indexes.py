@@ -0,0 +1,26 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_asset_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['opened_at', 'id'], name='core_alert_opened__e293b9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkresult',
+            index=models.Index(fields=['recorded_at', 'id'], name='core_checkr_recorde_c61f74_idx'),
+        ),
+        # remplacé par (recorded_at, id), supprimé une fois le nouvel index créé
+        migrations.RemoveIndex(
+            model_name='checkresult',
+            name='core_checkr_recorde_f19e2a_idx',
+        ),
+    ]
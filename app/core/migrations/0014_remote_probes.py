@@ -0,0 +1,43 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_agent_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenttoken',
+            name='region',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='check',
+            name='agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_checks', to='core.agenttoken'),
+        ),
+        migrations.AddField(
+            model_name='check',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='check',
+            name='leased_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.agenttoken'),
+        ),
+        migrations.AddField(
+            model_name='check',
+            name='region',
+            field=models.CharField(blank=True, help_text='Ex: paris-dc ; exécuté par les agents de cette région', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='check',
+            index=models.Index(fields=['region', 'next_run_at'], name='core_check_region_bd814c_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_remote_probes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='joblog',
+            index=models.Index(fields=['job', 'id'], name='core_joblog_job_id_17666d_idx'),
+        ),
+    ]
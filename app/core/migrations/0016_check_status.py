@@ -0,0 +1,74 @@
+# Generated by Django 5.0.8 on 2026-10-17 20:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+RECENT = 20
+
+
+def backfill_status(apps, schema_editor):
+    # derniers résultats de chaque check (index monitor_check, recorded_at) ; échecs consécutifs
+    # bornés à cet historique, le ResultSink prend le relais au premier flush
+    Check = apps.get_model("core", "Check")
+    CheckResult = apps.get_model("core", "CheckResult")
+    CheckStatus = apps.get_model("core", "CheckStatus")
+
+    statuses = []
+    for check_id in Check.objects.values_list("id", flat=True).iterator():
+        rows = list(
+            CheckResult.objects.filter(monitor_check_id=check_id)
+            .order_by("-recorded_at")
+            .values_list("ok", "latency_ms", "message", "recorded_at")[:RECENT]
+        )
+        if not rows:
+            continue
+        ok, latency_ms, message, recorded_at = rows[0]
+        failures = 0
+        while failures < len(rows) and not rows[failures][0]:
+            failures += 1
+        change = next((rows[i - 1][3] for i in range(1, len(rows)) if rows[i][0] != ok), None)
+        statuses.append(CheckStatus(
+            monitor_check_id=check_id,
+            ok=ok,
+            latency_ms=latency_ms,
+            message=(message or "")[:500],
+            last_result_at=recorded_at,
+            last_change_at=change,
+            consecutive_failures=failures,
+            recent=[
+                [round(r[3].timestamp(), 3), r[0], None if r[1] is None else round(r[1], 3)] for r in reversed(rows)
+            ],
+        ))
+        if len(statuses) >= 1000:
+            CheckStatus.objects.bulk_create(statuses)
+            statuses = []
+    CheckStatus.objects.bulk_create(statuses)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_joblog_tail_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckStatus',
+            fields=[
+                ('monitor_check', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='status', serialize=False, to='core.check')),
+                ('ok', models.BooleanField(null=True)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('last_result_at', models.DateTimeField(blank=True, null=True)),
+                ('last_change_at', models.DateTimeField(blank=True, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('recent', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ok', 'last_change_at'], name='core_checks_ok_fdb183_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
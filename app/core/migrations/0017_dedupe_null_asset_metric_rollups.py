@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def dedupe_null_asset_rollups(apps, schema_editor):
+    # rejeux de la rétention avant correction de l'upsert : le rollup le plus récent de
+    # chaque bucket sans asset est gardé (même calcul depuis le même brut)
+    MetricRollup = apps.get_model("core", "MetricRollup")
+    dupes = (
+        MetricRollup.objects.filter(asset__isnull=True)
+        .values("key", "labels", "resolution", "bucket_start")
+        .annotate(n=Count("id"), keep=Max("id"))
+        .filter(n__gt=1)
+    )
+    for row in dupes.iterator():
+        MetricRollup.objects.filter(
+            asset__isnull=True,
+            key=row["key"],
+            labels=row["labels"],
+            resolution=row["resolution"],
+            bucket_start=row["bucket_start"],
+        ).exclude(id=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_check_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_null_asset_rollups, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,20 @@
 from django.db import models
+from django.urls import reverse
 from django.utils import timezone
 
 
 class Asset(models.Model):
+    TYPE_CHOICES = [
+        ("vm", "VM"),
+        ("server", "Serveur"),
+        ("nas", "NAS/Storage"),
+        ("network", "Réseau"),
+        ("other", "Autre"),
+    ]
+
     name = models.CharField(max_length=120, unique=True)
+    asset_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="server")
+    ip_or_host = models.CharField(max_length=255, help_text="IP ou hostname")
     address = models.CharField(max_length=255, blank=True)  # ip/host/url
     description = models.TextField(blank=True)
     tags = models.CharField(
@@ -11,7 +22,8 @@ class Asset(models.Model):
         blank=True,
         help_text="Tags séparés par des virgules (ex: prod, web, paris)",
     )
-    created_at = models.DateTimeField(default=timezone.now)
+    is_enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     def tag_list(self):
         return [t.strip() for t in (self.tags or "").split(",") if t.strip()]
@@ -20,17 +32,92 @@ class Asset(models.Model):
         return self.name
 
 
+class Tag(models.Model):
+    """
+    Index des tags d'assets (normalisés en minuscules), maintenu depuis Asset.tags
+    par core/tags.py. asset_count sert le nuage de tags sans relire les assets.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    asset_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-asset_count", "name"]),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class AssetTag(models.Model):
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="asset_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="asset_tags")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tag", "asset"], name="uniq_asset_tag"),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id}:{self.tag_id}"
+
+
 class Check(models.Model):
+    KIND_CHOICES = [
+        ("ping", "Ping (ICMP)"),
+        ("tcp_port", "TCP Port"),
+        ("http", "HTTP/HTTPS"),
+        ("ssl_expiry", "SSL Expiry"),
+    ]
+    HTTP_MODE_CHOICES = [
+        ("pooled", "Pooled (warm)"),
+        ("cold", "Cold (breakdown)"),
+    ]
+
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="checks")
     name = models.CharField(max_length=120)
-    kind = models.CharField(max_length=32, default="ping")  # ping/http/tcp/etc
-    target = models.CharField(max_length=255, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="ping")
     interval_seconds = models.PositiveIntegerField(default=60)
-    enabled = models.BooleanField(default=True)
+    target = models.CharField(max_length=255, blank=True, help_text="Ex: https://site.tld ou hostname")
+    port = models.PositiveIntegerField(null=True, blank=True)
+    timeout_seconds = models.PositiveIntegerField(default=3)
+    expected_status = models.PositiveIntegerField(default=200)
+    ssl_days_threshold = models.PositiveIntegerField(default=14)
+    http_mode = models.CharField(
+        max_length=10,
+        choices=HTTP_MODE_CHOICES,
+        default="pooled",
+        help_text="pooled: keep-alive réutilisé ; cold: nouvelle connexion avec détail dns/connect/tls/ttfb",
+    )
+    failure_threshold = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Nb d'échecs consécutifs avant d'ouvrir une alerte",
+    )
+    ping_count = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Nb d'echo requests par sonde ping (>1 : min/avg/max/jitter/perte dans timings)",
+    )
+    # sonde déportée (core/agents.py) : un agent précis, ou n'importe quel agent de la région ;
+    # vide = exécuté par les workers Celery centraux
+    agent = models.ForeignKey(
+        "AgentToken", on_delete=models.SET_NULL, null=True, blank=True, related_name="assigned_checks",
+    )
+    region = models.CharField(max_length=64, blank=True, help_text="Ex: paris-dc ; exécuté par les agents de cette région")
+    is_enabled = models.BooleanField(default=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)  # géré par core/scheduler.py
+    leased_by = models.ForeignKey(
+        "AgentToken", on_delete=models.SET_NULL, null=True, blank=True, related_name="+", editable=False,
+    )
+    lease_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ("asset", "name")
+        indexes = [
+            models.Index(fields=["is_enabled", "next_run_at"]),
+            models.Index(fields=["region", "next_run_at"]),
+        ]
 
     def __str__(self):
         return f"{self.asset.name} / {self.name}"
@@ -40,13 +127,14 @@ class CheckResult(models.Model):
     monitor_check = models.ForeignKey(Check, on_delete=models.CASCADE, related_name="results")
     ok = models.BooleanField(default=False)
     status_code = models.IntegerField(null=True, blank=True)
-    message = models.CharField(max_length=255, blank=True)
+    message = models.TextField(blank=True)
     latency_ms = models.FloatField(null=True, blank=True)
+    timings = models.JSONField(null=True, blank=True)  # ex: {"dns_ms":..,"connect_ms":..,"tls_ms":..,"ttfb_ms":..}
     recorded_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
-            models.Index(fields=["recorded_at"]),
+            models.Index(fields=["recorded_at", "id"]),  # tri / curseur (recorded_at, id)
             models.Index(fields=["monitor_check", "recorded_at"]),
             models.Index(fields=["monitor_check", "ok", "recorded_at"]),
         ]
@@ -55,18 +143,121 @@ class CheckResult(models.Model):
         return f"{self.monitor_check} ok={self.ok} @ {self.recorded_at}"
 
 
+class CheckStatus(models.Model):
+    """
+    État courant d'un check (une ligne par check), maintenu à chaque flush du
+    ResultSink (core/checkstatus.py) : pages et dashboard le lisent sans
+    parcourir CheckResult. recent = derniers résultats [epoch, ok, latency_ms],
+    du plus ancien au plus récent (STATUS_RECENT_SIZE au plus).
+    """
+    monitor_check = models.OneToOneField(Check, on_delete=models.CASCADE, primary_key=True, related_name="status")
+    ok = models.BooleanField(null=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    last_result_at = models.DateTimeField(null=True, blank=True)
+    last_change_at = models.DateTimeField(null=True, blank=True)  # dernière bascule ok <-> ko
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    recent = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ok", "last_change_at"]),  # checks en échec, triés par ancienneté
+        ]
+
+    def __str__(self):
+        return f"{self.monitor_check_id} ok={self.ok}"
+
+
+class CheckRollup(models.Model):
+    """
+    Agrégats pré-calculés de CheckResult par check et par bucket (1m / 10m / 1h),
+    maintenus au fil de l'eau par core/rollups.py. Les graphs lisent ici.
+    """
+    RESOLUTION_CHOICES = [
+        (60, "1 min"),
+        (600, "10 min"),
+        (3600, "1 h"),
+    ]
+
+    monitor_check = models.ForeignKey(Check, on_delete=models.CASCADE, related_name="rollups")
+    resolution = models.PositiveIntegerField(choices=RESOLUTION_CHOICES)  # secondes
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    ok_count = models.PositiveIntegerField(default=0)
+    latency_count = models.PositiveIntegerField(default=0)
+    latency_sum = models.FloatField(default=0.0)
+    latency_min = models.FloatField(null=True, blank=True)
+    latency_max = models.FloatField(null=True, blank=True)
+    latency_sketch = models.JSONField(default=dict, blank=True)  # histogramme log (cf rollups.LatencySketch)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["monitor_check", "resolution", "bucket_start"], name="uniq_check_rollup_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["resolution", "bucket_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.monitor_check_id} [{self.resolution}s] {self.bucket_start} n={self.count}"
+
+
+class CertificateRecord(models.Model):
+    """
+    Inventaire des certificats TLS vus par les checks ssl_expiry, par host:port.
+    Sert de cache (core/certificates.py) : tant que next_fetch_at n'est pas
+    atteint, le check calcule les jours restants depuis not_after sans handshake.
+    """
+    host = models.CharField(max_length=255)
+    port = models.PositiveIntegerField(default=443)
+    fingerprint_sha256 = models.CharField(max_length=64, blank=True)
+    subject = models.CharField(max_length=500, blank=True)
+    issuer = models.CharField(max_length=500, blank=True)
+    sans = models.JSONField(default=list, blank=True)
+    serial = models.CharField(max_length=128, blank=True)
+    not_before = models.DateTimeField(null=True, blank=True)
+    not_after = models.DateTimeField(null=True, blank=True)
+    chain = models.JSONField(default=list, blank=True)  # [{"subject", "issuer", "not_after"}], feuille en premier
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    next_fetch_at = models.DateTimeField(null=True, blank=True)
+    changed_at = models.DateTimeField(null=True, blank=True)  # dernier changement d'empreinte
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["host", "port"], name="uniq_certificate_host_port"),
+        ]
+        indexes = [
+            models.Index(fields=["not_after"]),
+            models.Index(fields=["fingerprint_sha256"]),
+        ]
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+
 class Alert(models.Model):
+    SEVERITY_CHOICES = [
+        ("info", "Info"),
+        ("warning", "Warning"),
+        ("critical", "Critical"),
+    ]
+
     monitor_check = models.ForeignKey(Check, on_delete=models.CASCADE, related_name="alerts")
     is_open = models.BooleanField(default=True)
-    severity = models.CharField(max_length=16, default="warning")  # info/warning/critical
-    title = models.CharField(max_length=160, blank=True)
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default="critical")
+    title = models.CharField(max_length=200)
     details = models.TextField(blank=True)
     opened_at = models.DateTimeField(default=timezone.now)
     closed_at = models.DateTimeField(null=True, blank=True)
+    ack_by = models.CharField(max_length=150, blank=True)
+    ack_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["is_open", "opened_at"]),
+            models.Index(fields=["opened_at", "id"]),  # tri / curseur (opened_at, id)
             models.Index(fields=["monitor_check", "is_open"]),
         ]
 
@@ -94,3 +285,91 @@ class MetricSample(models.Model):
 
     def __str__(self):
         return f"{self.key}={self.value}{self.unit}"
+
+
+class MetricRollup(models.Model):
+    """
+    MetricSample sous-échantillonné (1h) : écrit par la rétention (core/retention.py)
+    avant suppression des échantillons bruts.
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="metric_rollups", null=True, blank=True)
+    key = models.CharField(max_length=64)
+    labels = models.CharField(max_length=255, blank=True)
+    unit = models.CharField(max_length=24, blank=True)
+    resolution = models.PositiveIntegerField(default=3600)  # secondes
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    value_sum = models.FloatField(default=0.0)
+    value_min = models.FloatField(null=True, blank=True)
+    value_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["asset", "key", "labels", "resolution", "bucket_start"], name="uniq_metric_rollup_bucket"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["key", "resolution", "bucket_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.key} [{self.resolution}s] {self.bucket_start} n={self.count}"
+
+
+class AgentToken(models.Model):
+    """
+    Jeton des agents : push de métriques (API d'ingestion) et sondes déportées
+    (lease / résultats), cf core/api.py. Seule l'empreinte SHA-256 est
+    stockée ; le jeton en clair est affiché une fois par
+    `manage.py create_agent_token`.
+    """
+    name = models.CharField(max_length=120, unique=True)
+    token_hash = models.CharField(max_length=64, unique=True)
+    prefix = models.CharField(max_length=8, blank=True)  # début du jeton, pour le reconnaître dans l'admin
+    region = models.CharField(max_length=64, blank=True)  # checks Check.region pris en charge
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix}…)"
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("success", "Success"),
+        ("failed", "Failed"),
+    ]
+
+    name = models.CharField(max_length=150)
+    action = models.CharField(max_length=150, help_text="Ex: restart_service, proxmox_stop_vm, etc.")
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="jobs", null=True, blank=True)
+    payload_json = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    def get_absolute_url(self):
+        return reverse("job_detail", args=[self.id])
+
+
+class JobLog(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="logs")
+    line = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # tail par curseur : lignes d'un job après un id (core/jobs.py)
+            models.Index(fields=["job", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}: {self.line[:60]}"
@@ -0,0 +1,177 @@
+"""
+Notifications d'alertes : file Redis -> digests email.
+
+Le ResultSink pousse les transitions (ouverture / rétablissement) dans une
+liste Redis après commit, sans jamais parler SMTP. La task
+dispatch_notifications (beat, toutes les NOTIFY_WINDOW_SECONDS) vide la file,
+regroupe les événements par asset en un digest par asset (au-delà de
+NOTIFY_MAX_DIGESTS assets, le reste est replié dans un seul message) et envoie
+le tout sur UNE connexion SMTP.
+
+- débit borné : NOTIFY_RATE_PER_MINUTE messages par minute (compteur Redis),
+  l'excédent reste en file pour la fenêtre suivante ;
+- échec SMTP : les événements sont remis en tête de file et les envois sont
+  suspendus avec un backoff exponentiel (NOTIFY_BACKOFF_*).
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .live import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "arcane:notify:queue"
+RATE_KEY = "arcane:notify:rate:{}"
+BACKOFF_KEY = "arcane:notify:backoff"
+FAILURES_KEY = "arcane:notify:failures"
+SUBJECT_PREFIX = "[ArcanePanel]"
+
+
+class Digest:
+    def __init__(self, subject, body, events):
+        self.subject = subject
+        self.body = body
+        self.events = events
+
+
+def enqueue(events):
+    """Best effort, appelé après commit : une panne Redis ne casse pas l'écriture des résultats."""
+    if not events:
+        return
+    try:
+        get_redis().rpush(QUEUE_KEY, *(json.dumps(e, cls=DjangoJSONEncoder) for e in events))
+    except redis.RedisError as e:
+        logger.warning("notification enqueue failed (%d events lost): %s", len(events), e)
+
+
+def _drain(r, limit: int):
+    # LRANGE + LTRIM en MULTI : deux dispatchers ne prennent jamais les mêmes événements
+    pipe = r.pipeline(transaction=True)
+    pipe.lrange(QUEUE_KEY, 0, limit - 1)
+    pipe.ltrim(QUEUE_KEY, limit, -1)
+    raw, _ = pipe.execute()
+    return [json.loads(v) for v in raw]
+
+
+def _requeue(r, events):
+    if events:
+        # remis en tête, dans l'ordre d'origine
+        r.lpush(QUEUE_KEY, *(json.dumps(e, cls=DjangoJSONEncoder) for e in reversed(events)))
+
+
+def _format_event(e) -> str:
+    if e["type"] == "opened":
+        return f"[{e['at']}] OPEN      {e['check']} — {e['message']}"
+    return f"[{e['at']}] RECOVERED {e['check']}"
+
+
+def _digest(asset: str, events) -> Digest:
+    opened = sum(1 for e in events if e["type"] == "opened")
+    recovered = len(events) - opened
+    if len(events) == 1:
+        subject = f"{SUBJECT_PREFIX} {events[0]['title']}"
+    else:
+        subject = f"{SUBJECT_PREFIX} {asset}: {opened} alert(s) opened, {recovered} recovered"
+    body = "\n".join(_format_event(e) for e in events)
+    if len(events) == 1 and events[0].get("details"):
+        body = events[0]["details"]
+    return Digest(subject, body, events)
+
+
+def build_digests(events, max_digests: int):
+    """Un digest par asset ; au-delà de max_digests assets, le reste tient dans un seul message."""
+    groups = OrderedDict()
+    for e in events:
+        groups.setdefault(e["asset"], []).append(e)
+
+    assets = list(groups)
+    max_digests = max(1, max_digests)
+    if len(assets) <= max_digests:
+        return [_digest(a, groups[a]) for a in assets]
+
+    digests = [_digest(a, groups[a]) for a in assets[: max_digests - 1]]
+    rest = assets[max_digests - 1:]
+    rest_events = [e for a in rest for e in groups[a]]
+    opened = sum(1 for e in rest_events if e["type"] == "opened")
+    body = "\n\n".join(f"== {a}\n" + "\n".join(_format_event(e) for e in groups[a]) for a in rest)
+    digests.append(Digest(
+        f"{SUBJECT_PREFIX} {len(rest)} assets: {opened} alert(s) opened, {len(rest_events) - opened} recovered",
+        body,
+        rest_events,
+    ))
+    return digests
+
+
+def _take_rate(r, wanted: int) -> int:
+    """Réserve jusqu'à `wanted` envois sur la minute courante, renvoie le nombre accordé."""
+    key = RATE_KEY.format(int(time.time() // 60))
+    pipe = r.pipeline(transaction=True)
+    pipe.incrby(key, wanted)
+    pipe.expire(key, 120)
+    used, _ = pipe.execute()
+    granted = max(0, min(wanted, settings.NOTIFY_RATE_PER_MINUTE - (used - wanted)))
+    if granted < wanted:
+        r.decrby(key, wanted - granted)
+    return granted
+
+
+def _backoff(r):
+    failures = r.incr(FAILURES_KEY)
+    r.expire(FAILURES_KEY, settings.NOTIFY_BACKOFF_MAX_SECONDS * 2)
+    delay = min(settings.NOTIFY_BACKOFF_MAX_SECONDS, settings.NOTIFY_BACKOFF_BASE_SECONDS * 2 ** (failures - 1))
+    r.set(BACKOFF_KEY, failures, ex=int(delay))
+    return delay
+
+
+def dispatch() -> dict:
+    """Vide la file et envoie les digests. Renvoie un petit rapport (loggé par la task)."""
+    r = get_redis()
+    if r.exists(BACKOFF_KEY):
+        return {"events": 0, "sent": 0, "backoff": True}
+
+    events = _drain(r, settings.NOTIFY_MAX_EVENTS)
+    if not events:
+        return {"events": 0, "sent": 0}
+
+    recipients = settings.ALERT_EMAIL_RECIPIENTS
+    if not recipients:
+        logger.info("notifications: %d events dropped (ALERT_EMAIL_RECIPIENTS empty)", len(events))
+        return {"events": len(events), "sent": 0, "dropped": len(events)}
+
+    digests = build_digests(events, settings.NOTIFY_MAX_DIGESTS)
+    granted = _take_rate(r, len(digests))
+    to_send, deferred = digests[:granted], digests[granted:]
+
+    sent = 0
+    if to_send:
+        connection = get_connection(fail_silently=False)
+        try:
+            # une seule connexion SMTP pour tout le lot, un message à la fois : en cas
+            # d'échec en cours de route, seuls les digests pas encore envoyés sont remis en file
+            connection.open()
+            for d in to_send:
+                connection.send_messages([EmailMessage(d.subject, d.body, None, recipients, connection=connection)])
+                sent += 1
+        except Exception as e:
+            _requeue(r, [ev for d in to_send[sent:] + deferred for ev in d.events])
+            delay = _backoff(r)
+            logger.warning("notification send failed after %d digests, retry in %ss: %s", sent, delay, e)
+            return {"events": len(events), "sent": sent, "error": str(e), "retry_in": delay}
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        r.delete(FAILURES_KEY)
+
+    _requeue(r, [ev for d in deferred for ev in d.events])
+    report = {"events": len(events), "digests": len(digests), "sent": sent, "deferred": len(deferred)}
+    logger.info("notifications: %s", report)
+    return report
@@ -0,0 +1,162 @@
+"""
+Pagination par curseur (keyset) pour les listes HTML et les API.
+
+Au lieu d'un OFFSET (qui relit toutes les lignes sautées), on repart de la clé
+de tri de la dernière ligne vue :
+    ORDER BY opened_at DESC, id DESC
+    WHERE opened_at <= %s AND (opened_at < %s OR (opened_at = %s AND id < %s))
+La page N coûte donc la même chose que la page 1 (parcours d'index).
+
+Le curseur est opaque côté client (base64 des valeurs de la clé + sens de
+lecture). Les champs de tri doivent être non nuls et finir par une clé
+unique (id). Fonctionne sur un queryset de modèles ou de .values().
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+
+def _parse_ordering(ordering):
+    """("-opened_at", "-id") -> [("opened_at", True), ("id", True)]"""
+    return [(o[1:], True) if o.startswith("-") else (o, False) for o in ordering]
+
+
+def _model_field(model, path: str):
+    """Champ du modèle pour 'a__b__c', None pour une annotation."""
+    field = None
+    for part in path.split("__"):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+def _row_value(row, path: str):
+    if isinstance(row, dict):
+        return row[path]
+    for part in path.split("__"):
+        row = getattr(row, part)
+    return row
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder tronque à la milliseconde : ici il faut la valeur exacte de la clé
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, backward: bool = False) -> str:
+    raw = json.dumps({"v": list(values), "b": int(backward)}, cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, model, keys):
+    """-> (valeurs typées, backward). InvalidCursor si le curseur ne correspond pas à la clé."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values, backward = data["v"], bool(data.get("b"))
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("malformed cursor") from e
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor("cursor does not match ordering")
+
+    typed = []
+    for (path, _), value in zip(keys, values):
+        if value is None:
+            raise InvalidCursor("null key in cursor")
+        field = _model_field(model, path)
+        try:
+            typed.append(field.to_python(value) if field is not None else value)
+        except ValidationError as e:
+            raise InvalidCursor(f"invalid value for {path}") from e
+    return typed, backward
+
+
+def _after(keys, values) -> Q:
+    """Lignes strictement après `values` dans l'ordre `keys`."""
+    cond = Q()
+    for i, (path, desc) in enumerate(keys):
+        term = Q(**{f"{path}__{'lt' if desc else 'gt'}": values[i]})
+        for j in range(i):
+            term &= Q(**{keys[j][0]: values[j]})
+        cond |= term
+    # borne sur la 1re colonne seule, pour que le planner parcoure l'index dès le départ
+    first, desc = keys[0]
+    return Q(**{f"{first}__{'lte' if desc else 'gte'}": values[0]}) & cond
+
+
+def _order_by(keys):
+    return [f"-{path}" if desc else path for path, desc in keys]
+
+
+def paginate(qs, ordering, cursor=None, limit: int = 50) -> KeysetPage:
+    """
+    qs       : queryset filtré (son order_by est remplacé) ;
+    ordering : clé de tri façon order_by, ex ("-opened_at", "-id") ;
+    cursor   : next_cursor / previous_cursor d'une page précédente.
+    1 requête (LIMIT limit+1) ; InvalidCursor si le curseur est illisible.
+    """
+    keys = _parse_ordering(ordering)
+    limit = max(1, int(limit))
+
+    values, backward = None, False
+    if cursor:
+        values, backward = decode_cursor(cursor, qs.model, keys)
+
+    # page précédente : on lit à rebours depuis la 1re ligne de la page courante
+    read_keys = [(path, not desc) for path, desc in keys] if backward else keys
+    if values is not None:
+        qs = qs.filter(_after(read_keys, values))
+    rows = list(qs.order_by(*_order_by(read_keys))[: limit + 1])
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return KeysetPage([])
+
+    def key_of(row):
+        return [_row_value(row, path) for path, _ in keys]
+
+    if backward:
+        next_cursor = encode_cursor(key_of(rows[-1]))
+        previous_cursor = encode_cursor(key_of(rows[0]), backward=True) if more else None
+    else:
+        next_cursor = encode_cursor(key_of(rows[-1])) if more else None
+        previous_cursor = encode_cursor(key_of(rows[0]), backward=True) if values is not None else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,248 @@
+"""
+Partitionnement par plage de temps (PostgreSQL uniquement, opt-in).
+
+CheckResult et MetricSample peuvent être convertis en tables partitionnées
+par `recorded_at` (un jour ou une semaine par partition) :
+- les requêtes 24h/7d ne touchent que les partitions concernées,
+- la rétention devient un DROP TABLE de partition au lieu de DELETE massifs.
+
+Conversion : `manage.py partition_tables` (table à l'arrêt, voir la commande).
+Entretien : task maintain_partitions (crée les partitions à venir).
+
+Une partition DEFAULT (<table>_default) reçoit les lignes hors des plages
+créées (horloge décalée, beat arrêté plus de PARTITION_PREMAKE périodes,
+horodatages d'agents) : un insert ne fait jamais échouer le flush du sink.
+Quand la plage correspondante est créée ensuite, ses lignes y sont déplacées.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import CheckResult, MetricSample
+
+PARTITIONED_MODELS = (CheckResult, MetricSample)
+PARTITION_FIELD = "recorded_at"
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def supported() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def period_start(dt, interval: str):
+    dt = dt.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        dt -= timedelta(days=dt.weekday())
+    return dt
+
+
+def period_step(interval: str) -> timedelta:
+    return timedelta(days=7 if interval == "week" else 1)
+
+
+def partition_name(table: str, start) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(model) -> bool:
+    if not supported():
+        return False
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [model._meta.db_table],
+        )
+        return cur.fetchone() is not None
+
+
+def list_partitions(model):
+    """[(nom, début, fin)] des partitions existantes, triées par début."""
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [model._meta.db_table],
+        )
+        rows = cur.fetchall()
+
+    parts = []
+    for name, bound in rows:
+        m = _BOUND_RE.search(bound or "")
+        if not m:
+            continue  # partition DEFAULT ou bornes non temporelles
+        start, end = (datetime.fromisoformat(v).astimezone(dt_timezone.utc) for v in m.groups())
+        parts.append((name, start, end))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def ensure_default_partition(model) -> bool:
+    """Crée la partition DEFAULT si elle manque ; True si créée."""
+    table = model._meta.db_table
+    default = default_partition_name(table)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", [default])
+        if cur.fetchone()[0] is not None:
+            return False
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {qn(default)} PARTITION OF {qn(table)} DEFAULT")
+    return True
+
+
+def create_partition(model, start, interval: str):
+    table = model._meta.db_table
+    end = start + period_step(interval)
+    name = partition_name(table, start)
+    default = default_partition_name(table)
+    qn = connection.ops.quote_name
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    # DDL : pas de paramètres liés, bornes calculées ici (jamais d'entrée utilisateur)
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", [default])
+        stray = False
+        if cur.fetchone()[0] is not None:
+            cur.execute(
+                f"SELECT 1 FROM {qn(default)} WHERE {qn(PARTITION_FIELD)} >= %s AND {qn(PARTITION_FIELD)} < %s LIMIT 1",
+                [start, end],
+            )
+            stray = cur.fetchone() is not None
+        if not stray:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(table)} FOR VALUES {bounds}")
+            return
+        # lignes de cette plage déjà dans DEFAULT : CREATE ... PARTITION OF échouerait,
+        # on les déplace dans une table autonome puis on l'attache
+        cur.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS)")
+        cur.execute(
+            f"WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(PARTITION_FIELD)} >= %s "
+            f"AND {qn(PARTITION_FIELD)} < %s RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cur.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES {bounds}")
+
+
+def ensure_partitions(model, now, interval: str, ahead: int, since=None):
+    """
+    Crée les partitions manquantes de `since` (défaut: période courante) à
+    `ahead` périodes devant, et la partition DEFAULT.
+    """
+    ensure_default_partition(model)
+    step = period_step(interval)
+    existing = {start for _, start, _ in list_partitions(model)}
+    start = period_start(since or now, interval)
+    last = period_start(now, interval) + step * ahead
+    created = 0
+    while start <= last:
+        if start not in existing:
+            create_partition(model, start, interval)
+            created += 1
+        start += step
+    return created
+
+
+def drop_partitions_before(model, cutoff) -> int:
+    """
+    DROP des partitions entièrement antérieures à cutoff. Renvoie une estimation
+    du nb de lignes supprimées : pg_class.reltuples (stats de l'autovacuum), pas
+    de count(*) qui relirait toute la partition juste avant de la jeter.
+    """
+    qn = connection.ops.quote_name
+    removed = 0
+    for name, _, end in list_partitions(model):
+        if end > cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cur:
+            # -1 tant que la partition n'a jamais été analysée
+            cur.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass", [qn(name)])
+            removed += cur.fetchone()[0]
+            cur.execute(f"DROP TABLE {qn(name)}")
+    return removed
+
+
+def convert_to_partitioned(model, interval: str, ahead: int, keep_legacy: bool = False):
+    """
+    Convertit la table du modèle en table partitionnée par recorded_at.
+
+    - renomme la table actuelle en <table>_legacy (et ses index/contraintes),
+    - crée le parent partitionné (PK (id, recorded_at), séquence pour id),
+    - recrée les index et la FK du modèle sur le parent,
+    - crée les partitions couvrant les données + `ahead` périodes, et DEFAULT,
+    - recopie les lignes puis supprime la table legacy (sauf keep_legacy).
+
+    Tout se passe dans une transaction avec verrou exclusif : à lancer
+    pendant une fenêtre de maintenance (workers arrêtés).
+    """
+    if not supported():
+        raise RuntimeError("Partitioning requires PostgreSQL")
+    if is_partitioned(model):
+        return 0
+
+    meta = model._meta
+    table = meta.db_table
+    legacy = f"{table}_legacy"
+    seq = f"{table}_id_seq_p"
+    qn = connection.ops.quote_name
+    fk_field = next((f for f in meta.concrete_fields if f.is_relation), None)
+
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+            cur.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+
+            # les noms d'index/contraintes sont globaux au schéma : on libère ceux du modèle
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [legacy])
+            for (index_name,) in cur.fetchall():
+                cur.execute(f"ALTER INDEX {qn(index_name)} RENAME TO {qn(index_name[:50] + '_legacy')}")
+            cur.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [legacy],
+            )
+            for (con_name,) in cur.fetchall():
+                cur.execute(
+                    f"ALTER TABLE {qn(legacy)} RENAME CONSTRAINT {qn(con_name)} TO {qn(con_name[:50] + '_legacy')}"
+                )
+
+            cur.execute(
+                f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS) "
+                f"PARTITION BY RANGE ({qn(PARTITION_FIELD)})"
+            )
+            # pas d'IDENTITY sur une table partitionnée avant PG17 : séquence classique
+            cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(seq)} OWNED BY {qn(table)}.id")
+            cur.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+            cur.execute(f"SELECT setval('{seq}', COALESCE((SELECT max(id) FROM {qn(legacy)}), 0) + 1, false)")
+            cur.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(PARTITION_FIELD)})")
+
+            if fk_field is not None:
+                target = fk_field.related_model._meta.db_table
+                cur.execute(
+                    f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table[:40] + '_' + fk_field.column + '_fk_p')} "
+                    f"FOREIGN KEY ({qn(fk_field.column)}) REFERENCES {qn(target)} (id) DEFERRABLE INITIALLY DEFERRED"
+                )
+
+            cur.execute(f"SELECT min({qn(PARTITION_FIELD)}) FROM {qn(legacy)}")
+            oldest = cur.fetchone()[0]
+
+        with connection.schema_editor() as editor:
+            for index in meta.indexes:
+                editor.add_index(model, index)
+            if fk_field is not None and fk_field.db_index:
+                # index FK implicite de Django (monitor_check_id / asset_id)
+                editor.execute(editor._create_index_sql(model, fields=[fk_field]))
+
+        ensure_partitions(model, datetime.now(dt_timezone.utc), interval, ahead, since=oldest)
+
+        with connection.cursor() as cur:
+            cur.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+            copied = cur.rowcount
+            if not keep_legacy:
+                cur.execute(f"DROP TABLE {qn(legacy)}")
+    return copied
@@ -0,0 +1,267 @@
+"""
+Moteur de sondes asyncio.
+
+Un worker Celery exécute un lot de checks en parallèle au lieu d'un task par check :
+- limite globale (nb de sondes en vol dans le worker)
+- limite par hôte (pour ne pas marteler une même machine)
+
+Ce module ne dépend pas de Django : il prend des ProbeSpec (valeurs simples)
+et rend des ProbeOutcome, la persistance reste côté tasks.
+"""
+import asyncio
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlsplit
+
+from .dnscache import aconnect
+from .httpclient import timed_get
+from .icmp import AsyncPinger, IcmpUnavailable
+from .tlscert import afetch_certificate, expiry_verdict
+
+
+class ProbeSpec:
+    """Ce qu'il faut savoir pour sonder un check, sans l'ORM."""
+
+    def __init__(self, check_id, kind, host, port=None, timeout=3, expected_status=200, ssl_days_threshold=14,
+                 http_mode="pooled", ping_count=1):
+        self.check_id = check_id
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.expected_status = expected_status
+        self.ssl_days_threshold = ssl_days_threshold
+        self.http_mode = http_mode
+        self.ping_count = max(1, ping_count or 1)
+
+
+class ProbeOutcome:
+    def __init__(self, spec, ok, message, latency_ms=None, recorded_at=None, timings=None, cert=None):
+        self.spec = spec
+        self.check_id = spec.check_id
+        self.ok = ok
+        self.message = message
+        self.latency_ms = latency_ms
+        self.timings = timings
+        self.cert = cert  # CertInfo (core/tlscert.py) pour ssl_expiry
+        self.duration = None  # secondes passées dans la sonde, renseigné par ProbeEngine
+        self.recorded_at = recorded_at or datetime.now(dt_timezone.utc)
+
+    def __repr__(self):
+        return f"<ProbeOutcome check={self.check_id} ok={self.ok} latency={self.latency_ms}>"
+
+
+def http_url(host: str) -> str:
+    if not (host.startswith("http://") or host.startswith("https://")):
+        return "http://" + host
+    return host
+
+
+def spec_hostname(spec) -> str:
+    """Nom à résoudre pour une spec (l'hôte d'une URL pour les checks http)."""
+    if spec.kind == "http":
+        return urlsplit(http_url(spec.host)).hostname or ""
+    return spec.host
+
+
+async def _probe_ping(host: str, timeout: int):
+    # repli quand aucune socket ICMP n'est disponible (cf core/icmp.py)
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        "ping", "-c", "1", "-W", str(timeout), host,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate()
+    ms = (time.perf_counter() - t0) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode(errors="replace").strip() or out.decode(errors="replace").strip() or "Ping failed")
+    return ms
+
+
+def ping_result(stats):
+    """PingStats -> (latency_ms, message, timings). Lève si aucune réponse."""
+    timings = stats.as_dict()
+    if not stats.received:
+        raise RuntimeError(f"No ICMP reply from {stats.host} ({stats.sent} sent)")
+    message = "Ping OK"
+    if stats.sent > 1:
+        message += f" ({stats.received}/{stats.sent}, loss {timings['loss_pct']}%)"
+    return stats.avg_ms, message, timings
+
+
+async def _resolve(host: str, timeout: int, dns=None):
+    """-> (adresses à joindre, dns_ms). Sans cache, la résolution reste dans open_connection."""
+    if dns is None:
+        return host, None
+    return await asyncio.wait_for(dns.aresolve(host), timeout)
+
+
+async def _probe_tcp(host: str, port: int, timeout: int, dns=None):
+    """-> (connect_ms, timings). La résolution DNS est mesurée à part (dns_ms)."""
+    addrs, dns_ms = await _resolve(host, timeout, dns)
+    t0 = time.perf_counter()
+    _, writer = await aconnect(addrs, port, timeout)
+    ms = (time.perf_counter() - t0) * 1000.0
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    timings = {"connect_ms": round(ms, 3)}
+    if dns_ms is not None:
+        timings["dns_ms"] = round(dns_ms, 3)
+    return ms, timings
+
+
+class ProbeEngine:
+    """
+    Exécute des ProbeSpec en parallèle.
+
+    concurrency : nb max de sondes simultanées pour tout le lot
+    per_host    : nb max de sondes simultanées vers un même hôte
+    http_threads: taille du pool de threads pour les checks http (requests est bloquant)
+    dns         : DnsCache partagé (core/dnscache.py), None = résolution à chaque sonde
+    prefetch    : résout tous les hôtes du lot avant de lancer les sondes
+    """
+
+    def __init__(self, concurrency: int = 200, per_host: int = 4, http_threads: int = 32, dns=None,
+                 prefetch: bool = True):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.http_threads = max(1, http_threads)
+        self.dns = dns
+        self.prefetch = prefetch
+
+    async def run(self, specs, on_outcome=None):
+        specs = list(specs)
+        global_sem = asyncio.Semaphore(self.concurrency)
+        host_sems = {}
+        executor = ThreadPoolExecutor(max_workers=self.http_threads, thread_name_prefix="probe-http")
+        pinger = None
+        if any(s.kind == "ping" for s in specs):
+            try:
+                # une socket ICMP partagée par tout le lot
+                pinger = AsyncPinger()
+            except (IcmpUnavailable, OSError):
+                pinger = None
+        if self.dns is not None and self.prefetch:
+            await self.dns.prefetch(spec_hostname(s) for s in specs)
+
+        async def _one(spec):
+            host_sem = host_sems.setdefault(spec.host.lower(), asyncio.Semaphore(self.per_host))
+            async with global_sem, host_sem:
+                t0 = time.perf_counter()
+                outcome = await self._execute(spec, executor, pinger)
+                outcome.duration = time.perf_counter() - t0
+            if on_outcome:
+                on_outcome(outcome)
+            return outcome
+
+        try:
+            return await asyncio.gather(*(_one(s) for s in specs))
+        finally:
+            executor.shutdown(wait=False)
+            if pinger:
+                pinger.close()
+
+    def run_sync(self, specs):
+        return asyncio.run(self.run(list(specs)))
+
+    def iter_outcomes(self, specs):
+        """
+        Lance le lot dans un thread (boucle asyncio dédiée) et rend les
+        ProbeOutcome au fil de l'eau, pour que l'appelant (ORM synchrone)
+        puisse persister pendant que les sondes continuent.
+        """
+        specs = list(specs)
+        q = queue.Queue()
+        done = object()
+        errors = []
+
+        def _worker():
+            try:
+                asyncio.run(self.run(specs, on_outcome=q.put))
+            except BaseException as e:  # remonté dans le thread appelant
+                errors.append(e)
+            finally:
+                q.put(done)
+
+        t = threading.Thread(target=_worker, name="probe-loop", daemon=True)
+        t.start()
+        while True:
+            item = q.get()
+            if item is done:
+                break
+            yield item
+        t.join()
+        if errors:
+            raise errors[0]
+
+    async def _execute(self, spec, executor, pinger=None):
+        latency_ms = None
+        timings = None
+        # garde-fou: une sonde ne doit jamais bloquer le lot au-delà de son timeout
+        deadline = spec.timeout + 2
+
+        try:
+            if spec.kind == "ping":
+                if pinger:
+                    addrs, dns_ms = await _resolve(spec.host, spec.timeout, self.dns)
+                    stats = await asyncio.wait_for(
+                        pinger.ping(spec.host, count=spec.ping_count, timeout=spec.timeout,
+                                    ip=addrs[0] if self.dns is not None else None),
+                        deadline + spec.ping_count,
+                    )
+                    latency_ms, message, timings = ping_result(stats)
+                    if dns_ms is not None:
+                        timings["dns_ms"] = round(dns_ms, 3)
+                else:
+                    latency_ms = await asyncio.wait_for(_probe_ping(spec.host, spec.timeout), deadline)
+                    message = "Ping OK"
+
+            elif spec.kind == "tcp_port":
+                if not spec.port:
+                    raise RuntimeError("Missing port")
+                latency_ms, timings = await _probe_tcp(spec.host, int(spec.port), spec.timeout, self.dns)
+                message = f"TCP {spec.port} OK"
+
+            elif spec.kind == "http":
+                loop = asyncio.get_running_loop()
+                latency_ms, timings = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        executor,
+                        functools.partial(
+                            timed_get, http_url(spec.host), spec.timeout, spec.expected_status, spec.http_mode,
+                            resolve=self.dns.resolve if self.dns is not None else None,
+                        ),
+                    ),
+                    deadline,
+                )
+                message = "HTTP OK"
+
+            elif spec.kind == "ssl_expiry":
+                p = int(spec.port or 443)
+                addrs, dns_ms = await _resolve(spec.host, spec.timeout, self.dns)
+                t0 = time.perf_counter()
+                cert = await afetch_certificate(spec.host, p, spec.timeout, addrs)
+                timings = {"handshake_ms": round((time.perf_counter() - t0) * 1000.0, 3)}
+                if dns_ms is not None:
+                    timings["dns_ms"] = round(dns_ms, 3)
+                ok, message, _ = expiry_verdict(cert["not_after"], spec.ssl_days_threshold)
+                # seuil dépassé : outcome KO mais le certificat lu reste exploitable (inventaire)
+                return ProbeOutcome(spec, ok, message, timings=timings, cert=cert)
+
+            else:
+                raise RuntimeError(f"Unknown kind: {spec.kind}")
+
+        except asyncio.TimeoutError:
+            return ProbeOutcome(spec, False, f"Timeout after {spec.timeout}s")
+        except Exception as e:
+            return ProbeOutcome(spec, False, (str(e) or e.__class__.__name__)[:2000])
+
+        return ProbeOutcome(spec, True, message, latency_ms, timings=timings)
@@ -0,0 +1,164 @@
+"""
+Rétention / downsampling de CheckResult et MetricSample.
+
+- CheckResult brut > RETENTION_RESULTS_DAYS : on s'assure que les rollups
+  horaires existent (backfill si l'historique est antérieur aux rollups), puis suppression.
+- MetricSample brut > RETENTION_METRICS_DAYS : agrégé en MetricRollup (1h), puis suppression.
+- CheckRollup / MetricRollup : purgés selon leur propre durée par résolution.
+
+Les suppressions se font par tranches de clé primaire (RETENTION_DELETE_CHUNK),
+chacune dans sa propre petite transaction : jamais de long verrou. Si la
+table est partitionnée (core/partitions.py), les partitions entièrement
+expirées sont simplement DROP.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from . import partitions
+from .models import CheckResult, CheckRollup, MetricRollup, MetricSample
+from .rollups import bucket_floor, rebuild_rollups
+from .series import DateBin
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def delete_in_chunks(qs, chunk_size: int) -> int:
+    """DELETE par tranches [pk, pk + chunk_size) sur les lignes du queryset."""
+    bounds = qs.aggregate(lo=Min("pk"), hi=Max("pk"))
+    lo, hi = bounds["lo"], bounds["hi"]
+    if lo is None:
+        return 0
+
+    deleted = 0
+    start = lo
+    while start <= hi:
+        n, _ = qs.filter(pk__gte=start, pk__lt=start + chunk_size).delete()
+        deleted += n
+        start += chunk_size
+    return deleted
+
+
+def purge_older_than(model, cutoff, chunk_size: int) -> int:
+    removed = 0
+    if settings.PARTITIONING_ENABLED and partitions.is_partitioned(model):
+        removed += partitions.drop_partitions_before(model, cutoff)
+    # reste : la partition à cheval sur cutoff (ou table classique)
+    removed += delete_in_chunks(model.objects.filter(recorded_at__lt=cutoff), chunk_size)
+    return removed
+
+
+def _downsample_check_results(cutoff):
+    """
+    Backfill des rollups horaires manquants pour les heures brutes qui vont disparaître.
+    Couverture par (check, heure) : une heure dont seuls certains checks ont un rollup
+    n'est recalculée que pour les autres. -> nb d'heures complétées.
+    """
+    raw = CheckResult.objects.filter(recorded_at__lt=cutoff)
+    oldest = raw.aggregate(v=Min("recorded_at"))["v"]
+    if oldest is None:
+        return 0
+
+    raw_pairs = set(
+        raw.annotate(bucket=DateBin("recorded_at", HOUR)).values_list("monitor_check_id", "bucket").distinct()
+    )
+    covered = set(
+        CheckRollup.objects.filter(resolution=HOUR, bucket_start__gte=bucket_floor(oldest, HOUR), bucket_start__lt=cutoff)
+        .values_list("monitor_check_id", "bucket_start")
+    )
+    missing = defaultdict(list)  # heure -> checks sans rollup
+    for check_id, hour in raw_pairs - covered:
+        missing[hour].append(check_id)
+    for hour in sorted(missing):
+        rebuild_rollups(hour, hour + timedelta(seconds=HOUR), check_ids=missing[hour])
+    return len(missing)
+
+
+def _downsample_metric_samples(cutoff):
+    """Agrège MetricSample brut (heures complètes < cutoff) en MetricRollup 1h. Idempotent."""
+    rows = (
+        MetricSample.objects.filter(recorded_at__lt=cutoff)
+        .annotate(bucket=DateBin("recorded_at", HOUR))
+        .values("asset_id", "key", "labels", "unit", "bucket")
+        .annotate(n=Count("id"), s=Sum("value"), lo=Min("value"), hi=Max("value"))
+        .order_by()
+    )
+    batch, total = [], 0
+    for row in rows.iterator():
+        batch.append(MetricRollup(
+            asset_id=row["asset_id"],
+            key=row["key"],
+            labels=row["labels"],
+            unit=row["unit"],
+            resolution=HOUR,
+            bucket_start=row["bucket"],
+            count=row["n"],
+            value_sum=row["s"],
+            value_min=row["lo"],
+            value_max=row["hi"],
+        ))
+        if len(batch) >= 1000:
+            total += _upsert_metric_rollups(batch)
+            batch = []
+    if batch:
+        total += _upsert_metric_rollups(batch)
+    return total
+
+
+def _upsert_metric_rollups(batch):
+    # rejouable : une heure recalculée depuis le brut complet écrase l'ancienne valeur
+    with_asset = [r for r in batch if r.asset_id is not None]
+    without_asset = [r for r in batch if r.asset_id is None]
+    with transaction.atomic():
+        MetricRollup.objects.bulk_create(
+            with_asset,
+            update_conflicts=True,
+            unique_fields=["asset", "key", "labels", "resolution", "bucket_start"],
+            update_fields=["unit", "count", "value_sum", "value_min", "value_max"],
+        )
+        # asset NULL : les NULL sont distincts pour la contrainte unique, ON CONFLICT ne
+        # se déclencherait jamais ; on remplace (DELETE puis INSERT) les buckets concernés
+        for i in range(0, len(without_asset), 200):
+            chunk = without_asset[i:i + 200]
+            match = Q()
+            for r in chunk:
+                match |= Q(key=r.key, labels=r.labels, resolution=r.resolution, bucket_start=r.bucket_start)
+            MetricRollup.objects.filter(match, asset__isnull=True).delete()
+            MetricRollup.objects.bulk_create(chunk)
+    return len(batch)
+
+
+def apply_retention(now=None):
+    """Applique la politique de rétention et renvoie le nombre de lignes supprimées par table."""
+    now = now or timezone.now()
+    chunk = settings.RETENTION_DELETE_CHUNK
+    report = {}
+
+    # cutoff aligné sur l'heure : on ne coupe jamais une heure en deux
+    results_cutoff = bucket_floor(now - timedelta(days=settings.RETENTION_RESULTS_DAYS), HOUR)
+    report["rollups_backfilled_hours"] = _downsample_check_results(results_cutoff)
+    report["check_results"] = purge_older_than(CheckResult, results_cutoff, chunk)
+
+    metrics_cutoff = bucket_floor(now - timedelta(days=settings.RETENTION_METRICS_DAYS), HOUR)
+    report["metric_rollups_written"] = _downsample_metric_samples(metrics_cutoff)
+    report["metric_samples"] = purge_older_than(MetricSample, metrics_cutoff, chunk)
+
+    deleted_rollups = 0
+    for res, days in settings.RETENTION_ROLLUP_DAYS.items():
+        deleted_rollups += delete_in_chunks(
+            CheckRollup.objects.filter(resolution=res, bucket_start__lt=now - timedelta(days=days)), chunk
+        )
+    report["check_rollups"] = deleted_rollups
+    report["metric_rollups"] = delete_in_chunks(
+        MetricRollup.objects.filter(bucket_start__lt=now - timedelta(days=settings.RETENTION_METRIC_ROLLUP_DAYS)), chunk
+    )
+
+    logger.info("retention: %s", report)
+    return report
@@ -0,0 +1,224 @@
+"""
+Rollups CheckResult (1m / 10m / 1h).
+
+Chaque flush du ResultSink agrège son lot en mémoire puis fusionne dans
+CheckRollup (count, ok_count, somme/min/max de latence + sketch), dans la
+même transaction que les CheckResult. Les APIs de graphs lisent ces
+quelques lignes au lieu des résultats bruts.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+
+from .models import CheckResult, CheckRollup
+
+RESOLUTIONS = (60, 600, 3600)
+
+
+def bucket_floor(dt, seconds: int):
+    ts = int(dt.timestamp())
+    return datetime.fromtimestamp(ts - ts % seconds, tz=dt_timezone.utc)
+
+
+class LatencySketch:
+    """
+    Histogramme à buckets logarithmiques (façon DDSketch) : erreur relative
+    bornée par `accuracy` sur les quantiles, fusion = addition des compteurs.
+    Sérialisé en dict {index: count} dans CheckRollup.latency_sketch.
+    """
+
+    def __init__(self, counts=None, accuracy: float = 0.02):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts = {int(k): v for k, v in (counts or {}).items()}
+
+    def add(self, value: float, n: int = 1):
+        # latence < 1 µs -> bucket 0
+        idx = math.ceil(math.log(value) / self._log_gamma) if value > 0.001 else 0
+        self.counts[idx] = self.counts.get(idx, 0) + n
+
+    def merge(self, other):
+        for k, v in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        return self
+
+    def quantile(self, q: float):
+        total = sum(self.counts.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen > rank:
+                if idx == 0:
+                    return 0.0
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return None
+
+    def to_json(self):
+        return {str(k): v for k, v in self.counts.items()}
+
+
+class _Partial:
+    __slots__ = ("count", "ok_count", "latency_count", "latency_sum", "latency_min", "latency_max", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.ok_count = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_min = None
+        self.latency_max = None
+        self.sketch = LatencySketch()
+
+    def add(self, ok, latency_ms):
+        self.count += 1
+        if ok:
+            self.ok_count += 1
+        if latency_ms is not None:
+            self.latency_count += 1
+            self.latency_sum += latency_ms
+            self.latency_min = latency_ms if self.latency_min is None else min(self.latency_min, latency_ms)
+            self.latency_max = latency_ms if self.latency_max is None else max(self.latency_max, latency_ms)
+            self.sketch.add(latency_ms)
+
+    def merge_into(self, row: CheckRollup):
+        row.count += self.count
+        row.ok_count += self.ok_count
+        row.latency_count += self.latency_count
+        row.latency_sum += self.latency_sum
+        if self.latency_min is not None:
+            row.latency_min = self.latency_min if row.latency_min is None else min(row.latency_min, self.latency_min)
+            row.latency_max = self.latency_max if row.latency_max is None else max(row.latency_max, self.latency_max)
+        if self.sketch.counts:
+            row.latency_sketch = LatencySketch(row.latency_sketch).merge(self.sketch).to_json()
+
+
+def _aggregate(rows):
+    """rows: itérable de (check_id, ok, latency_ms, recorded_at)."""
+    partials = {}
+    for check_id, ok, latency_ms, recorded_at in rows:
+        for res in RESOLUTIONS:
+            key = (check_id, res, bucket_floor(recorded_at, res))
+            p = partials.get(key)
+            if p is None:
+                p = partials[key] = _Partial()
+            p.add(ok, latency_ms)
+    return partials
+
+
+def _merge(partials):
+    # un lot couvre peu de buckets distincts : filtre large sur l'index unique,
+    # on ne garde que les clés qui nous concernent.
+    existing = {}
+    for r in CheckRollup.objects.select_for_update().filter(
+        monitor_check_id__in={k[0] for k in partials},
+        resolution__in={k[1] for k in partials},
+        bucket_start__in={k[2] for k in partials},
+    ):
+        key = (r.monitor_check_id, r.resolution, r.bucket_start)
+        if key in partials:
+            existing[key] = r
+
+    to_update, to_create = [], []
+    for key, p in partials.items():
+        row = existing.get(key)
+        if row is None:
+            row = CheckRollup(monitor_check_id=key[0], resolution=key[1], bucket_start=key[2])
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        p.merge_into(row)
+
+    if to_update:
+        CheckRollup.objects.bulk_update(
+            to_update,
+            ["count", "ok_count", "latency_count", "latency_sum", "latency_min", "latency_max", "latency_sketch"],
+            batch_size=500,
+        )
+    if to_create:
+        CheckRollup.objects.bulk_create(to_create, batch_size=500)
+
+
+def apply_results(rows):
+    """
+    Fusionne un lot de résultats (check_id, ok, latency_ms, recorded_at)
+    dans les rollups. À appeler dans la transaction qui écrit les CheckResult.
+    """
+    partials = _aggregate(rows)
+    if not partials:
+        return 0
+
+    # un autre worker peut créer le même bucket entre notre SELECT et l'INSERT :
+    # on rejoue alors une fois, la ligne existe et passe en UPDATE.
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge(partials)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    return len(partials)
+
+
+def rebuildable_since():
+    """
+    Début le plus ancien reconstructible depuis le brut : heure du plus vieux
+    CheckResult encore présent (None si aucun). La rétention purge à l'heure
+    pile, cette heure est donc complète ; avant, seuls les rollups gardent l'historique.
+    """
+    oldest = CheckResult.objects.order_by("recorded_at").values_list("recorded_at", flat=True).first()
+    return None if oldest is None else bucket_floor(oldest, max(RESOLUTIONS))
+
+
+def _rebuild_window(start, end, chunk_size: int, check_ids=None) -> int:
+    # une transaction par heure : rollups verrouillés et supprimés, brut relu, rollups réécrits.
+    # Un flush concurrent du sink attend le verrou puis fusionne ses résultats (non lus ici)
+    # dans les lignes recréées : rien n'est compté deux fois ni perdu.
+    raw = CheckResult.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+    window = CheckRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end)
+    if check_ids is not None:
+        raw = raw.filter(monitor_check_id__in=check_ids)
+        window = window.filter(monitor_check_id__in=check_ids)
+    with transaction.atomic():
+        if not raw.exists():
+            return 0  # brut absent : on garde les rollups tels quels
+        list(window.select_for_update().order_by("id").values_list("id", flat=True))
+        window.delete()
+        counted = 0
+
+        def rows():
+            nonlocal counted
+            for row in raw.order_by("recorded_at").values_list(
+                "monitor_check_id", "ok", "latency_ms", "recorded_at"
+            ).iterator(chunk_size=chunk_size):
+                counted += 1
+                yield row
+
+        _merge(_aggregate(rows()))
+    return counted
+
+
+def rebuild_rollups(since, until, chunk_size: int = 5000, check_ids=None):
+    """
+    Recalcule les rollups d'une fenêtre depuis les CheckResult bruts (backfill),
+    heure par heure, pour tous les checks ou seulement `check_ids`. `since` est
+    ramené à rebuildable_since() : les rollups plus anciens que le brut ne sont
+    jamais supprimés. -> nb de résultats agrégés.
+    """
+    step = timedelta(seconds=max(RESOLUTIONS))
+    # fenêtre alignée sur la plus grosse résolution : chaque bucket supprimé est recalculé en entier
+    since = bucket_floor(since, max(RESOLUTIONS))
+    until = bucket_floor(until, max(RESOLUTIONS))
+    floor = rebuildable_since()
+    if floor is None:
+        return 0
+    since = max(since, floor)
+    total = 0
+    while since < until:
+        total += _rebuild_window(since, since + step, chunk_size, check_ids)
+        since += step
+    return total
@@ -0,0 +1,69 @@
+"""
+Scheduler "due checks only".
+
+Chaque check porte un next_run_at indexé : un tick ne lit que les checks
+échus (next_run_at <= now), les réserve en avançant leur next_run_at, puis
+les envoie par lots à run_check_batch. Plus de scan de toute la table, et
+le tick (quelques secondes) permet des intervalles sous la minute.
+
+Les checks assignés à un agent ou à une région sont laissés aux sondes
+déportées (core/agents.py) et ne sont jamais réservés ici.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Check
+
+
+def _next_run(check: Check, now, min_interval: int):
+    step = timedelta(seconds=max(check.interval_seconds, min_interval))
+    nxt = (check.next_run_at or now) + step
+    # en retard de plus d'un intervalle (worker arrêté, backlog...) : on repart de maintenant
+    if nxt <= now:
+        nxt = now + step
+    return nxt
+
+
+def claim_due(now=None, limit: int = 10000, min_interval: int = 5):
+    """
+    Réserve au plus `limit` checks échus et renvoie [(id, échéance)] ;
+    échéance = next_run_at avant réservation (None pour un check jamais planifié).
+
+    SELECT ... FOR UPDATE SKIP LOCKED : deux beats/ticks concurrents ne
+    prennent jamais le même check.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = list(
+            Check.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(is_enabled=True, asset__is_enabled=True, agent__isnull=True, region="")
+            .filter(Q(next_run_at__lte=now) | Q(next_run_at__isnull=True))
+            .order_by(F("next_run_at").asc(nulls_first=True))
+            .only("id", "interval_seconds", "next_run_at")[:limit]
+        )
+        claimed = []
+        for c in due:
+            claimed.append((c.id, c.next_run_at))
+            c.next_run_at = _next_run(c, now, min_interval)
+        Check.objects.bulk_update(due, ["next_run_at"], batch_size=1000)
+
+    return claimed
+
+
+def count_overdue(now=None) -> int:
+    """Checks échus restant après réservation (backlog d'un tick saturé)."""
+    now = now or timezone.now()
+    return (
+        Check.objects.filter(is_enabled=True, asset__is_enabled=True, agent__isnull=True, region="")
+        .filter(Q(next_run_at__lte=now) | Q(next_run_at__isnull=True))
+        .count()
+    )
+
+
+def chunked(ids, size: int):
+    size = max(1, size)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
@@ -0,0 +1,62 @@
+"""
+Recherche d'assets (page /assets/).
+
+PostgreSQL : index GIN pg_trgm sur UPPER(col) (migration 0011), ce qui couvre
+les `icontains` que Django traduit en UPPER(col::text) LIKE UPPER(%s) ; le
+classement se fait par similarité trigramme pondérée (nom > tags/adresse >
+description).
+
+Autres bases (SQLite en dev/test) : mêmes filtres icontains, classement par
+règles simples (nom exact, préfixe, contient...).
+"""
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, Q, Value, When
+from django.db.models.functions import Greatest
+
+SEARCH_FIELDS = ("name", "address", "description", "tags", "ip_or_host")
+
+# poids des champs dans le score
+WEIGHTS = {"name": 1.0, "tags": 0.7, "address": 0.6, "ip_or_host": 0.6, "description": 0.3}
+
+
+class WordSimilarity(Func):
+    """pg_trgm word_similarity(query, champ) : proximité de la requête avec un mot du champ."""
+
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+def _match(q: str) -> Q:
+    cond = Q()
+    for field in SEARCH_FIELDS:
+        cond |= Q(**{f"{field}__icontains": q})
+    return cond
+
+
+def _pg_rank(q: str):
+    terms = [
+        WordSimilarity(Value(q.upper()), Func(F(field), function="UPPER")) * Value(weight)
+        for field, weight in WEIGHTS.items()
+    ]
+    return Greatest(*terms)
+
+
+def _fallback_rank(q: str):
+    q = q.lower()
+    return Case(
+        When(Q(name__iexact=q), then=Value(4.0)),
+        When(Q(name__istartswith=q), then=Value(3.0)),
+        When(Q(name__icontains=q), then=Value(2.0)),
+        When(Q(tags__icontains=q) | Q(address__icontains=q) | Q(ip_or_host__icontains=q), then=Value(1.0)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )
+
+
+def search_assets(qs, q: str):
+    """Filtre + classement (annotation `rank`), meilleurs résultats d'abord puis par nom."""
+    q = (q or "").strip()
+    if not q:
+        return qs
+    rank = _pg_rank(q) if connection.vendor == "postgresql" else _fallback_rank(q)
+    return qs.filter(_match(q)).annotate(rank=rank).order_by("-rank", "name", "id")
@@ -0,0 +1,184 @@
+"""
+Séries temporelles calculées en base.
+
+Le bucketing se fait en SQL (date_bin sur PostgreSQL, arithmétique epoch sur
+SQLite) avec Avg/Sum/Count(... FILTER ...) : la base renvoie une ligne par
+bucket et le worker web garde une mémoire constante quel que soit l'historique.
+
+Quand le pas est un multiple d'une résolution de rollup (1m/10m/1h), on
+re-bucketise CheckRollup ; sinon on tombe sur CheckResult brut.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, DateTimeField, Func, Q, Sum
+
+from .models import CheckResult, CheckRollup
+from .rollups import RESOLUTIONS, bucket_floor
+
+MAX_POINTS = 1500
+
+_DURATION_RE = re.compile(r"^\s*(\d{1,12})\s*([smhdw])\s*$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value, default: timedelta) -> timedelta:
+    """
+    '90s', '10m', '24h', '7d', '2w' -> timedelta. Valeur vide ou invalide -> default.
+    Plafonnée à la plus longue rétention : au-delà il n'y a plus de données, et
+    `now - durée` ne déborde pas.
+    """
+    m = _DURATION_RE.match(value or "")
+    if not m:
+        return default
+    seconds = int(m.group(1)) * _UNITS[m.group(2)]
+    if seconds <= 0:
+        return default
+    return timedelta(seconds=min(seconds, _max_retention_seconds()))
+
+
+def _max_retention_seconds() -> int:
+    days = max(
+        settings.RETENTION_RESULTS_DAYS,
+        settings.RETENTION_METRICS_DAYS,
+        settings.RETENTION_METRIC_ROLLUP_DAYS,
+        *settings.RETENTION_ROLLUP_DAYS.values(),
+    )
+    return days * 86400
+
+
+def clamp_step(range_: timedelta, step: timedelta, max_points: int = MAX_POINTS) -> timedelta:
+    """
+    Élargit le pas si range/step dépasse max_points. Un pas élargi est arrondi
+    au multiple supérieur d'une résolution de rollup pour rester servi par CheckRollup.
+    """
+    seconds = max(1, int(step.total_seconds()))
+    min_seconds = -(-int(range_.total_seconds()) // max_points)
+    if seconds >= min_seconds:
+        return timedelta(seconds=seconds)
+
+    for res in sorted(RESOLUTIONS, reverse=True):
+        if min_seconds >= res:
+            min_seconds = -(-min_seconds // res) * res
+            break
+    return timedelta(seconds=min_seconds)
+
+
+class DateBin(Func):
+    """
+    date_bin(step, expr, origin) : début du bucket de `step` secondes contenant expr.
+    Origine fixe 2000-01-01 UTC, donc buckets alignés sur l'epoch.
+    """
+
+    output_field = DateTimeField()
+
+    def __init__(self, expression, step_seconds: int, **extra):
+        self.step_seconds = int(step_seconds)
+        super().__init__(expression, **extra)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template=(
+                f"date_bin(INTERVAL '{self.step_seconds} seconds', %(expressions)s, "
+                f"TIMESTAMPTZ '2000-01-01 00:00:00+00')"
+            ),
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        epoch = "CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0) AS INTEGER)"
+        return self.as_sql(
+            compiler,
+            connection,
+            template=f"datetime(({epoch} / {self.step_seconds}) * {self.step_seconds}, 'unixepoch')",
+            **extra_context,
+        )
+
+
+def _rollup_resolution(step_seconds: int):
+    # plus grosse résolution de rollup qui divise le pas
+    for res in sorted(RESOLUTIONS, reverse=True):
+        if step_seconds >= res and step_seconds % res == 0:
+            return res
+    return None
+
+
+def check_buckets(since, step: timedelta, until=None, **filters):
+    """
+    Une ligne par bucket : {"bucket", "n", "n_ok", "lat_avg"}.
+    `filters` s'applique au check (ex: monitor_check__asset=asset).
+    """
+    step_seconds = max(1, int(step.total_seconds()))
+    res = _rollup_resolution(step_seconds)
+
+    if res:
+        qs = CheckRollup.objects.filter(resolution=res, bucket_start__gte=bucket_floor(since, res), **filters)
+        if until:
+            qs = qs.filter(bucket_start__lt=until)
+        rows = (
+            qs.annotate(bucket=DateBin("bucket_start", step_seconds))
+            .values("bucket")
+            .annotate(
+                n=Sum("count"),
+                n_ok=Sum("ok_count"),
+                lat_n=Sum("latency_count"),
+                lat_sum=Sum("latency_sum"),
+            )
+            .order_by("bucket")
+        )
+        for row in rows.iterator():
+            yield {
+                "bucket": row["bucket"],
+                "n": row["n"] or 0,
+                "n_ok": row["n_ok"] or 0,
+                "lat_avg": (row["lat_sum"] / row["lat_n"]) if row["lat_n"] else None,
+            }
+        return
+
+    qs = CheckResult.objects.filter(recorded_at__gte=since, **filters)
+    if until:
+        qs = qs.filter(recorded_at__lt=until)
+    rows = (
+        qs.annotate(bucket=DateBin("recorded_at", step_seconds))
+        .values("bucket")
+        .annotate(
+            n=Count("id"),
+            n_ok=Count("id", filter=Q(ok=True)),
+            lat_avg=Avg("latency_ms"),
+        )
+        .order_by("bucket")
+    )
+    yield from rows.iterator()
+
+
+def latency_series(rows, fmt):
+    labels, values = [], []
+    for row in rows:
+        if row["lat_avg"] is None:
+            continue
+        labels.append(row["bucket"].strftime(fmt))
+        values.append(row["lat_avg"])
+    return labels, values
+
+
+def uptime_series(rows, fmt):
+    labels, values = [], []
+    for row in rows:
+        if not row["n"]:
+            continue
+        labels.append(row["bucket"].strftime(fmt))
+        values.append(round(row["n_ok"] / row["n"] * 100.0, 2))
+    return labels, values
+
+
+def label_format(range_: timedelta, step: timedelta) -> str:
+    if step < timedelta(minutes=1):
+        return "%H:%M:%S"
+    if range_ <= timedelta(days=1):
+        return "%H:%M"
+    if step >= timedelta(hours=1):
+        return "%d/%m %Hh"
+    return "%d/%m %H:%M"
@@ -0,0 +1,42 @@
+"""
+Signaux : maintien de l'index des tags sur Asset (core/tags.py), invalidation
+du cache des jetons d'agent (core/api.py) et de l'état d'alerte d'un check
+quand une alerte est modifiée hors du ResultSink (core/alertstate.py).
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .alertstate import forget_states
+from .api import forget_token
+from .models import AgentToken, Alert, Asset
+from .tags import release_asset_tags, sync_asset_tags
+
+
+@receiver(post_save, sender=Asset)
+def asset_saved(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata
+        return
+    sync_asset_tags(instance)
+
+
+@receiver(pre_delete, sender=Asset)
+def asset_deleted(sender, instance, **kwargs):
+    release_asset_tags(instance)
+
+
+@receiver(post_save, sender=AgentToken)
+@receiver(pre_delete, sender=AgentToken)
+def agent_token_changed(sender, instance, **kwargs):
+    # révocation / suppression effective tout de suite, sans attendre le TTL du cache
+    forget_token(instance.token_hash)
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def alert_changed(sender, instance, raw=False, **kwargs):
+    # le sink passe par bulk_create / update (pas de signal) : ici, fermeture à la main (admin)
+    if raw:
+        return
+    check_id = instance.monitor_check_id
+    transaction.on_commit(lambda: forget_states([check_id]))
@@ -0,0 +1,183 @@
+"""
+Result sink: bufferise les résultats de sondes et les écrit par lots.
+
+Un flush = 1 bulk_create CheckResult + 1 UPDATE Check.last_run_at
++ fusion des rollups + snapshot CheckStatus (core/checkstatus.py) + transitions d'alertes (core/alertstate.py, requêtes
+seulement sur ouverture/fermeture) : quelques requêtes par lot, plus par check.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import instrumentation
+from .alertstate import apply_transitions
+from .checkstatus import apply_status
+from .models import Check, CheckResult
+from .live import publish
+from .rollups import apply_results
+from .summary import invalidate_dashboard_summary
+
+
+class PendingResult:
+    def __init__(self, check, host, ok, message, latency_ms, recorded_at, timings=None):
+        self.check = check
+        self.host = host
+        self.ok = ok
+        self.message = message
+        self.latency_ms = latency_ms
+        self.recorded_at = recorded_at
+        self.timings = timings
+
+
+def _alert_title(check: Check) -> str:
+    return f"{check.asset.name}: {check.name} FAILED"
+
+
+def _alert_details(item: PendingResult) -> str:
+    return (
+        f"Asset: {item.check.asset.name}\n"
+        f"Host: {item.host}\n"
+        f"Kind: {item.check.kind}\n"
+        f"Message: {item.message}"
+    )
+
+
+def _describe(item: PendingResult):
+    return _alert_title(item.check), _alert_details(item)
+
+
+def _notify_events(items, opened, closed, now):
+    latest = {it.check.id: it for it in items}
+    events = []
+    for cid, title, details in opened:
+        it = latest[cid]
+        events.append({
+            "type": "opened", "check_id": cid, "asset": it.check.asset.name, "check": it.check.name,
+            "title": title, "message": it.message[:500], "details": details, "at": now,
+        })
+    for cid in closed:
+        check = latest[cid].check
+        events.append({
+            "type": "closed", "check_id": cid, "asset": check.asset.name, "check": check.name,
+            "title": f"{check.asset.name}: {check.name} RECOVERED", "at": now,
+        })
+    return events
+
+
+def _live_payload(items, opened, closed):
+    return {
+        "results": [
+            {
+                "check_id": it.check.id,
+                "asset": it.check.asset.name,
+                "check": it.check.name,
+                "ok": it.ok,
+                "latency_ms": it.latency_ms,
+                "message": it.message[:200],
+                "recorded_at": it.recorded_at,
+            }
+            for it in items
+        ],
+        "alerts_opened": [{"check_id": cid, "title": title} for cid, title, _ in opened],
+        "alerts_closed": len(closed),
+        "summary_delta": {
+            "results": len(items),
+            "failed": sum(1 for it in items if not it.ok),
+            "alerts_open": len(opened) - len(closed),
+        },
+    }
+
+
+class ResultSink:
+    """
+    Usage:
+        with ResultSink(max_size=500, max_age=2.0, notify=...) as sink:
+            sink.add(check, host, ok, message, latency_ms)
+
+    Flush automatique quand le buffer atteint max_size ou quand le plus vieux
+    résultat bufferisé a plus de max_age secondes, et à la sortie du with.
+    notify(events) est appelé une fois par flush (après commit) avec les transitions
+    d'alertes (ouvertes / rétablies), cf core/notify.py.
+    """
+
+    def __init__(self, max_size: int = 500, max_age: float = 2.0, notify=None):
+        self.max_size = max(1, max_size)
+        self.max_age = max_age
+        self.notify = notify
+        self._buffer = []
+        self._first_at = None
+        self.written = 0
+        # temps cumulés des flush (secondes), cf core/instrumentation.py
+        self.persist_seconds = 0.0
+        self.alerts_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def add(self, check, host, ok, message, latency_ms=None, recorded_at=None, timings=None):
+        if not self._buffer:
+            self._first_at = time.monotonic()
+        self._buffer.append(
+            PendingResult(check, host, ok, message, latency_ms, recorded_at or timezone.now(), timings)
+        )
+
+        if len(self._buffer) >= self.max_size or (time.monotonic() - self._first_at) >= self.max_age:
+            self.flush()
+
+    def flush(self):
+        items, self._buffer = self._buffer, []
+        self._first_at = None
+        if not items:
+            return 0
+
+        now = timezone.now()
+        t0 = time.perf_counter()
+        with transaction.atomic():
+            CheckResult.objects.bulk_create(
+                [
+                    CheckResult(
+                        monitor_check=it.check,
+                        ok=it.ok,
+                        message=it.message,
+                        latency_ms=it.latency_ms,
+                        timings=it.timings,
+                        recorded_at=it.recorded_at,
+                    )
+                    for it in items
+                ],
+                batch_size=1000,
+            )
+            Check.objects.filter(id__in={it.check.id for it in items}).update(last_run_at=now)
+            apply_results((it.check.id, it.ok, it.latency_ms, it.recorded_at) for it in items)
+            apply_status([(it.check.id, it.ok, it.latency_ms, it.message, it.recorded_at) for it in items], now)
+            t1 = time.perf_counter()
+            # machine d'état en cache : la base n'est touchée que sur ouverture/fermeture
+            opened, closed = apply_transitions(items, now, _describe)
+            t2 = time.perf_counter()
+        # commit compté dans l'écriture
+        persist, alerts = time.perf_counter() - t0 - (t2 - t1), t2 - t1
+        self.persist_seconds += persist
+        self.alerts_seconds += alerts
+        if instrumentation.enabled():
+            instrumentation.PERSIST_DURATION.observe(persist)
+            instrumentation.ALERTS_DURATION.observe(alerts)
+            instrumentation.SINK_WRITTEN.inc(len(items))
+
+        if opened or closed:
+            transaction.on_commit(invalidate_dashboard_summary)
+        if self.notify and (opened or closed):
+            events = _notify_events(items, opened, closed, now)
+            transaction.on_commit(lambda: self.notify(events))
+        # une seule diffusion live par flush
+        transaction.on_commit(lambda: publish("results", _live_payload(items, opened, closed)))
+
+        self.written += len(items)
+        return len(items)
@@ -0,0 +1,103 @@
+"""
+Résumé du dashboard mis en cache (Django cache -> Redis).
+
+Le calcul (quelques requêtes, les agrégats 24h/1h passent par CheckRollup)
+est fait par la task refresh_dashboard_summary, ou à la demande si le cache
+est vide ou plus vieux que DASHBOARD_CACHE_MAX_AGE. Le ResultSink invalide
+le cache quand une alerte s'ouvre ou se ferme : la vue fait une seule
+lecture de cache dans le cas courant.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Alert, Asset, Check, CheckRollup, CheckStatus
+from .rollups import bucket_floor
+
+CACHE_KEY = "dashboard:summary:v1"
+LOCK_KEY = "dashboard:summary:lock"
+
+
+def compute_dashboard_summary(now=None) -> dict:
+    now = now or timezone.now()
+    since_24h = bucket_floor(now - timedelta(hours=24), 600)
+    since_1h = bucket_floor(now - timedelta(hours=1), 60)
+
+    latest_alerts = [
+        {
+            "is_open": a.is_open,
+            "severity": a.severity,
+            "opened_at": a.opened_at,
+            "monitor_check": {"name": a.monitor_check.name, "asset": {"name": a.monitor_check.asset.name}},
+        }
+        for a in Alert.objects.select_related("monitor_check", "monitor_check__asset").order_by("-opened_at")[:10]
+    ]
+
+    # Uptime + latence moyenne 24h (tous checks) : une requête sur les rollups 10 min
+    agg = CheckRollup.objects.filter(resolution=600, bucket_start__gte=since_24h).aggregate(
+        n=Sum("count"), n_ok=Sum("ok_count"), lat_n=Sum("latency_count"), lat_sum=Sum("latency_sum")
+    )
+    total_results_24h = agg["n"] or 0
+    uptime_24h = ((agg["n_ok"] or 0) / total_results_24h * 100.0) if total_results_24h else 100.0
+    avg_latency_24h = (agg["lat_sum"] / agg["lat_n"]) if agg["lat_n"] else 0.0
+
+    # Checks failing (dernière heure): top checks avec le + de fails
+    failing_checks_1h = list(
+        CheckRollup.objects.filter(resolution=60, bucket_start__gte=since_1h)
+        .values("monitor_check__asset__name", "monitor_check__name")
+        .annotate(fails=Sum(F("count") - F("ok_count")))
+        .filter(fails__gt=0)
+        .order_by("-fails")[:8]
+    )
+
+    # Top assets en alerte (open)
+    top_alert_assets = list(
+        Alert.objects.filter(is_open=True)
+        .values("monitor_check__asset__name")
+        .annotate(c=Count("id"))
+        .order_by("-c")[:5]
+    )
+
+    return {
+        "computed_at": time.time(),
+        "assets_total": Asset.objects.count(),
+        "checks_total": Check.objects.count(),
+        # état courant (snapshot CheckStatus, index ok) : checks actifs dont le dernier résultat est KO
+        "checks_down": CheckStatus.objects.filter(ok=False, monitor_check__is_enabled=True).count(),
+        "alerts_open": Alert.objects.filter(is_open=True).count(),
+        "latest_alerts": latest_alerts,
+        "uptime_24h": round(uptime_24h, 2),
+        "avg_latency_24h": round(avg_latency_24h, 1),
+        "total_results_24h": total_results_24h,
+        "failing_checks_1h": failing_checks_1h,
+        "top_alert_assets": top_alert_assets,
+    }
+
+
+def refresh_dashboard_summary() -> dict:
+    data = compute_dashboard_summary()
+    # on garde la valeur au-delà du max_age : mieux vaut un résumé un peu vieux que rien si beat s'arrête
+    cache.set(CACHE_KEY, data, timeout=settings.DASHBOARD_CACHE_MAX_AGE * 10)
+    return data
+
+
+def get_dashboard_summary() -> dict:
+    data = cache.get(CACHE_KEY)
+    if data and time.time() - data["computed_at"] <= settings.DASHBOARD_CACHE_MAX_AGE:
+        return data
+
+    # un seul recalcul à la fois ; les autres servent la valeur périmée s'il y en a une
+    if cache.add(LOCK_KEY, 1, timeout=30):
+        try:
+            return refresh_dashboard_summary()
+        finally:
+            cache.delete(LOCK_KEY)
+    return data or compute_dashboard_summary()
+
+
+def invalidate_dashboard_summary():
+    cache.delete(CACHE_KEY)
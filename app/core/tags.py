@@ -0,0 +1,121 @@
+"""
+Index des tags d'assets (Tag / AssetTag).
+
+Asset.tags reste la saisie (admin, formulaires) ; à chaque save/delete d'un
+asset, sync_asset_tags répercute la différence dans AssetTag et ajuste
+Tag.asset_count par UPDATE F(). Filtre exact / multi-tags et nuage de tags
+deviennent chacun une requête indexée.
+
+Les écritures en masse qui contournent save() (queryset.update, imports SQL)
+se rattrapent avec `manage.py rebuild_tags`.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Asset, AssetTag, Tag
+
+MAX_TAG_LENGTH = 64
+
+
+def normalize_tags(value) -> list:
+    """'Prod, web ,WEB' ou ['Prod', 'web'] -> ['prod', 'web'] (ordre conservé, sans doublon)."""
+    if isinstance(value, str):
+        value = value.split(",")
+    seen = []
+    for t in value or ():
+        t = t.strip().lower()[:MAX_TAG_LENGTH]
+        if t and t not in seen:
+            seen.append(t)
+    return seen
+
+
+def _tag_ids(names) -> dict:
+    """{name: id}, crée les tags manquants."""
+    existing = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    missing = [n for n in names if n not in existing]
+    if missing:
+        Tag.objects.bulk_create([Tag(name=n) for n in missing], ignore_conflicts=True)
+        existing = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    return existing
+
+
+def _decremented():
+    # compteur déjà faux (bulk_create, SQL brut) : on reste à 0 plutôt que de violer
+    # le CHECK >= 0 et faire échouer Asset.save / delete ; rebuild_tags le recale
+    return Greatest(F("asset_count") - 1, 0)
+
+
+@transaction.atomic
+def sync_asset_tags(asset: Asset):
+    wanted = set(normalize_tags(asset.tags))
+    current = dict(
+        AssetTag.objects.filter(asset=asset).values_list("tag__name", "tag_id")
+    )
+    added = wanted - set(current)
+    removed = set(current) - wanted
+
+    if removed:
+        removed_ids = [current[n] for n in removed]
+        AssetTag.objects.filter(asset=asset, tag_id__in=removed_ids).delete()
+        Tag.objects.filter(id__in=removed_ids).update(asset_count=_decremented())
+    if added:
+        ids = _tag_ids(added)
+        AssetTag.objects.bulk_create(
+            [AssetTag(asset=asset, tag_id=ids[n]) for n in added],
+            ignore_conflicts=True,
+        )
+        Tag.objects.filter(id__in=ids.values()).update(asset_count=F("asset_count") + 1)
+
+
+def release_asset_tags(asset: Asset):
+    """Avant suppression d'un asset : décrémente les compteurs (les AssetTag partent en cascade)."""
+    Tag.objects.filter(asset_tags__asset=asset).update(asset_count=_decremented())
+
+
+@transaction.atomic
+def rebuild_tags(batch_size: int = 2000) -> int:
+    """Reconstruit AssetTag et les compteurs depuis Asset.tags. Renvoie le nb de liens."""
+    AssetTag.objects.all().delete()
+
+    links = []
+    names = set()
+    for asset_id, raw in Asset.objects.values_list("id", "tags").iterator(chunk_size=batch_size):
+        for name in normalize_tags(raw):
+            names.add(name)
+            links.append((asset_id, name))
+
+    ids = _tag_ids(names) if names else {}
+    AssetTag.objects.bulk_create(
+        [AssetTag(asset_id=asset_id, tag_id=ids[name]) for asset_id, name in links],
+        batch_size=batch_size,
+    )
+
+    Tag.objects.update(asset_count=0)
+    counts = AssetTag.objects.values("tag_id").annotate(n=Count("id"))
+    tags = [Tag(id=row["tag_id"], asset_count=row["n"]) for row in counts]
+    Tag.objects.bulk_update(tags, ["asset_count"], batch_size=batch_size)
+    Tag.objects.filter(asset_count=0).delete()
+    return len(links)
+
+
+def filter_by_tags(qs, tags):
+    """Assets portant TOUS les tags (exacts). Une sous-requête GROUP BY sur l'index (tag, asset)."""
+    tags = normalize_tags(tags)
+    if not tags:
+        return qs
+    matching = (
+        AssetTag.objects.filter(tag__name__in=tags)
+        .values("asset_id")
+        .annotate(n=Count("tag_id"))
+        .filter(n=len(tags))
+        .values("asset_id")
+    )
+    return qs.filter(id__in=matching)
+
+
+def tag_cloud(limit: int = 30):
+    """[{name, count}] des tags les plus utilisés."""
+    return list(
+        Tag.objects.filter(asset_count__gt=0).order_by("-asset_count", "name").values("name", "asset_count")[:limit]
+    )
@@ -1,136 +1,145 @@
-import socket
-import ssl
+import json
+import logging
 import subprocess
 import time
-from datetime import datetime, timezone as dt_timezone
 
-import requests
 from celery import shared_task
-from django.core.mail import send_mail
+from django.conf import settings
 from django.utils import timezone
 
-from .models import Check, CheckResult, Alert
+from . import certificates, dnscache, icmp, instrumentation, jobs, notify, partitions
+from .httpclient import timed_get
+from .models import Check
+from .probes import ProbeEngine, ProbeSpec, http_url, ping_result
+from .retention import apply_retention
+from .scheduler import chunked, claim_due, count_overdue
+from .sink import ResultSink
+from .summary import refresh_dashboard_summary as _refresh_dashboard_summary
+from .tlscert import expiry_verdict, fetch_certificate
+
+logger = logging.getLogger(__name__)
+
+
+def _dns_cache():
+    return dnscache.get_cache(settings.DNS_CACHE_SIZE, settings.DNS_CACHE_TTL, settings.DNS_NEGATIVE_TTL)
 
 
 def _tcp_check(host: str, port: int, timeout: int):
+    # DNS via le cache partagé, mesuré à part : latency = connect seul
+    addrs, dns_ms = _dns_cache().resolve(host)
     t0 = time.time()
-    with socket.create_connection((host, port), timeout=timeout):
+    with dnscache.connect(addrs, port, timeout):
         pass
-    return (time.time() - t0) * 1000.0
+    ms = (time.time() - t0) * 1000.0
+    return ms, {"dns_ms": round(dns_ms, 3), "connect_ms": round(ms, 3)}
 
 
-def _ping_check(host: str, timeout: int):
+def _ping_check(host: str, timeout: int, count: int = 1):
+    """-> (latency_ms, message, timings). ICMP natif (core/icmp.py), binaire ping en repli."""
+    try:
+        return ping_result(icmp.ping(host, count=count, timeout=timeout))
+    except icmp.IcmpUnavailable:
+        pass
+
     # ping binaire Debian souvent setuid -> OK sans capabilities custom
     t0 = time.time()
     proc = subprocess.run(["ping", "-c", "1", "-W", str(timeout), host], capture_output=True, text=True)
     ms = (time.time() - t0) * 1000.0
     if proc.returncode != 0:
         raise RuntimeError(proc.stderr.strip() or proc.stdout.strip() or "Ping failed")
-    return ms
+    return ms, "Ping OK", None
 
 
-def _http_check(url: str, timeout: int, expected_status: int):
-    t0 = time.time()
-    r = requests.get(url, timeout=timeout, allow_redirects=True)
-    ms = (time.time() - t0) * 1000.0
-    if r.status_code != expected_status:
-        raise RuntimeError(f"HTTP {r.status_code} (expected {expected_status})")
-    return ms
+def _http_check(url: str, timeout: int, expected_status: int, mode: str = "pooled"):
+    # session keep-alive par hôte (core/httpclient.py) -> (latency_ms, timings)
+    return timed_get(url, timeout, expected_status, mode, resolve=_dns_cache().resolve)
 
 
 def _ssl_expiry_check(host: str, port: int, timeout: int, days_threshold: int):
-    ctx = ssl.create_default_context()
-    with socket.create_connection((host, port), timeout=timeout) as sock:
-        with ctx.wrap_socket(sock, server_hostname=host) as ssock:
-            cert = ssock.getpeercert()
-
-    not_after = cert.get("notAfter")
-    if not not_after:
-        raise RuntimeError("No notAfter in certificate")
-
-    # ex: 'Jun 15 12:00:00 2027 GMT'
-    exp = datetime.strptime(not_after, "%b %d %H:%M:%S %Y %Z").replace(tzinfo=dt_timezone.utc)
-    remaining_days = (exp - datetime.now(dt_timezone.utc)).days
-
-    if remaining_days < days_threshold:
-        raise RuntimeError(f"SSL expires in {remaining_days} days (threshold {days_threshold})")
-
-    return remaining_days
-
-
-def _open_or_update_alert(check: Check, severity: str, title: str, details: str):
-    alert = Alert.objects.filter(monitor_check=check, is_open=True).first()
-    if alert:
-        alert.severity = severity
-        alert.title = title
-        alert.details = details
-        alert.save(update_fields=["severity", "title", "details"])
-        return alert, False
-
-    return Alert.objects.create(
-        monitor_check=check,
-        is_open=True,
-        severity=severity,
-        title=title,
-        details=details,
-    ), True
-
-
-def _resolve_alerts(check: Check):
-    now = timezone.now()
-    Alert.objects.filter(monitor_check=check, is_open=True).update(is_open=False, closed_at=now)
+    """-> (message, timings). Certificat lu depuis l'inventaire (core/certificates.py) tant qu'il est frais."""
+    record = certificates.cached_records([certificates.cert_key(host, port)]).get(certificates.cert_key(host, port))
+    if record:
+        ok, message, timings = certificates.cached_result(record, days_threshold)
+    else:
+        addrs, _ = _dns_cache().resolve(host)
+        try:
+            cert = fetch_certificate(host, port, timeout, addrs)
+        except Exception as e:
+            certificates.record_fetches([(host, port, None, str(e), days_threshold)])
+            raise
+        certificates.record_fetches([(host, port, cert, "", days_threshold)])
+        ok, message, _ = expiry_verdict(cert["not_after"], days_threshold)
+        timings = None
+
+    if not ok:
+        raise RuntimeError(message)
+    return message, timings
+
+
+def _check_host(check: Check) -> str:
+    return (check.target or "").strip() or check.asset.ip_or_host.strip()
+
+
+def _probe_spec(check: Check) -> ProbeSpec:
+    return ProbeSpec(
+        check_id=check.id,
+        kind=check.kind,
+        host=_check_host(check),
+        port=check.port,
+        timeout=check.timeout_seconds,
+        expected_status=check.expected_status,
+        ssl_days_threshold=check.ssl_days_threshold,
+        http_mode=check.http_mode,
+        ping_count=check.ping_count,
+    )
 
 
-def _maybe_email(subject: str, body: str):
-    """
-    V1: envoie si un SMTP est configuré, sinon ça log en console (EMAIL_BACKEND console).
-    """
-    try:
-        # recipients vide = pas d'envoi réel. À toi d'ajouter une liste plus tard (settings).
-        # Ici on laisse fail_silently=True pour ne pas casser les checks.
-        send_mail(subject, body, None, [], fail_silently=True)
-    except Exception:
-        pass
+def _result_sink() -> ResultSink:
+    return ResultSink(
+        max_size=settings.RESULT_SINK_MAX_SIZE,
+        max_age=settings.RESULT_SINK_MAX_AGE,
+        notify=notify.enqueue,  # envoi asynchrone : task dispatch_notifications
+    )
 
 
 @shared_task
 def run_check(check_id: int):
     check = Check.objects.select_related("asset").get(id=check_id)
     if not check.is_enabled or not check.asset.is_enabled:
+        instrumentation.CHECKS_SKIPPED.inc(reason="disabled")
         return
 
-    host = (check.target or "").strip() or check.asset.ip_or_host.strip()
+    host = _check_host(check)
+    t0 = time.perf_counter()
 
     ok = False
     message = ""
     latency_ms = None
+    timings = None
 
     try:
         if check.kind == "ping":
-            latency_ms = _ping_check(host, check.timeout_seconds)
+            latency_ms, message, timings = _ping_check(host, check.timeout_seconds, check.ping_count)
             ok = True
-            message = "Ping OK"
 
         elif check.kind == "tcp_port":
             if not check.port:
                 raise RuntimeError("Missing port")
-            latency_ms = _tcp_check(host, int(check.port), check.timeout_seconds)
+            latency_ms, timings = _tcp_check(host, int(check.port), check.timeout_seconds)
             ok = True
             message = f"TCP {check.port} OK"
 
         elif check.kind == "http":
-            url = host
-            if not (url.startswith("http://") or url.startswith("https://")):
-                url = "http://" + url
-            latency_ms = _http_check(url, check.timeout_seconds, check.expected_status)
+            latency_ms, timings = _http_check(
+                http_url(host), check.timeout_seconds, check.expected_status, check.http_mode
+            )
             ok = True
             message = "HTTP OK"
 
         elif check.kind == "ssl_expiry":
             p = int(check.port or 443)
-            remaining_days = _ssl_expiry_check(host, p, check.timeout_seconds, check.ssl_days_threshold)
+            message, timings = _ssl_expiry_check(host, p, check.timeout_seconds, check.ssl_days_threshold)
             ok = True
-            message = f"SSL OK (expires in {remaining_days} days)"
 
         else:
             raise RuntimeError(f"Unknown kind: {check.kind}")
@@ -139,37 +148,196 @@ def run_check(check_id: int):
         ok = False
         message = str(e)[:2000]
 
-    # ✅ renommage ici
-    CheckResult.objects.create(
-        monitor_check=check,
-        ok=ok,
-        message=message,
-        latency_ms=latency_ms,
-    )
-    Check.objects.filter(id=check.id).update(last_run_at=timezone.now())
+    if instrumentation.enabled():
+        instrumentation.PROBE_DURATION.observe(time.perf_counter() - t0, kind=check.kind)
+        instrumentation.PROBE_RESULTS.inc(kind=check.kind, ok=str(ok).lower())
 
-    if ok:
-        _resolve_alerts(check)
-    else:
-        title = f"{check.asset.name}: {check.name} FAILED"
-        details = (
-            f"Asset: {check.asset.name}\n"
-            f"Host: {host}\n"
-            f"Kind: {check.kind}\n"
-            f"Message: {message}"
+    with _result_sink() as sink:
+        sink.add(check, host, ok, message, latency_ms, timings=timings)
+    instrumentation.maybe_push()
+
+
+def _observe_outcomes(outcomes):
+    """Durées de sonde par kind, un verrou par kind et par lot de sorties."""
+    by_kind = {}
+    for o in outcomes:
+        if o.duration is not None:
+            by_kind.setdefault(o.spec.kind, []).append(o.duration)
+        instrumentation.PROBE_RESULTS.inc(kind=o.spec.kind, ok=str(o.ok).lower())
+    for kind, durations in by_kind.items():
+        instrumentation.PROBE_DURATION.observe_many(durations, kind=kind)
+
+
+@shared_task
+def run_check_batch(check_ids, due=None):
+    """
+    Exécute un lot de checks en parallèle (asyncio) dans ce worker.
+    Un seul message broker pour tout le lot au lieu d'un run_check par check.
+
+    due : échéances (timestamps epoch, alignées sur check_ids) transmises par
+    run_all_checks quand l'instrumentation est active -> lag de démarrage.
+    """
+    started = time.time()
+    t0 = time.perf_counter()
+    measure = instrumentation.enabled()
+    if measure and due:
+        instrumentation.START_LAG.observe_many(max(0.0, started - d) for d in due if d is not None)
+
+    checks = {
+        c.id: c
+        for c in Check.objects.select_related("asset").filter(
+            id__in=check_ids, is_enabled=True, asset__is_enabled=True
         )
-        alert, created = _open_or_update_alert(check, "critical", title, details)
-        if created:
-            _maybe_email(f"[ArcanePanel] {title}", details)
+    }
+    if measure:
+        instrumentation.CHECKS_SKIPPED.inc(len(check_ids) - len(checks), reason="disabled")
+    if not checks:
+        instrumentation.maybe_push()
+        return 0
+
+    engine = ProbeEngine(
+        concurrency=settings.PROBE_CONCURRENCY,
+        per_host=settings.PROBE_PER_HOST_CONCURRENCY,
+        http_threads=settings.PROBE_HTTP_THREADS,
+        dns=_dns_cache(),
+        prefetch=settings.DNS_PREFETCH,
+    )
+
+    # ssl_expiry : certificats encore frais servis depuis l'inventaire, sans handshake
+    ssl_keys = {
+        c.id: certificates.cert_key(_check_host(c), c.port)
+        for c in checks.values()
+        if c.kind == "ssl_expiry"
+    }
+    cached = certificates.cached_records(ssl_keys.values())
+    fetched = []
+
+    outcomes = []
+    with _result_sink() as sink:
+        to_probe = []
+        for c in checks.values():
+            record = cached.get(ssl_keys.get(c.id))
+            if record:
+                ok, message, timings = certificates.cached_result(record, c.ssl_days_threshold)
+                sink.add(c, _check_host(c), ok, message, timings=timings)
+            else:
+                to_probe.append(c)
+
+        for o in engine.iter_outcomes(_probe_spec(c) for c in to_probe):
+            sink.add(checks[o.check_id], o.spec.host, o.ok, o.message, o.latency_ms, o.recorded_at, o.timings)
+            if o.spec.kind == "ssl_expiry":
+                fetched.append((o.spec.host, o.spec.port, o.cert, "" if o.cert else o.message, o.spec.ssl_days_threshold))
+            if measure:
+                outcomes.append(o)
+
+    certificates.record_fetches(fetched)
+
+    if measure:
+        _observe_outcomes(outcomes)
+        instrumentation.CHECKS_SKIPPED.inc(len(checks) - len(to_probe), reason="cert_cached")
+        duration = time.perf_counter() - t0
+        instrumentation.BATCH_DURATION.observe(duration)
+        logger.debug("batch: %s", json.dumps({
+            "checks": len(check_ids),
+            "probed": len(to_probe),
+            "cert_cached": len(checks) - len(to_probe),
+            "disabled": len(check_ids) - len(checks),
+            "written": sink.written,
+            "probe_max_ms": round(max((o.duration or 0 for o in outcomes), default=0) * 1000, 1),
+            "persist_ms": round(sink.persist_seconds * 1000, 1),
+            "alerts_ms": round(sink.alerts_seconds * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+        }, sort_keys=True))
+    instrumentation.maybe_push()
+    return sink.written
 
 
 @shared_task
 def run_all_checks():
+    """
+    Tick du scheduler (beat toutes les SCHEDULER_TICK_SECONDS) : ne charge
+    que les checks échus et les dispatch par lots.
+
+    Instrumentation active : lag de planification, backlog, profondeur de la
+    file Celery et une ligne de log JSON par sweep (logger core.tasks).
+    """
+    t0 = time.perf_counter()
     now = timezone.now()
-    checks = Check.objects.select_related("asset").filter(is_enabled=True, asset__is_enabled=True)
+    claimed = claim_due(
+        now=now,
+        limit=settings.SCHEDULER_MAX_PER_TICK,
+        min_interval=settings.SCHEDULER_MIN_INTERVAL_SECONDS,
+    )
+    if not instrumentation.enabled():
+        for chunk in chunked([cid for cid, _ in claimed], settings.PROBE_BATCH_SIZE):
+            run_check_batch.delay(chunk)
+        return len(claimed)
+
+    lags = [(now - d).total_seconds() for _, d in claimed if d is not None]
+    batches = 0
+    for chunk in chunked(claimed, settings.PROBE_BATCH_SIZE):
+        run_check_batch.delay([cid for cid, _ in chunk], due=[d.timestamp() if d else None for _, d in chunk])
+        batches += 1
+
+    # backlog compté seulement si le tick a atteint sa limite (sinon 0, sans requête)
+    backlog = count_overdue(now) if len(claimed) >= settings.SCHEDULER_MAX_PER_TICK else 0
+    depth = instrumentation.celery_queue_depth()
+    duration = time.perf_counter() - t0
+
+    instrumentation.SCHEDULE_LAG.observe_many(max(0.0, lag) for lag in lags)
+    instrumentation.SWEEP_CLAIMED.inc(len(claimed))
+    instrumentation.SWEEP_DURATION.observe(duration)
+    instrumentation.BACKLOG.set(backlog)
+    if depth is not None:
+        instrumentation.QUEUE_DEPTH.set(depth, queue="celery")
+
+    lag = instrumentation.summarize(lags)
+    logger.info("sweep: %s", json.dumps({
+        "claimed": len(claimed),
+        "batches": batches,
+        "backlog": backlog,
+        "queue_depth": depth,
+        "lag_p50_s": lag["p50"],
+        "lag_max_s": lag["max"],
+        "duration_ms": round(duration * 1000, 1),
+    }, sort_keys=True))
+    instrumentation.maybe_push()
+    return len(claimed)
+
 
-    for c in checks:
-        # Respect interval
-        if c.last_run_at and (now - c.last_run_at).total_seconds() < c.interval_seconds:
-            continue
-        run_check.delay(c.id)
+@shared_task
+def run_retention():
+    """Purge/downsampling horaire (cf core/retention.py). Renvoie le rapport de suppression."""
+    return apply_retention()
+
+
+@shared_task
+def maintain_partitions():
+    """Crée les partitions à venir (PARTITION_PREMAKE périodes) des tables partitionnées."""
+    if not settings.PARTITIONING_ENABLED or not partitions.supported():
+        return 0
+
+    created = 0
+    now = timezone.now()
+    for model in partitions.PARTITIONED_MODELS:
+        if partitions.is_partitioned(model):
+            created += partitions.ensure_partitions(model, now, settings.PARTITION_INTERVAL, settings.PARTITION_PREMAKE)
+    return created
+
+
+@shared_task
+def refresh_dashboard_summary():
+    """Recalcule le résumé du dashboard en cache (beat toutes les DASHBOARD_REFRESH_SECONDS)."""
+    _refresh_dashboard_summary()
+
+
+@shared_task
+def dispatch_notifications():
+    """Digests email des transitions d'alertes en file (core/notify.py)."""
+    return notify.dispatch()
+
+
+@shared_task
+def run_job(job_id: int):
+    """Exécute un Job en file (core/jobs.py) ; sortie dans JobLog par paquets."""
+    return jobs.execute(job_id)
@@ -0,0 +1,298 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .alertstate import apply_transitions
+from .icmp import AsyncPinger, IcmpUnavailable, _open_socket
+from .api import hash_token
+from .ingest import AssetNameCache, IngestError, MAX_TS, parse_json_line
+from .models import AgentToken, Alert, Asset, Check, CheckResult, CheckRollup, MetricSample
+from .pagination import InvalidCursor, _parse_ordering, decode_cursor, encode_cursor, paginate
+from .retention import _downsample_check_results
+from .rollups import LatencySketch, apply_results
+from .series import MAX_POINTS, _max_retention_seconds, clamp_step, parse_duration
+
+NOW = 1700000000.0
+
+
+class JsonTimestampTests(SimpleTestCase):
+    def _ts(self, ts):
+        return parse_json_line(f'{{"key": "cpu", "value": 1, "ts": {ts}}}', NOW)[0][5]
+
+    def test_scaled_units(self):
+        for ts in ("1700000000", "1700000000000", "1700000000000000", "1700000000000000000"):
+            self.assertAlmostEqual(self._ts(ts), NOW, places=3)
+
+    def test_non_finite_rejected(self):
+        # json accepte 1e400 (inf) et Infinity : ne doit ni boucler ni passer
+        for ts in ("1e400", "Infinity", "-Infinity", "NaN"):
+            with self.assertRaises(IngestError):
+                self._ts(ts)
+
+    def test_out_of_range_rejected(self):
+        for ts in (str(int(MAX_TS * 1e9) * 10), "1e300", "0", "-5"):
+            with self.assertRaises(IngestError):
+                self._ts(ts)
+
+
+def _icmp_available() -> bool:
+    try:
+        sock, _ = _open_socket(socket.AF_INET)
+    except (IcmpUnavailable, OSError):
+        return False
+    sock.close()
+    return True
+
+
+class AsyncPingerTests(SimpleTestCase):
+    def setUp(self):
+        if not _icmp_available():
+            self.skipTest("ni socket ICMP datagram ni raw dans cet environnement")
+
+    def test_localhost_multi_packet(self):
+        async def run():
+            pinger = AsyncPinger()
+            try:
+                return await pinger.ping("127.0.0.1", count=4, timeout=1.0, interval=0.02)
+            finally:
+                pinger.close()
+
+        stats = asyncio.run(run())
+        self.assertEqual(stats.sent, 4)
+        self.assertEqual(stats.loss_pct, 0)
+        self.assertLessEqual(stats.min_ms, stats.avg_ms)
+        self.assertLessEqual(stats.avg_ms, stats.max_ms)
+
+
+class LatencySketchTests(SimpleTestCase):
+    def test_quantile_relative_error(self):
+        sketch = LatencySketch(accuracy=0.02)
+        values = [0.5 + i * 0.37 for i in range(1000)]
+        for v in values:
+            sketch.add(v)
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, 0.02 + 1e-9)
+
+    def test_merge_equals_single_sketch(self):
+        a, b, both = LatencySketch(), LatencySketch(), LatencySketch()
+        for i, v in enumerate((1, 3, 8, 40, 250, 900)):
+            (a if i % 2 else b).add(v)
+            both.add(v)
+        merged = LatencySketch(a.to_json()).merge(LatencySketch(b.to_json()))
+        self.assertEqual(merged.counts, both.counts)
+
+    def test_empty(self):
+        self.assertIsNone(LatencySketch().quantile(0.5))
+
+
+class ApplyResultsTests(TestCase):
+    def setUp(self):
+        asset = Asset.objects.create(name="srv", ip_or_host="127.0.0.1")
+        self.check = Check.objects.create(asset=asset, name="ping")
+        self.t0 = datetime(2026, 1, 1, 10, 0, 30, tzinfo=dt_timezone.utc)
+
+    def _rollup(self, resolution):
+        return CheckRollup.objects.get(monitor_check=self.check, resolution=resolution)
+
+    def test_batches_merge_into_same_buckets(self):
+        cid = self.check.id
+        apply_results([(cid, True, 10.0, self.t0), (cid, False, None, self.t0)])
+        apply_results([(cid, True, 30.0, self.t0.replace(minute=5))])
+
+        self.assertEqual(CheckRollup.objects.filter(resolution=60).count(), 2)
+        for resolution in (600, 3600):
+            r = self._rollup(resolution)
+            self.assertEqual((r.count, r.ok_count, r.latency_count), (3, 2, 2))
+            self.assertEqual((r.latency_sum, r.latency_min, r.latency_max), (40.0, 10.0, 30.0))
+            self.assertEqual(sum(r.latency_sketch.values()), 2)
+
+    def test_buckets_are_epoch_aligned(self):
+        apply_results([(self.check.id, True, 1.0, self.t0)])
+        self.assertEqual(self._rollup(3600).bucket_start, self.t0.replace(minute=0, second=0))
+        self.assertEqual(self._rollup(60).bucket_start, self.t0.replace(second=0))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "alertstate-tests"}},
+    ALERT_RECOVERY_THRESHOLD=1,
+    ALERT_FLAP_WINDOW=900,
+    ALERT_FLAP_THRESHOLD=3,
+)
+class AlertTransitionTests(TestCase):
+    def setUp(self):
+        asset = Asset.objects.create(name="srv", ip_or_host="127.0.0.1")
+        self.check = Check.objects.create(asset=asset, name="ping", failure_threshold=2)
+        cache.clear()  # les ids sont réutilisés d'un test à l'autre
+
+    def _flush(self, *oks):
+        # un appel = un flush du sink ; l'état part en cache au commit
+        items = [SimpleNamespace(check=self.check, ok=ok) for ok in oks]
+        with self.captureOnCommitCallbacks(execute=True):
+            return apply_transitions(items, timezone.now(), lambda it: ("down", ""))
+
+    def _open(self):
+        return Alert.objects.filter(monitor_check=self.check, is_open=True).count()
+
+    def test_threshold_then_recovery(self):
+        self.assertEqual(self._flush(False), ([], []))
+        opened, _ = self._flush(False)
+        self.assertEqual([cid for cid, _, _ in opened], [self.check.id])
+        self.assertEqual(self._flush(False), ([], []))  # déjà ouverte
+        self.assertEqual(self._flush(True), ([], [self.check.id]))
+        self.assertEqual(self._open(), 0)
+
+    def test_open_and_close_in_same_batch_creates_nothing(self):
+        self.assertEqual(self._flush(False, False, True), ([], []))
+        self.assertEqual(Alert.objects.count(), 0)
+
+    def test_flapping_keeps_alert_open(self):
+        self._flush(False, False)
+        self.assertEqual(self._open(), 1)
+        # ok/ko en alternance : 3 bascules dans la fenêtre -> pas de fermeture
+        self._flush(True, False, False, True)
+        self.assertEqual(self._open(), 1)
+        self.assertEqual(self._flush(True), ([], []))
+        self.assertEqual(self._open(), 1)
+
+    @override_settings(ALERT_FLAP_THRESHOLD=0)
+    def test_flap_damping_disabled(self):
+        self._flush(False, False)
+        self._flush(True, False, False, True)
+        self.assertEqual(self._open(), 0)
+
+    def test_state_rebuilt_from_db_when_cache_is_empty(self):
+        self._flush(False, False)
+        cache.clear()
+        self.assertEqual(self._flush(True), ([], [self.check.id]))
+        self.assertEqual(self._open(), 0)
+
+
+class DurationTests(SimpleTestCase):
+    DEFAULT = timedelta(hours=24)
+
+    def test_units(self):
+        for value, seconds in (("90s", 90), ("10m", 600), (" 24h ", 86400), ("7d", 604800), ("2w", 1209600)):
+            self.assertEqual(parse_duration(value, self.DEFAULT), timedelta(seconds=seconds))
+
+    def test_invalid_falls_back(self):
+        for value in (None, "", "abc", "10", "5x", "0s", "-1h", "1.5h", "1" * 13 + "s"):
+            self.assertEqual(parse_duration(value, self.DEFAULT), self.DEFAULT)
+
+    def test_capped_to_retention(self):
+        self.assertEqual(parse_duration("999999999999w", self.DEFAULT), timedelta(seconds=_max_retention_seconds()))
+
+
+class ClampStepTests(SimpleTestCase):
+    def test_step_kept_under_max_points(self):
+        self.assertEqual(clamp_step(timedelta(hours=24), timedelta(minutes=1)), timedelta(minutes=1))
+
+    def test_widened_to_rollup_multiple(self):
+        # 30 j / 1500 points = 1728 s -> multiple supérieur de 10 min
+        step = clamp_step(timedelta(days=30), timedelta(minutes=1))
+        self.assertEqual(step, timedelta(minutes=30))
+        self.assertLessEqual(timedelta(days=30) / step, MAX_POINTS)
+
+    def test_small_range_not_rounded(self):
+        self.assertEqual(clamp_step(timedelta(hours=1), timedelta(seconds=1)), timedelta(seconds=3))
+        self.assertEqual(clamp_step(timedelta(minutes=10), timedelta(0)), timedelta(seconds=1))
+
+
+class CursorTests(SimpleTestCase):
+    KEYS = _parse_ordering(("-opened_at", "-id"))
+
+    def test_round_trip_keeps_microseconds(self):
+        opened = datetime(2026, 1, 1, 10, 0, 0, 123456, tzinfo=dt_timezone.utc)
+        for backward in (False, True):
+            values, back = decode_cursor(encode_cursor([opened, 42], backward), Alert, self.KEYS)
+            self.assertEqual(values, [opened, 42])
+            self.assertEqual(back, backward)
+
+    def test_invalid(self):
+        for cursor in ("", "!!!", "bm90IGpzb24", encode_cursor([1]), encode_cursor([None, 1]),
+                       encode_cursor(["pas une date", 1])):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, Alert, self.KEYS)
+
+
+class PaginateTests(TestCase):
+    def setUp(self):
+        asset = Asset.objects.create(name="srv", ip_or_host="127.0.0.1")
+        check = Check.objects.create(asset=asset, name="ping")
+        opened = timezone.now()
+        # horodatages en double : l'id départage
+        Alert.objects.bulk_create(
+            Alert(monitor_check=check, title=f"a{i}", opened_at=opened - timedelta(seconds=i // 2)) for i in range(7)
+        )
+        self.expected = list(Alert.objects.order_by("-opened_at", "-id").values_list("id", flat=True))
+
+    def test_forward_then_backward(self):
+        ordering = ("-opened_at", "-id")
+        seen, pages, page = [], [], paginate(Alert.objects.all(), ordering, limit=3)
+        while True:
+            pages.append(page)
+            seen += [a.id for a in page.items]
+            if not page.has_next:
+                break
+            page = paginate(Alert.objects.all(), ordering, cursor=page.next_cursor, limit=3)
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginate(Alert.objects.all(), ordering, cursor=pages[-1].previous_cursor, limit=3)
+        self.assertEqual([a.id for a in back.items], [a.id for a in pages[-2].items])
+
+
+class DownsampleCheckResultsTests(TestCase):
+    def setUp(self):
+        asset = Asset.objects.create(name="srv", ip_or_host="127.0.0.1")
+        self.a = Check.objects.create(asset=asset, name="a")
+        self.b = Check.objects.create(asset=asset, name="b")
+        self.hour = datetime(2026, 1, 1, 10, tzinfo=dt_timezone.utc)
+
+    def test_rebuilds_only_checks_missing_from_hour(self):
+        rows = [(check, self.hour + timedelta(minutes=m)) for check in (self.a, self.b) for m in (5, 35)]
+        CheckResult.objects.bulk_create(
+            CheckResult(monitor_check=check, ok=True, latency_ms=5.0, recorded_at=at) for check, at in rows
+        )
+        # seul a a ses rollups (le 2e résultat n'y est pas : on vérifie qu'il n'est pas recalculé)
+        apply_results([(self.a.id, True, 5.0, self.hour + timedelta(minutes=5))])
+
+        self.assertEqual(_downsample_check_results(self.hour + timedelta(hours=1)), 1)
+        hourly = dict(CheckRollup.objects.filter(resolution=3600).values_list("monitor_check_id", "count"))
+        self.assertEqual(hourly, {self.a.id: 1, self.b.id: 2})
+        self.assertEqual(_downsample_check_results(self.hour + timedelta(hours=1)), 0)
+
+
+class AssetNameCacheTests(TestCase):
+    def test_unknown_name_not_cached(self):
+        names = AssetNameCache(ttl=3600)
+        self.assertEqual(names.resolve(["web1"]), {"web1": None})
+        asset = Asset.objects.create(name="web1", ip_or_host="10.0.0.1")
+        self.assertEqual(names.resolve(["web1"]), {"web1": asset.id})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "ingest-tests"}})
+class MetricIngestViewTests(TestCase):
+    def setUp(self):
+        AgentToken.objects.create(name="agent", token_hash=hash_token("secret"))
+        self.url = reverse("ingest_metrics")
+
+    def _post(self, body, precision):
+        return self.client.post(f"{self.url}?precision={precision}", body, content_type="text/plain",
+                                HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_unknown_precision_rejected(self):
+        response = self._post("cpu value=1 1700000000", "sec")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MetricSample.objects.count(), 0)
+
+    def test_precision_applied(self):
+        response = self._post("cpu value=1 1700000000", "s")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MetricSample.objects.get().recorded_at.timestamp(), NOW)
@@ -0,0 +1,109 @@
+"""
+Récupération et lecture des certificats TLS (checks ssl_expiry).
+
+fetch_certificate / afetch_certificate font la poignée de main et rendent un
+dict "CertInfo" sérialisable (empreinte, sujet, émetteur, SANs, validité,
+chaîne) ; la mise en cache côté base est dans core/certificates.py.
+
+Pas de dépendance Django.
+"""
+import hashlib
+import ssl
+from datetime import datetime, timezone as dt_timezone
+
+from .dnscache import aconnect, connect
+
+_NAME_KEYS = {
+    "commonName": "CN",
+    "organizationName": "O",
+    "organizationalUnitName": "OU",
+    "countryName": "C",
+    "localityName": "L",
+    "stateOrProvinceName": "ST",
+}
+
+
+def cert_time(value: str) -> datetime:
+    # ex: 'Jun 15 12:00:00 2027 GMT'
+    return datetime.strptime(value, "%b %d %H:%M:%S %Y %Z").replace(tzinfo=dt_timezone.utc)
+
+
+def format_name(name) -> str:
+    """((('commonName', 'x'),), (('organizationName', 'y'),)) -> 'CN=x, O=y'"""
+    parts = []
+    for rdn in name or ():
+        for key, value in rdn:
+            parts.append(f"{_NAME_KEYS.get(key, key)}={value}")
+    return ", ".join(parts)
+
+
+def _chain_entry(decoded: dict) -> dict:
+    return {
+        "subject": format_name(decoded.get("subject")),
+        "issuer": format_name(decoded.get("issuer")),
+        "not_after": cert_time(decoded["notAfter"]).isoformat() if decoded.get("notAfter") else None,
+    }
+
+
+def cert_info(decoded: dict, der: bytes, chain=None) -> dict:
+    """Dict getpeercert() + DER -> CertInfo. `chain` : dicts get_info() de la chaîne vérifiée si dispo."""
+    if not (decoded or {}).get("notAfter"):
+        raise RuntimeError("No notAfter in certificate")
+    return {
+        "fingerprint_sha256": hashlib.sha256(der).hexdigest() if der else "",
+        "subject": format_name(decoded.get("subject")),
+        "issuer": format_name(decoded.get("issuer")),
+        "sans": [value for kind, value in decoded.get("subjectAltName", ()) if kind in ("DNS", "IP Address")],
+        "serial": decoded.get("serialNumber", ""),
+        "not_before": cert_time(decoded["notBefore"]) if decoded.get("notBefore") else None,
+        "not_after": cert_time(decoded["notAfter"]),
+        # chaîne complète à partir de Python 3.13 (get_verified_chain), sinon le seul certificat feuille
+        "chain": [_chain_entry(c) for c in chain] if chain else [_chain_entry(decoded)],
+    }
+
+
+def _verified_chain(ssl_obj):
+    get_chain = getattr(ssl_obj, "get_verified_chain", None)
+    if get_chain is None:
+        return None
+    try:
+        return [c.get_info() for c in get_chain()]
+    except (ssl.SSLError, ValueError):
+        return None
+
+
+def _read(ssl_obj) -> dict:
+    return cert_info(ssl_obj.getpeercert(), ssl_obj.getpeercert(binary_form=True), _verified_chain(ssl_obj))
+
+
+def remaining_days(not_after: datetime, now=None) -> int:
+    return (not_after - (now or datetime.now(dt_timezone.utc))).days
+
+
+def expiry_verdict(not_after: datetime, days_threshold: int, now=None):
+    """-> (ok, message, remaining_days) pour un check ssl_expiry."""
+    days = remaining_days(not_after, now)
+    if days < days_threshold:
+        return False, f"SSL expires in {days} days (threshold {days_threshold})", days
+    return True, f"SSL OK (expires in {days} days)", days
+
+
+def fetch_certificate(host: str, port: int, timeout: int, addrs=None) -> dict:
+    """Handshake synchrone. `addrs` : adresses déjà résolues (cache DNS), essayées tour à tour ; SNI = host."""
+    ctx = ssl.create_default_context()
+    with connect(addrs or host, port, timeout) as sock:
+        with ctx.wrap_socket(sock, server_hostname=host) as ssock:
+            return _read(ssock)
+
+
+async def afetch_certificate(host: str, port: int, timeout: int, addrs=None) -> dict:
+    ctx = ssl.create_default_context()
+    _, writer = await aconnect(addrs or host, port, timeout, ssl=ctx, server_hostname=host)
+    try:
+        return _read(writer.get_extra_info("ssl_object"))
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
@@ -10,11 +10,39 @@ urlpatterns = [
 
     path("checks/", views.checks, name="checks"),
     path("alerts/", views.alerts, name="alerts"),
+    path("certificates/", views.certificates, name="certificates"),
+    path("jobs/<int:job_id>/", views.job_detail, name="job_detail"),
+
+    # API listes (pagination par curseur) + export en flux
+    path("api/assets/", views.api_list, {"kind": "assets"}, name="api_assets"),
+    path("api/checks/", views.api_list, {"kind": "checks"}, name="api_checks"),
+    path("api/alerts/", views.api_list, {"kind": "alerts"}, name="api_alerts"),
+    path("api/results/", views.api_list, {"kind": "results"}, name="api_results"),
+    path("api/export/<slug:kind>.<slug:fmt>", views.export_list, name="export_list"),
+
+    # Tail des logs d'un job (?after=<id JobLog>)
+    path("api/jobs/<int:job_id>/log/", views.api_job_log, name="api_job_log"),
+
+    # Ingestion agents (jeton AgentToken)
+    path("api/ingest/metrics/", api.MetricIngestView.as_view(), name="ingest_metrics"),
+
+    # Sondes déportées (app/probe_agent.py, même jeton)
+    path("api/agents/lease/", api.ProbeLeaseView.as_view(), name="agent_lease"),
+    path("api/agents/results/", api.ProbeResultsView.as_view(), name="agent_results"),
+
+    # Instrumentation du pipeline (OpenMetrics, scrape Prometheus)
+    path("metrics", views.openmetrics, name="openmetrics"),
+
+    # Live (SSE)
+    path("live/events/", views.live_events, name="live_events"),
 
     # API metrics (global)
     path("api/metrics/latency-24h/", views.metrics_latency_series_24h, name="metrics_latency_24h"),
     path("api/metrics/uptime-24h/", views.metrics_uptime_series_24h, name="metrics_uptime_24h"),
 
+    # API metrics agents (MetricSample / MetricRollup)
+    path("api/metrics/query/", views.metrics_query, name="metrics_query"),
+
     # API metrics (par asset)
     path("api/assets/<int:asset_id>/latency-7d/", views.metrics_asset_latency_7d, name="metrics_asset_latency_7d"),
     path("api/assets/<int:asset_id>/uptime-7d/", views.metrics_asset_uptime_7d, name="metrics_asset_uptime_7d"),
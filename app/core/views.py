@@ -1,93 +1,71 @@
-from datetime import timedelta
+import hmac
+from datetime import datetime, timedelta, timezone as dt_timezone
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.db.models import Avg, Count, Q
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
-from .models import Asset, Check, Alert, CheckResult
-
-
-def _bucket_time(dt, minutes=10):
-    return dt.replace(minute=(dt.minute // minutes) * minutes, second=0, microsecond=0)
+from . import instrumentation, jobs
+from .listing import LISTS, api_fields, ordering_for, page_limit, stream_csv, stream_ndjson
+from .live import stream_events
+from .metrics import MetricQueryError, parse_matchers, query_metrics
+from .models import Asset, Check, Alert, CertificateRecord, CheckResult, Job
+from .pagination import InvalidCursor, paginate
+from .series import check_buckets, clamp_step, label_format, latency_series, parse_duration, uptime_series
+from .summary import get_dashboard_summary
+from .tags import normalize_tags, tag_cloud as top_tags
 
 
 @login_required
 def dashboard(request):
-    now = timezone.now()
-    since_24h = now - timedelta(hours=24)
-    since_1h = now - timedelta(hours=1)
+    # résumé en cache (core/summary.py), recalculé en tâche de fond
+    summary = get_dashboard_summary()
+    return render(request, "core/dashboard_v2_1.html", {**summary, "now": timezone.now()})
 
-    assets_total = Asset.objects.count()
-    checks_total = Check.objects.count()
-    alerts_open = Alert.objects.filter(is_open=True).count()
 
-    latest_alerts = (
-        Alert.objects.select_related("monitor_check", "monitor_check__asset")
-        .order_by("-opened_at")[:10]
-    )
+async def live_events(request):
+    """Flux Server-Sent Events des résultats/alertes (core/live.py). Nécessite le serveur ASGI."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden()
 
-    # Uptime 24h (tous checks)
-    total_results_24h = CheckResult.objects.filter(recorded_at__gte=since_24h).count()
-    ok_results_24h = CheckResult.objects.filter(recorded_at__gte=since_24h, ok=True).count()
-    uptime_24h = (ok_results_24h / total_results_24h * 100.0) if total_results_24h else 100.0
+    response = StreamingHttpResponse(stream_events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pas de buffering du flux
+    return response
 
-    # Latence moyenne 24h
-    avg_latency_24h = (
-        CheckResult.objects.filter(recorded_at__gte=since_24h, latency_ms__isnull=False)
-        .aggregate(v=Avg("latency_ms"))["v"]
-    ) or 0.0
 
-    # Checks failing (dernière heure): top checks avec le + de fails
-    failing_checks_1h = (
-        CheckResult.objects.filter(recorded_at__gte=since_1h, ok=False)
-        .values("monitor_check__asset__name", "monitor_check__name")
-        .annotate(fails=Count("id"))
-        .order_by("-fails")[:8]
-    )
+def _filters_qs(request) -> str:
+    """Query string courante sans le curseur (liens page suivante / précédente, export)."""
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    return params.urlencode()
 
-    # Top assets en alerte (open)
-    top_alert_assets = (
-        Alert.objects.filter(is_open=True)
-        .values("monitor_check__asset__name")
-        .annotate(c=Count("id"))
-        .order_by("-c")[:5]
-    )
 
-    return render(
-        request,
-        "core/dashboard_v2_1.html",
-        {
-            "now": now,
-            "assets_total": assets_total,
-            "checks_total": checks_total,
-            "alerts_open": alerts_open,
-            "latest_alerts": latest_alerts,
-            "uptime_24h": round(uptime_24h, 2),
-            "avg_latency_24h": round(avg_latency_24h, 1),
-            "total_results_24h": total_results_24h,
-            "failing_checks_1h": failing_checks_1h,
-            "top_alert_assets": top_alert_assets,
-        },
-    )
+def _keyset_page(request, kind: str, qs, limit: int):
+    # curseur illisible (lien périmé, édité à la main) : on repart de la 1re page
+    ordering = ordering_for(kind, request.GET)
+    try:
+        return paginate(qs, ordering, request.GET.get("cursor"), limit)
+    except InvalidCursor:
+        return paginate(qs, ordering, None, limit)
 
 
 @login_required
 def assets(request):
     q = (request.GET.get("q") or "").strip()
-    tag = (request.GET.get("tag") or "").strip().lower()
-
-    qs = Asset.objects.all().order_by("name")
-    if q:
-        qs = qs.filter(Q(name__icontains=q) | Q(address__icontains=q) | Q(description__icontains=q) | Q(tags__icontains=q))
-    if tag:
-        # filtre naïf mais efficace: match substring
-        qs = qs.filter(tags__icontains=tag)
+    # ?tag=web&tag=prod ou ?tag=web,prod : assets portant tous ces tags (match exact)
+    selected_tags = normalize_tags(",".join(request.GET.getlist("tag")))
+    tag = ", ".join(selected_tags)
 
-    assets_list = list(qs)
+    # filtres + recherche classée (core/listing.py, core/search.py), pagination par curseur sur (name, id)
+    page = _keyset_page(request, "assets", LISTS["assets"].queryset(request.GET), settings.ASSETS_PAGE_SIZE)
+    assets_list = page.items
 
-    # stats rapides par asset (open alerts + checks)
+    # stats rapides pour les assets de la page seulement (open alerts + checks)
     asset_ids = [a.id for a in assets_list]
     open_alerts_map = {
         row["monitor_check__asset"]: row["c"]
@@ -95,25 +73,24 @@ def assets(request):
         .values("monitor_check__asset")
         .annotate(c=Count("id"))
     }
+    # nb de checks et checks actuellement en échec (snapshot CheckStatus) en une requête
     checks_map = {
-        row["asset"]: row["c"]
+        row["asset"]: row
         for row in Check.objects.filter(asset_id__in=asset_ids)
         .values("asset")
-        .annotate(c=Count("id"))
+        .annotate(c=Count("id"), down=Count("id", filter=Q(is_enabled=True, status__ok=False)))
     }
 
-    # tags “top” (facilite le filtrage)
-    all_tags = []
-    for a in Asset.objects.all().only("tags"):
-        all_tags.extend(a.tag_list())
-    tag_cloud = sorted(list(set([t.lower() for t in all_tags])))[:30]
+    # tags les plus utilisés : une requête sur l'index Tag (core/tags.py)
+    tag_cloud = top_tags()
 
     # enrichit les assets sans casser tes modèles
     enriched = []
     for a in assets_list:
         enriched.append({
             "obj": a,
-            "checks": checks_map.get(a.id, 0),
+            "checks": checks_map.get(a.id, {}).get("c", 0),
+            "checks_down": checks_map.get(a.id, {}).get("down", 0),
             "open_alerts": open_alerts_map.get(a.id, 0),
             "tags": a.tag_list(),
         })
@@ -124,6 +101,8 @@ def assets(request):
         {
             "now": timezone.now(),
             "assets": enriched,
+            "page": page,
+            "filters_qs": _filters_qs(request),
             "q": q,
             "tag": tag,
             "tag_cloud": tag_cloud,
@@ -131,13 +110,28 @@ def assets(request):
     )
 
 
+def _recent_results(checks, limit: int):
+    """Derniers résultats de l'asset, fusionnés depuis les historiques courts (CheckStatus.recent) des checks."""
+    rows = []
+    for c in checks:
+        status = getattr(c, "status", None)
+        for ts, ok, latency_ms in (status.recent if status else ()):
+            rows.append({"monitor_check": c, "ok": ok, "latency_ms": latency_ms, "ts": ts})
+    rows.sort(key=lambda r: r["ts"], reverse=True)
+    rows = rows[:limit]
+    for r in rows:
+        r["recorded_at"] = datetime.fromtimestamp(r["ts"], tz=dt_timezone.utc)
+    return rows
+
+
 @login_required
 def asset_detail(request, asset_id: int):
     asset = get_object_or_404(Asset, id=asset_id)
     now = timezone.now()
     since_7d = now - timedelta(days=7)
 
-    checks = list(asset.checks.all().order_by("name"))
+    # état courant + derniers résultats de chaque check : snapshot CheckStatus, une jointure
+    checks = list(asset.checks.select_related("status").order_by("name"))
 
     # Uptime 7j pour l’asset
     total = CheckResult.objects.filter(monitor_check__asset=asset, recorded_at__gte=since_7d).count()
@@ -156,15 +150,11 @@ def asset_detail(request, asset_id: int):
         .order_by("-opened_at")[:20]
     )
 
-    last_results = (
-        CheckResult.objects.filter(monitor_check__asset=asset)
-        .select_related("monitor_check")
-        .order_by("-recorded_at")[:30]
-    )
+    last_results = _recent_results(checks, 30)
 
     return render(
         request,
-        "core/asset_detail_v2_1.html",
+        "core/assets_detail_v2_1.html",
         {
             "now": now,
             "asset": asset,
@@ -180,15 +170,26 @@ def asset_detail(request, asset_id: int):
 # --- placeholder views (si tu as déjà des versions, garde les tiennes et adapte juste les templates)
 @login_required
 def checks(request):
-    # garde ta logique actuelle si tu l’as
-    checks_list = Check.objects.select_related("asset").order_by("asset__name", "name")
-    return render(request, "core/checks.html", {"checks": checks_list, "now": timezone.now()})
+    # pagination par curseur sur (asset__name, name, id) ; filtres ?asset= &kind= &enabled=
+    page = _keyset_page(request, "checks", LISTS["checks"].queryset(request.GET), settings.LIST_PAGE_SIZE)
+    return render(request, "core/checks.html", {"items": page.items, "page": page, "filters_qs": _filters_qs(request), "now": timezone.now()})
 
 
 @login_required
 def alerts(request):
-    alerts_list = Alert.objects.select_related("monitor_check", "monitor_check__asset").order_by("-opened_at")[:200]
-    return render(request, "core/alerts.html", {"alerts": alerts_list, "now": timezone.now()})
+    # pagination par curseur sur (opened_at, id) : les plus anciennes restent accessibles ; filtres ?open= &asset=
+    page = _keyset_page(request, "alerts", LISTS["alerts"].queryset(request.GET), settings.LIST_PAGE_SIZE)
+    return render(request, "core/alerts.html", {"items": page.items, "page": page, "filters_qs": _filters_qs(request), "now": timezone.now()})
+
+
+@login_required
+def certificates(request):
+    # inventaire TLS servi depuis la base (alimenté par les checks ssl_expiry), aucun handshake ici
+    now = timezone.now()
+    records = list(CertificateRecord.objects.order_by("not_after", "host", "port"))
+    for r in records:
+        r.remaining_days = (r.not_after - now).days if r.not_after else None
+    return render(request, "core/certificates.html", {"certificates": records, "now": now})
 
 
 @login_required
@@ -197,112 +198,153 @@ def asset_create(request):
     return redirect("/assets/")
 
 
-# ------------------ API METRICS ------------------
+# ------------------ API LISTES ------------------
+# ?cursor=... (next / previous de la réponse précédente), ?limit= (<= LIST_PAGE_MAX), filtres de core/listing.py.
 
 @login_required
-def metrics_latency_series_24h(request):
-    now = timezone.now()
-    since = now - timedelta(hours=24)
+def api_list(request, kind: str):
+    ordering = ordering_for(kind, request.GET)
+    qs = LISTS[kind].queryset(request.GET).values(*api_fields(kind, ordering))
+    try:
+        page = paginate(qs, ordering, request.GET.get("cursor"), page_limit(request.GET, settings.LIST_PAGE_SIZE))
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"items": page.items, "next": page.next_cursor, "previous": page.previous_cursor})
 
-    qs = (
-        CheckResult.objects.filter(recorded_at__gte=since, latency_ms__isnull=False)
-        .order_by("recorded_at")
-        .values("recorded_at", "latency_ms")
-    )
 
-    bucket = {}
-    for row in qs:
-        t = _bucket_time(row["recorded_at"], minutes=10)
-        bucket.setdefault(t, []).append(float(row["latency_ms"]))
+@login_required
+def export_list(request, kind: str, fmt: str):
+    """Export complet en flux (mêmes filtres que l'API), lu par lots via un curseur côté serveur."""
+    if kind not in LISTS or fmt not in ("csv", "ndjson"):
+        raise Http404
+    if fmt == "csv":
+        response = StreamingHttpResponse(stream_csv(kind, request.GET), content_type="text/csv; charset=utf-8")
+    else:
+        response = StreamingHttpResponse(stream_ndjson(kind, request.GET), content_type="application/x-ndjson")
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+    response["Content-Disposition"] = f'attachment; filename="{kind}-{stamp}.{fmt}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 
-    labels, values = [], []
-    for t in sorted(bucket.keys()):
-        labels.append(t.strftime("%H:%M"))
-        values.append(sum(bucket[t]) / len(bucket[t]))
+# ------------------ API METRICS ------------------
+# Bucketing en SQL (core/series.py). Paramètres: ?range=24h&step=10m (s/m/h/d/w).
 
-    return JsonResponse({"labels": labels, "values": values})
+def _series_window(request, default_range: timedelta, default_step: timedelta):
+    range_ = parse_duration(request.GET.get("range"), default_range)
+    step = clamp_step(range_, parse_duration(request.GET.get("step"), default_step))
+    return timezone.now() - range_, range_, step
 
 
 @login_required
-def metrics_uptime_series_24h(request):
-    now = timezone.now()
-    since = now - timedelta(hours=24)
-
-    qs = CheckResult.objects.filter(recorded_at__gte=since).values("recorded_at", "ok").order_by("recorded_at")
+def metrics_latency_series_24h(request):
+    since, range_, step = _series_window(request, timedelta(hours=24), timedelta(minutes=10))
 
-    bucket_ok = {}
-    bucket_total = {}
+    labels, values = latency_series(check_buckets(since, step), label_format(range_, step))
+    return JsonResponse({"labels": labels, "values": values, "step": int(step.total_seconds())})
 
-    for row in qs:
-        t = row["recorded_at"].replace(minute=0, second=0, microsecond=0)
-        bucket_total[t] = bucket_total.get(t, 0) + 1
-        if row["ok"]:
-            bucket_ok[t] = bucket_ok.get(t, 0) + 1
 
-    labels, values = [], []
-    for t in sorted(bucket_total.keys()):
-        total = bucket_total[t]
-        ok = bucket_ok.get(t, 0)
-        pct = (ok / total * 100.0) if total else 100.0
-        labels.append(t.strftime("%H:%M"))
-        values.append(round(pct, 2))
+@login_required
+def metrics_uptime_series_24h(request):
+    since, range_, step = _series_window(request, timedelta(hours=24), timedelta(hours=1))
 
-    return JsonResponse({"labels": labels, "values": values})
+    labels, values = uptime_series(check_buckets(since, step), label_format(range_, step))
+    return JsonResponse({"labels": labels, "values": values, "step": int(step.total_seconds())})
 
 
 @login_required
 def metrics_asset_latency_7d(request, asset_id: int):
     asset = get_object_or_404(Asset, id=asset_id)
-    now = timezone.now()
-    since = now - timedelta(days=7)
+    # bucket 1h sur 7j par défaut
+    since, range_, step = _series_window(request, timedelta(days=7), timedelta(hours=1))
 
-    qs = (
-        CheckResult.objects.filter(monitor_check__asset=asset, recorded_at__gte=since, latency_ms__isnull=False)
-        .order_by("recorded_at")
-        .values("recorded_at", "latency_ms")
+    labels, values = latency_series(
+        check_buckets(since, step, monitor_check__asset=asset), label_format(range_, step)
     )
-
-    bucket = {}
-    for row in qs:
-        # bucket 1h sur 7j
-        t = row["recorded_at"].replace(minute=0, second=0, microsecond=0)
-        bucket.setdefault(t, []).append(float(row["latency_ms"]))
-
-    labels, values = [], []
-    for t in sorted(bucket.keys()):
-        labels.append(t.strftime("%d/%m %Hh"))
-        values.append(sum(bucket[t]) / len(bucket[t]))
-
-    return JsonResponse({"labels": labels, "values": values, "asset": asset.name})
+    return JsonResponse({"labels": labels, "values": values, "asset": asset.name, "step": int(step.total_seconds())})
 
 
 @login_required
 def metrics_asset_uptime_7d(request, asset_id: int):
     asset = get_object_or_404(Asset, id=asset_id)
-    now = timezone.now()
-    since = now - timedelta(days=7)
+    since, range_, step = _series_window(request, timedelta(days=7), timedelta(hours=1))
 
-    qs = (
-        CheckResult.objects.filter(monitor_check__asset=asset, recorded_at__gte=since)
-        .values("recorded_at", "ok")
-        .order_by("recorded_at")
+    labels, values = uptime_series(
+        check_buckets(since, step, monitor_check__asset=asset), label_format(range_, step)
     )
+    return JsonResponse({"labels": labels, "values": values, "asset": asset.name, "step": int(step.total_seconds())})
 
-    bucket_ok = {}
-    bucket_total = {}
 
-    for row in qs:
-        t = row["recorded_at"].replace(minute=0, second=0, microsecond=0)
-        bucket_total[t] = bucket_total.get(t, 0) + 1
-        if row["ok"]:
-            bucket_ok[t] = bucket_ok.get(t, 0) + 1
+# ------------------ JOBS ------------------
+
+@login_required
+def job_detail(request, job_id: int):
+    job = get_object_or_404(Job.objects.select_related("asset"), id=job_id)
+    return render(request, "core/job_detail.html", {"job": job})
+
+
+@login_required
+def api_job_log(request, job_id: int):
+    # ?after=<id du dernier JobLog reçu>&limit= : seulement les nouvelles lignes (index job, id)
+    try:
+        after = max(0, int(request.GET.get("after") or 0))
+        limit = int(request.GET.get("limit") or settings.JOB_LOG_TAIL_MAX)
+    except ValueError:
+        return JsonResponse({"error": "after and limit must be integers"}, status=400)
+    limit = max(1, min(limit, settings.JOB_LOG_TAIL_MAX))
+
+    # statut lu avant les lignes : "finished" garantit que toutes les lignes sont déjà en base
+    job = Job.objects.filter(id=job_id).values("status", "started_at", "finished_at").first()
+    if job is None:
+        raise Http404
+    rows, has_more = jobs.tail(job_id, after, limit)
+    return JsonResponse({
+        "status": job["status"],
+        "finished": job["status"] in ("success", "failed"),
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "lines": [{"id": i, "line": line, "at": at} for i, line, at in rows],
+        "after": rows[-1][0] if rows else after,
+        "has_more": has_more,
+    })
+
+
+# ------------------ API METRICS AGENTS ------------------
+# ?key=cpu_percent&asset=web1&asset=web2&range=7d&step=5m&agg=avg|min|max|p95|last&label=core=0&label=mount=~/var.*
+# (key / asset / label répétables ou séparés par des virgules ; bucketing en base, cf core/metrics.py)
+
+def _multi(request, name: str):
+    return [v.strip() for raw in request.GET.getlist(name) for v in raw.split(",") if v.strip()]
 
-    labels, values = [], []
-    for t in sorted(bucket_total.keys()):
-        total = bucket_total[t]
-        ok = bucket_ok.get(t, 0)
-        pct = (ok / total * 100.0) if total else 100.0
-        labels.append(t.strftime("%d/%m %Hh"))
-        values.append(round(pct, 2))
 
-    return JsonResponse({"labels": labels, "values": values, "asset": asset.name})
+@login_required
+def metrics_query(request):
+    try:
+        data = query_metrics(
+            keys=_multi(request, "key"),
+            asset_names=_multi(request, "asset"),
+            range_=parse_duration(request.GET.get("range"), timedelta(hours=24)),
+            step=parse_duration(request.GET.get("step"), None),
+            agg=request.GET.get("agg") or "avg",
+            matchers=parse_matchers(request.GET.getlist("label")),
+        )
+    except MetricQueryError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(data)
+
+
+# ------------------ INSTRUMENTATION ------------------
+# compteurs / histogrammes du pipeline (core/instrumentation.py), tous process confondus
+
+def _scrape_allowed(request) -> bool:
+    if request.user.is_authenticated:
+        return True
+    token = settings.METRICS_SCRAPE_TOKEN
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+def openmetrics(request):
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden("forbidden", content_type="text/plain")
+    return HttpResponse(instrumentation.render_openmetrics(), content_type=instrumentation.CONTENT_TYPE)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Agent de sondes déportées : à lancer sur un site distant, sans Django ni base.
+
+    ARCANE_URL=https://panel.example.tld ARCANE_AGENT_TOKEN=... python probe_agent.py
+
+Boucle : lease d'un lot de checks (POST /api/agents/lease/), exécution locale
+avec le moteur des workers (core/probes.py : tcp_port, http, ssl_expiry,
+ping), envoi des résultats en NDJSON gzip (POST /api/agents/results/) par
+paquets de --upload-batch pendant que les sondes continuent. Lot vide : attente
+de poll_seconds (fixé par le serveur).
+
+Un envoi en échec est retenté au tour suivant (au plus --max-pending
+résultats gardés) ; un agent arrêté laisse expirer ses baux et ses checks
+repartent vers un autre agent de la région.
+
+Jeton : `manage.py create_agent_token <nom> --region <région>`.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import signal
+import time
+from datetime import date, datetime
+
+import requests
+
+from core.dnscache import DnsCache
+from core.probes import ProbeEngine, ProbeSpec
+
+logger = logging.getLogger("probe_agent")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"not serializable: {type(value).__name__}")
+
+
+def outcome_line(o) -> dict:
+    return {
+        "check_id": o.check_id,
+        "ok": o.ok,
+        "message": o.message,
+        "latency_ms": o.latency_ms,
+        "timings": o.timings,
+        "recorded_at": o.recorded_at.timestamp(),
+        "cert": o.cert,
+    }
+
+
+class Agent:
+    def __init__(self, url: str, token: str, batch: int, upload_batch: int, max_pending: int, engine: ProbeEngine,
+                 timeout: float = 30.0):
+        self.url = url.rstrip("/")
+        self.batch = batch
+        self.upload_batch = max(1, upload_batch)
+        self.max_pending = max_pending
+        self.engine = engine
+        self.timeout = timeout
+        self.pending = []
+        self.stopping = False
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def lease(self):
+        r = self.session.post(f"{self.url}/api/agents/lease/", json={"max": self.batch}, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def upload(self):
+        """Envoie les résultats en attente ; False si l'envoi a échoué (ils restent en attente)."""
+        if not self.pending:
+            return True
+        body = gzip.compress(
+            b"".join(json.dumps(line, default=_json_default).encode() + b"\n" for line in self.pending)
+        )
+        try:
+            r = self.session.post(
+                f"{self.url}/api/agents/results/",
+                data=body,
+                headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+                timeout=self.timeout,
+            )
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("upload of %d results failed: %s", len(self.pending), e)
+            if len(self.pending) > self.max_pending:
+                dropped = len(self.pending) - self.max_pending
+                self.pending = self.pending[dropped:]
+                logger.warning("%d oldest results dropped (max pending %d)", dropped, self.max_pending)
+            return False
+        report = r.json()
+        if report.get("rejected"):
+            logger.warning("results rejected: %s", report.get("errors"))
+        self.pending = []
+        return True
+
+    def run_once(self) -> float:
+        """Un lease + exécution ; renvoie l'attente avant le tour suivant (secondes)."""
+        lease = self.lease()
+        specs = [ProbeSpec(**spec) for spec in lease["checks"]]
+        if specs:
+            t0 = time.perf_counter()
+            for o in self.engine.iter_outcomes(specs):
+                self.pending.append(outcome_line(o))
+                if len(self.pending) >= self.upload_batch:
+                    self.upload()
+            uploaded = self.upload()
+            logger.info("%d checks probed in %.1fs", len(specs), time.perf_counter() - t0)
+            if uploaded and len(specs) >= self.batch:
+                return 0  # lot plein : probablement encore du travail échu
+        else:
+            self.upload()
+        return float(lease.get("poll_seconds", 5))
+
+    def run(self):
+        backoff = 1.0
+        while not self.stopping:
+            try:
+                wait = self.run_once()
+                backoff = 1.0
+            except (requests.RequestException, ValueError, KeyError) as e:
+                logger.warning("lease failed: %s (retry in %.0fs)", e, backoff)
+                wait, backoff = backoff, min(backoff * 2, 60.0)
+            deadline = time.monotonic() + wait
+            while not self.stopping and time.monotonic() < deadline:
+                time.sleep(min(0.5, deadline - time.monotonic()))
+        self.upload()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ArcanePanel probe agent")
+    parser.add_argument("--url", default=os.getenv("ARCANE_URL", ""))
+    parser.add_argument("--token", default=os.getenv("ARCANE_AGENT_TOKEN", ""))
+    parser.add_argument("--batch", type=int, default=int(os.getenv("AGENT_BATCH", "200")), help="checks par lease")
+    parser.add_argument("--upload-batch", type=int, default=int(os.getenv("AGENT_UPLOAD_BATCH", "200")))
+    parser.add_argument("--max-pending", type=int, default=int(os.getenv("AGENT_MAX_PENDING", "10000")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("PROBE_CONCURRENCY", "200")))
+    parser.add_argument("--per-host", type=int, default=int(os.getenv("PROBE_PER_HOST_CONCURRENCY", "4")))
+    parser.add_argument("--http-threads", type=int, default=int(os.getenv("PROBE_HTTP_THREADS", "32")))
+    parser.add_argument("--once", action="store_true", help="un seul lease puis sortie")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.url or not args.token:
+        parser.error("--url / ARCANE_URL et --token / ARCANE_AGENT_TOKEN sont requis")
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    engine = ProbeEngine(
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        http_threads=args.http_threads,
+        dns=DnsCache(
+            max_size=int(os.getenv("DNS_CACHE_SIZE", "4096")),
+            ttl=float(os.getenv("DNS_CACHE_TTL", "60")),
+            negative_ttl=float(os.getenv("DNS_NEGATIVE_TTL", "15")),
+        ),
+    )
+    agent = Agent(args.url, args.token, max(1, args.batch), args.upload_batch, args.max_pending, engine)
+
+    def _stop(signum, frame):
+        agent.stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    if args.once:
+        agent.run_once()
+        agent.upload()
+    else:
+        agent.run()
+
+
+if __name__ == "__main__":
+    main()